@@ -0,0 +1,96 @@
+# bench/bench_arranque.py
+"""
+Tiempo de arranque de la app con 1k y 100k búsquedas guardadas en el store:
+- import:   `import main` (Playwright y APScheduler ya no se importan acá)
+- atiende:  on_startup hasta que la app puede responder /search
+- listo:    fin del calentamiento en segundo plano (precios, grupos programados, navegadores)
+- 1er uso:  cargar del disco los vistos de UNA búsqueda la primera vez que se usa
+- todo:     lo que costaba antes leer todos los vistos al arrancar (store.load_seen)
+Cada medición corre en un intérprete nuevo.
+
+Uso (desde la raíz del repo):
+    python -m bench.bench_arranque [claves ...]        # default: 1000 100000
+"""
+import asyncio, json, os, random, sqlite3, subprocess, sys, tempfile, time
+from store import Store
+
+ITEMS_POR_CLAVE = 20
+WATCHES = 200
+
+
+def poblar(path: str, claves: int):
+    """Store con `claves` búsquedas de ITEMS_POR_CLAVE vistos, WATCHES suscripciones y un precio por item."""
+    Store(path).close()   # esquema
+    c = sqlite3.connect(path, isolation_level=None)
+    c.execute("PRAGMA journal_mode=WAL")
+    c.execute("BEGIN")
+    ahora = int(time.time())
+    c.executemany("INSERT INTO seen_meta(key, last_update) VALUES (?, ?)",
+                  ((f"k{k}", ahora - random.randint(0, 86400)) for k in range(claves)))
+    c.executemany("INSERT INTO seen_items(key, item) VALUES (?, ?)",
+                  ((f"k{k}", 6_000_000_000 + k * ITEMS_POR_CLAVE + i)
+                   for k in range(claves) for i in range(ITEMS_POR_CLAVE)))
+    c.executemany("INSERT INTO price_samples(item, ts, price) VALUES (?, ?, ?)",
+                  ((6_000_000_000 + k * ITEMS_POR_CLAVE, ahora, 100_000 + k) for k in range(claves)))
+    c.executemany("INSERT INTO watches(id, data) VALUES (?, ?)",
+                  ((f"w{i}", json.dumps({"q": f"arranque {i}", "phone": f"57{i:08d}", "min_price": None,
+                                         "max_price": None, "condition": None, "envio": None,
+                                         "site": "mercadolibre.com.co", "interval_sec": 3600, "engine": "http",
+                                         "max_pages": 1, "last_run": 0}))
+                   for i in range(WATCHES)))
+    c.execute("INSERT OR REPLACE INTO meta(k, v) VALUES ('migrated_json', '0')")
+    c.execute("COMMIT")
+    c.close()
+
+
+async def medir_hijo(claves: int) -> dict:
+    t0 = time.perf_counter()
+    import main
+    t_import = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    await main.on_startup()
+    t_atiende = time.perf_counter() - t0
+    while not main.ARRANQUE["ready"]:
+        await asyncio.sleep(0.005)
+    t_listo = time.perf_counter() - t0
+
+    key = f"k{claves // 2}"
+    t0 = time.perf_counter()
+    nuevos = main._diff_vistos(key, [{"link": "https://articulo.mercadolibre.com.co/MCO-999999999-x"}])
+    t_uso = time.perf_counter() - t0
+    assert len(main.SEEN[key]) == ITEMS_POR_CLAVE + len(nuevos)
+
+    t0 = time.perf_counter()
+    main.store.load_seen(main.SEEN_MODE, main.SEEN_MAX_PER_KEY)
+    t_todo = time.perf_counter() - t0
+    await main.on_shutdown()
+    ms = lambda t: round(t * 1000, 1)
+    return {"claves": claves, "import_ms": ms(t_import), "atiende_ms": ms(t_atiende), "listo_ms": ms(t_listo),
+            "primer_uso_ms": ms(t_uso), "carga_completa_ms": ms(t_todo), "etapas": main.ARRANQUE}
+
+
+def main_cli():
+    if len(sys.argv) > 1 and sys.argv[1] == "--hijo":
+        print(json.dumps(asyncio.run(medir_hijo(int(sys.argv[2])))), flush=True)
+        return
+    tamanos = [int(a) for a in sys.argv[1:]] or [1000, 100_000]
+    cols = ("import_ms", "atiende_ms", "listo_ms", "primer_uso_ms", "carga_completa_ms")
+    print(f"{'claves':>8}" + "".join(f"{c:>19}" for c in cols))
+    for n in tamanos:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = os.path.join(tmp, "arranque.db")
+            poblar(db, n)
+            env = {**os.environ, "STORE_DB": db, "SCRAPE_WORKERS": "0", "BROWSER_POOL_SIZE": "1"}
+            out = subprocess.run([sys.executable, "-m", "bench.bench_arranque", "--hijo", str(n)],
+                                 env=env, capture_output=True, text=True)
+            lineas = [l for l in out.stdout.splitlines() if l.startswith("{")]
+            if not lineas:
+                print(f"{n:>8}  ❌ falló:\n{out.stderr[-2000:]}")
+                continue
+            r = json.loads(lineas[-1])
+            print(f"{n:>8}" + "".join(f"{r[c]:>19}" for c in cols))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,73 @@
+# bench/bench_batch.py
+"""
+/search uno por uno contra POST /search/batch, sin red (MercadoLibre falso con latencia):
+- secuencial: `--queries` GET /search seguidos, como hoy los dashboards
+- batch:      las mismas búsquedas (otros términos, para no pegarle a la caché) en UN POST /search/batch
+
+Uso (desde la raíz del repo):
+    python -m bench.bench_batch [--queries 50] [--meli-latency-ms 80] [--concurrency 8] [--engine http]
+"""
+import argparse, asyncio, os, tempfile, time
+from bench.fake_servers import FakeMeli
+
+
+async def correr(args, meli: FakeMeli):
+    import main
+    from httpx import ASGITransport, AsyncClient
+
+    main.SEEN_FILE = main.WATCHES_FILE = main.PHONEMAP_FILE = os.path.join(args.tmp, "no-existe.json")
+    await main.on_startup()
+    while not main.ARRANQUE["ready"]:
+        await asyncio.sleep(0.01)
+    try:
+        async with AsyncClient(transport=ASGITransport(app=main.app), base_url="http://bench", timeout=600) as c:
+            print(f"▶ secuencial ({args.queries} GET /search)")
+            req0 = meli.requests
+            t0 = time.perf_counter()
+            errores = 0
+            for i in range(args.queries):
+                r = await c.get("/search", params={"q": f"seq-{i}", "engine": args.engine})
+                errores += "error" in r.json()
+            t_seq = time.perf_counter() - t0
+            req_seq = meli.requests - req0
+
+            print(f"▶ batch (1 POST /search/batch con {args.queries} búsquedas)")
+            req0 = meli.requests
+            t0 = time.perf_counter()
+            r = await c.post("/search/batch", json={
+                "queries": [{"q": f"batch-{i}", "engine": args.engine} for i in range(args.queries)],
+                "concurrency": args.concurrency})
+            t_batch = time.perf_counter() - t0
+            d = r.json()
+            req_batch = meli.requests - req0
+    finally:
+        await main.on_shutdown()
+
+    print(f"\n{'modo':<12}{'total_s':>10}{'búsq/s':>10}{'errores':>10}{'scrapes':>10}")
+    print(f"{'secuencial':<12}{t_seq:>10.2f}{args.queries / t_seq:>10.1f}{errores:>10}{req_seq:>10}")
+    print(f"{'batch':<12}{t_batch:>10.2f}{args.queries / t_batch:>10.1f}{d.get('errors'):>10}{req_batch:>10}")
+    print(f"\n⚡ batch {t_seq / t_batch:.1f}x más rápido (concurrencia {d.get('concurrency')})")
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--meli-latency-ms", type=float, default=80)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--engine", default="http")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, FakeMeli(latency_ms=args.meli_latency_ms) as meli:
+        args.tmp = tmp
+        os.environ.update({
+            "MELI_LISTADO_URL": meli.listado_url,
+            "STORE_DB": os.path.join(tmp, "batch.db"),
+            "SCRAPE_CACHE_TTL": "0",
+            "BATCH_CONCURRENCY": str(max(args.concurrency, int(os.getenv("BATCH_CONCURRENCY", "8")))),
+            "BROWSER_POOL_SIZE": os.getenv("BROWSER_POOL_SIZE", "1"),
+        })
+        asyncio.run(correr(args, meli))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,87 @@
+# bench/bench_breaker.py
+"""
+Sitio bloqueado (captcha) con `--grupos` búsquedas vigiladas, sin red:
+el MercadoLibre falso responde la página de captcha durante las primeras `--rondas-bloqueo` rondas y
+después vuelve a la normalidad. Cada ronda corre todos los grupos (run_group).
+Se compara con y sin circuit breaker: scrapes que llegaron al sitio bloqueado, tiempo perdido en
+fallos y rondas hasta recuperarse. `--meli-latency-ms` simula lo que tarda cada intento fallido
+(con el navegador, antes de la detección temprana, eran los 20 s de SCRAPE_WAIT_MS).
+
+Uso (desde la raíz del repo):
+    python -m bench.bench_breaker [--grupos 20] [--rondas 12] [--rondas-bloqueo 8] [--ronda 0.3]
+"""
+import argparse, asyncio, os, tempfile, time
+from bench.fake_servers import FakeMeli
+
+
+async def fase(main, meli: FakeMeli, args, con_breaker: bool) -> dict:
+    from breakers import Breakers
+    main.breakers = (Breakers(main.BREAKER_FAILURES, main.BREAKER_OPEN_SEC, main.BREAKER_MAX_OPEN_SEC)
+                     if con_breaker else Breakers(umbral=10 ** 9))
+    grupos = sorted({main.grupo_de_watch(w) for w in main.WATCHES.values()})
+    meli.bloqueado, b0, r0 = True, meli.bloqueos, meli.requests
+    recuperado, t0 = None, time.perf_counter()
+    for ronda in range(args.rondas):
+        if ronda == args.rondas_bloqueo:
+            meli.bloqueado = False
+        sanos0 = meli.requests - meli.bloqueos
+        await asyncio.gather(*(main.run_group(g) for g in grupos))
+        if recuperado is None and not meli.bloqueado and meli.requests - meli.bloqueos > sanos0:
+            recuperado = ronda - args.rondas_bloqueo + 1
+        await asyncio.sleep(args.ronda)
+    st = main.breakers.stats()["sites"].get("mercadolibre.com.co", {})
+    return {"bloqueados": meli.bloqueos - b0, "requests": meli.requests - r0,
+            "perdido_s": st.get("lost_s"), "rechazados": st.get("rejected"),
+            "rondas_hasta_recuperar": recuperado, "total_s": round(time.perf_counter() - t0, 1),
+            "backoff": sum(1 for e in main.ADAPT.values() if e.get("failures"))}
+
+
+async def correr(args, meli: FakeMeli):
+    import main
+    main.SEEN_FILE = main.WATCHES_FILE = main.PHONEMAP_FILE = os.path.join(args.tmp, "no-existe.json")
+    await main.on_startup()
+    while not main.ARRANQUE["ready"]:
+        await asyncio.sleep(0.01)
+    try:
+        for i in range(args.grupos):
+            main.subscribe(q=f"breaker-{i}", phone=f"57300{i:05d}", min_price=None, max_price=None, condition=None,
+                           envio=None, site="mercadolibre.com.co", interval_sec=3600, engine="http", max_pages=1,
+                           price_drop_pct=None, price_below=None)
+        res = {}
+        for nombre, con in (("sin breaker", False), ("con breaker", True)):
+            print(f"▶ {nombre}")
+            res[nombre] = await fase(main, meli, args, con)
+    finally:
+        await main.on_shutdown()
+
+    cols = ("bloqueados", "perdido_s", "rechazados", "rondas_hasta_recuperar", "backoff", "total_s")
+    print(f"\n{'modo':<14}" + "".join(f"{c:>24}" for c in cols))
+    for nombre, r in res.items():
+        print(f"{nombre:<14}" + "".join(f"{str(r[c]):>24}" for c in cols))
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--grupos", type=int, default=20)
+    ap.add_argument("--rondas", type=int, default=12)
+    ap.add_argument("--rondas-bloqueo", type=int, default=8)
+    ap.add_argument("--ronda", type=float, default=0.3, help="segundos entre rondas")
+    ap.add_argument("--meli-latency-ms", type=float, default=200)
+    ap.add_argument("--open-sec", type=float, default=1, help="BREAKER_OPEN_SEC durante el bench")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, FakeMeli(latency_ms=args.meli_latency_ms) as meli:
+        args.tmp = tmp
+        os.environ.update({
+            "MELI_LISTADO_URL": meli.listado_url,
+            "STORE_DB": os.path.join(tmp, "breaker.db"),
+            "SCRAPE_CACHE_TTL": "0",
+            "BREAKER_OPEN_SEC": str(args.open_sec),
+            "WATCH_CONCURRENCY": str(args.grupos), "WATCH_SITE_CONCURRENCY": str(args.grupos),
+            "BROWSER_POOL_SIZE": os.getenv("BROWSER_POOL_SIZE", "1"),
+        })
+        asyncio.run(correr(args, meli))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,78 @@
+# bench/bench_extraccion.py
+"""
+Compara la extracción de cards card-por-card (un query_selector/inner_text por campo)
+contra la extracción en una sola evaluación (extractor.EXTRACT_CARDS_JS), sobre debug_page.html.
+
+Uso (desde la raíz del repo):
+    python -m bench.bench_extraccion [repeticiones]
+"""
+import asyncio, os, sys, time
+from playwright.async_api import async_playwright
+from extractor import parse_price, extraer_cards
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGINA = os.path.join(RAIZ, "debug_page.html")
+
+
+async def extraer_loop(page):
+    """La extracción anterior: ~10 idas y vueltas al navegador por card."""
+    cards = await page.query_selector_all("li.ui-search-layout__item")
+    items = []
+    for card in cards:
+        title_el = await card.query_selector("a.poly-component__title")
+        title = (await title_el.inner_text()).strip() if title_el else None
+        link = await title_el.get_attribute("href") if title_el else None
+        price_el = await card.query_selector("span.andes-money-amount__fraction")
+        price = parse_price((await price_el.inner_text()).strip() if price_el else None)
+        cond_el = await card.query_selector("span.poly-component__item-condition")
+        cond_text = ((await cond_el.inner_text()).strip() if cond_el else None) or "Nuevo"
+        ship_el = await card.query_selector("div.poly-component__shipping")
+        shipping = (await ship_el.inner_text()).strip() if ship_el else None
+        img_el = await card.query_selector("img.poly-component__picture")
+        image = None
+        if img_el:
+            src = await img_el.get_attribute("src")
+            data_src = await img_el.get_attribute("data-src")
+            if src and src.startswith("http"):
+                image = src
+            elif data_src and data_src.startswith("http"):
+                image = data_src
+        if not title or not link or not price:
+            continue
+        items.append({"title": title, "price": price, "condition": cond_text,
+                      "shipping": shipping, "link": link, "image": image})
+    return items
+
+
+async def medir(nombre, fn, page, reps):
+    tiempos = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        items = await fn(page)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    tiempos.sort()
+    print(f"{nombre:<12} cards={len(items):<4} p50={tiempos[len(tiempos)//2]:8.1f} ms  "
+          f"min={tiempos[0]:8.1f} ms  max={tiempos[-1]:8.1f} ms")
+    return items
+
+
+async def main(reps: int):
+    with open(PAGINA, encoding="utf-8") as f:
+        html = f.read()
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page()
+        # sin red: sólo nos interesa el DOM guardado
+        await page.route("**/*", lambda route: route.abort())
+        await page.set_content(html, wait_until="domcontentloaded")
+
+        viejos = await medir("loop", extraer_loop, page, reps)
+        nuevos = await medir("evaluate", extraer_cards, page, reps)
+        await browser.close()
+
+    iguales = [(i["link"], i["price"]) for i in viejos] == [(i["link"], i["price"]) for i in nuevos]
+    print("mismos resultados:", iguales)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10))
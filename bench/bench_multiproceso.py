@@ -0,0 +1,128 @@
+# bench/bench_multiproceso.py
+"""
+Varios procesos de la app sobre el mismo STORE_DB (como `uvicorn main:app --workers N`), sin red:
+1. un proceso da de alta `--watches` suscripciones (cada una su teléfono/chat y su búsqueda);
+2. `--procesos` procesos corren todos los grupos cada `--ronda` segundos durante `--rondas` rondas;
+   uno de ellos se "cae" (os._exit, sin soltar sus leases) tras la 2ª ronda, después de dar de alta
+   una suscripción más que los otros tienen que descubrir;
+3. se verifica con el Telegram falso que cada chat recibió sus avisos UNA sola vez (sin duplicados
+   aunque todos los procesos intenten correr todos los grupos) y que nadie quedó sin avisar
+   (los grupos del caído los tomó otro al vencer su lease).
+
+Con `--sin-leases` los procesos ignoran los leases: se ven los avisos duplicados.
+
+Uso (desde la raíz del repo):
+    python -m bench.bench_multiproceso [--procesos 4] [--watches 20] [--rondas 12] [--lease-ttl 2]
+"""
+import argparse, asyncio, json, os, subprocess, sys, tempfile, time
+from bench.fake_servers import FakeMeli, FakeTelegram
+
+
+# ------------ procesos hijos (importan main con el entorno ya preparado) ------------
+async def alta(n: int, desde: int = 0):
+    import main
+    propio = main.store is None   # proceso "alta": sin on_startup, sólo el store
+    if propio:
+        main._abrir_persistencia()
+    for i in range(desde, desde + n):
+        main.PHONEMAP[f"57300{i:05d}"] = str(100000 + i)
+        main._sync_phonemap_to_disk(f"57300{i:05d}")
+        main.subscribe(q=f"multi-{i}", phone=f"57300{i:05d}", min_price=None, max_price=None, condition=None,
+                       envio=None, site="mercadolibre.com.co", interval_sec=3600, engine="http", max_pages=1,
+                       price_drop_pct=None, price_below=None)
+    if propio:
+        main._cerrar_persistencia()
+
+
+async def corredor(args):
+    import main
+    # sin JSON viejos que migrar: sólo lo que dio de alta `alta`
+    main.SEEN_FILE = main.WATCHES_FILE = main.PHONEMAP_FILE = os.path.join(os.getenv("STORE_DB") + ".no-existe")
+    await main.on_startup()
+    if args.sin_leases:   # los leases se abren en on_startup; las tareas todavía no corrieron
+        main.leases.adquirir = lambda name: True
+    while not main.ARRANQUE["ready"]:   # Telegram y navegadores se inician en segundo plano
+        await asyncio.sleep(0.01)
+    por_ronda = []
+    try:
+        for ronda in range(args.rondas):
+            grupos = {main.grupo_de_watch(w) for w in main.WATCHES.values()}
+            await asyncio.gather(*(main.run_group(g) for g in grupos))
+            por_ronda.append(sum(not main.leases.es_nuevo(f"group:{g}") for g in grupos))
+            if args.morir_tras and ronda + 1 == args.morir_tras:
+                await alta(1, desde=args.watches)     # una suscripción nueva que los demás deben ver
+                await main.telegram.drain(10)
+                main.store.flush()
+                print(json.dumps({"pid": os.getpid(), "grupos": por_ronda, "murio": True}), flush=True)
+                os._exit(1)                            # caída: sin on_shutdown, los leases quedan tomados
+            await asyncio.sleep(args.ronda)
+        await main.telegram.drain(10)
+    finally:
+        await main.on_shutdown()
+    print(json.dumps({"pid": os.getpid(), "grupos": por_ronda, "tomados": main.leases.tomados}), flush=True)
+
+
+# ------------ proceso principal ------------
+def lanzar(args, *extra) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", "bench.bench_multiproceso", *extra,
+                             "--watches", str(args.watches), "--rondas", str(args.rondas), "--ronda", str(args.ronda)]
+                            + (["--sin-leases"] if args.sin_leases else []),
+                            stdout=subprocess.PIPE, text=True)
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--procesos", type=int, default=4)
+    ap.add_argument("--watches", type=int, default=20)
+    ap.add_argument("--rondas", type=int, default=12)
+    ap.add_argument("--ronda", type=float, default=0.5, help="segundos entre rondas")
+    ap.add_argument("--lease-ttl", type=float, default=2)
+    ap.add_argument("--sin-leases", action="store_true")
+    ap.add_argument("--hijo", choices=("alta", "corredor"), help=argparse.SUPPRESS)
+    ap.add_argument("--morir-tras", type=int, default=0, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.hijo == "alta":
+        return asyncio.run(alta(args.watches))
+    if args.hijo == "corredor":
+        return asyncio.run(corredor(args))
+
+    with tempfile.TemporaryDirectory() as tmp, FakeMeli() as meli, FakeTelegram() as tg:
+        os.environ.update({
+            "MELI_LISTADO_URL": meli.listado_url,
+            "TELEGRAM_API_URL": tg.api_url,
+            "TELEGRAM_BOT_TOKEN": "bench",   # el Telegram falso acepta cualquiera
+            "STORE_DB": os.path.join(tmp, "multi.db"),
+            "SCRAPE_CACHE_TTL": "0",
+            "TELEGRAM_GLOBAL_RATE": "1000", "TELEGRAM_CHAT_RATE": "1000",
+            "BROWSER_POOL_SIZE": "1",
+            "LEASE_TTL": str(args.lease_ttl),
+            "CLUSTER_SYNC_SEC": "0.5",
+        })
+        subprocess.run([sys.executable, "-m", "bench.bench_multiproceso", "--hijo", "alta",
+                        "--watches", str(args.watches)], check=True)
+        print(f"▶ {args.watches} suscripciones dadas de alta; {args.procesos} procesos, "
+              f"lease TTL {args.lease_ttl}s{' (SIN leases)' if args.sin_leases else ''}")
+        t0 = time.perf_counter()
+        hijos = [lanzar(args, "--hijo", "corredor", *(["--morir-tras", "2"] if i == 0 else []))
+                 for i in range(args.procesos)]
+        salidas = [json.loads((h.communicate()[0].strip().splitlines() or ["{}"])[-1]) for h in hijos]
+        total = time.perf_counter() - t0
+
+    for s in salidas:
+        estado = "💀 caído" if s.get("murio") else f"tomó {s.get('tomados')} leases"
+        print(f"  pid {s.get('pid')}: grupos propios por ronda {s.get('grupos')} ({estado})")
+    chats = args.watches + 1
+    cuentas = sorted(set(tg.por_chat.values()))
+    sin_aviso = chats - len(tg.por_chat)
+    print(f"\ntelegram: {tg.messages} mensajes a {len(tg.por_chat)}/{chats} chats; mensajes por chat: {cuentas} "
+          f"({total:.1f}s)")
+    if len(cuentas) == 1 and not sin_aviso:
+        print("✅ Cada chat recibió sus avisos una sola vez")
+    else:
+        print(f"❌ Duplicados o faltantes (chats sin aviso: {sin_aviso})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
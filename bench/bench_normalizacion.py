@@ -0,0 +1,67 @@
+# bench/bench_normalizacion.py
+"""
+Búsquedas equivalentes escritas de distintas formas ("PS5 ", "ps5", "Ps5", "cámara"/"camara",
+min_price 0/None, envio "si"/"gratis"/"free"...): cuántas keys de vistos y URLs de listado distintas
+(= scrapes y entradas de caché) salen con los inputs crudos vs. con la búsqueda canónica.
+
+Uso (desde la raíz del repo):
+    python -m bench.bench_normalizacion [--busquedas 200]
+"""
+import argparse, hashlib, random
+from urllib.parse import quote_plus
+from busqueda import spec_canonica
+from scraper import construir_url
+
+BASES = ["ps5", "cámara sony", "iphone 13", "bicicleta todoterreno", "televisor 55 pulgadas", "nintendo switch",
+         "audífonos bluetooth", "silla gamer", "portátil lenovo", "reloj garmin"]
+
+
+def variante(q: str, rnd: random.Random) -> dict:
+    forma = rnd.choice([str.lower, str.upper, str.title, lambda s: s])(q)
+    if rnd.random() < 0.3:
+        forma = forma.replace("á", "a").replace("í", "i").replace("Á", "A").replace("Í", "I")
+    if rnd.random() < 0.3:
+        forma = forma.replace(" ", "  ") + " "
+    return {"q": forma, "min_price": rnd.choice([None, 0]), "max_price": None,
+            "condition": rnd.choice([None, "", "nuevo", "Nuevo", "new"]),
+            "envio": rnd.choice([None, "no", "gratis", "si", "free"]), "site": "mercadolibre.com.co"}
+
+
+def key_cruda(p: dict) -> str:
+    base = f"{p['q']}|{p['min_price']}|{p['max_price']}|{p['condition']}|{p['envio']}|{p['site']}|"
+    return hashlib.sha1(base.encode("utf-8")).hexdigest()
+
+
+def url_cruda(p: dict) -> str:
+    """construir_url sin normalizar (como era antes)."""
+    c = (p["condition"] or "").lower()
+    cond = {"nuevo": "_ITEM*CONDITION_2230284", "usado": "_ITEM*CONDITION_2230581"}.get(c, "")
+    envio = "_CostoEnvio_Gratis" if (p["envio"] and p["envio"].lower() in ["gratis", "si", "free"]) else ""
+    rango = f"_PriceRange_{p['min_price'] or 0}-{p['max_price'] or ''}" if (p["min_price"] or p["max_price"]) else ""
+    return f"https://listado.{p['site']}/{quote_plus(p['q'].replace(' ', '-'))}{cond}{envio}{rango}_NoIndex_True"
+
+
+def key_canonica(p: dict) -> str:
+    s = spec_canonica(**p)
+    return hashlib.sha1("|".join(str(s[k]) for k in ("q", "min_price", "max_price", "condition", "envio", "site"))
+                        .encode("utf-8")).hexdigest()
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--busquedas", type=int, default=200)
+    args = ap.parse_args()
+    rnd = random.Random(1)
+    ps = [variante(rnd.choice(BASES), rnd) for _ in range(args.busquedas)]
+
+    crudas = ({key_cruda(p) for p in ps}, {url_cruda(p) for p in ps})
+    canon = ({key_canonica(p) for p in ps}, {construir_url(p["q"], p["site"], p["min_price"], p["max_price"],
+                                                           p["condition"], p["envio"]) for p in ps})
+    print(f"{args.busquedas} búsquedas sobre {len(BASES)} productos")
+    print(f"{'':<12}{'keys':>8}{'urls':>8}")
+    print(f"{'crudas':<12}{len(crudas[0]):>8}{len(crudas[1]):>8}")
+    print(f"{'canónicas':<12}{len(canon[0]):>8}{len(canon[1]):>8}")
+
+
+if __name__ == "__main__":
+    main_cli()
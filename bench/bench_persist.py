@@ -0,0 +1,55 @@
+# bench/bench_persist.py
+"""
+Latencia de persistir un lote de links nuevos a medida que crece el store:
+reescritura completa del JSON (comportamiento anterior) vs. inserción incremental en SQLite WAL.
+
+Uso (desde la raíz del repo):
+    python -m bench.bench_persist [links_totales] [links_por_lote]
+"""
+import json, os, sys, tempfile, time
+from store import Store
+from seen_set import item_num
+
+
+def persist_json(path, seen, last_ts):
+    """Lo que hacía _sync_seen_to_disk: reconstruir todo el dict y reescribir el archivo."""
+    disk = {k: {"links": list(s), "last_update": last_ts.get(k, int(time.time()))} for k, s in seen.items()}
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(disk, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def main(total: int, lote: int):
+    with tempfile.TemporaryDirectory() as d:
+        json_path = os.path.join(d, "seen_store.json")
+        store = Store(os.path.join(d, "store.db"))
+        seen, last_ts = {}, {}
+        n, paso = 0, 0
+        print(f"{'links':>9} {'json ms':>10} {'sqlite ms':>10} {'json KB':>9}")
+        marcas = {int(total * f) for f in (0.01, 0.1, 0.25, 0.5, 0.75, 1.0)}
+        while n < total:
+            key = f"k{paso % 200}"
+            links = [f"https://www.mercadolibre.com.co/item/MCOU{n + i:010d}" for i in range(lote)]
+            seen.setdefault(key, set()).update(links)
+            last_ts[key] = int(time.time())
+            n += lote
+            paso += 1
+
+            t0 = time.perf_counter()
+            persist_json(json_path, seen, last_ts)
+            t_json = (time.perf_counter() - t0) * 1000
+
+            t0 = time.perf_counter()
+            store.add_seen(key, [item_num(l) for l in links], last_ts[key])
+            store.flush()
+            t_sql = (time.perf_counter() - t0) * 1000
+
+            if any(n - lote < m <= n for m in marcas):
+                print(f"{n:>9} {t_json:>10.2f} {t_sql:>10.2f} {os.path.getsize(json_path) / 1024:>9.0f}")
+        store.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 50)
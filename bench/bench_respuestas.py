@@ -0,0 +1,85 @@
+# bench/bench_respuestas.py
+"""
+Costo de responder /search (50 cards sintéticas, MercadoLibre falso, caché de scrape activa):
+1. serialización de la misma respuesta: encoder por defecto de FastAPI (jsonable_encoder + json) vs.
+   orjson vs. orjson + gzip — µs por respuesta y bytes
+2. `--polls` polls de GET /search sin nada nuevo: sin ETag (200 con el cuerpo completo cada vez) vs.
+   con If-None-Match (304 sin cuerpo) — latencia y bytes transferidos
+
+Uso (desde la raíz del repo):
+    python -m bench.bench_respuestas [--polls 200] [--cards 50]
+"""
+import argparse, asyncio, gzip, os, statistics, tempfile, time
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from bench.fake_servers import FakeMeli
+
+
+def us_por_vez(fn, n: int = 300) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+async def correr(args):
+    import main
+    from httpx import ASGITransport, AsyncClient
+
+    main.SEEN_FILE = main.WATCHES_FILE = main.PHONEMAP_FILE = os.path.join(args.tmp, "no-existe.json")
+    await main.on_startup()
+    while not main.ARRANQUE["ready"]:
+        await asyncio.sleep(0.01)
+    try:
+        d = await main._buscar("respuestas", engine="http")
+        print(f"▶ serialización ({d['returned']} cards)")
+        filas = [
+            ("fastapi", lambda: JSONResponse(jsonable_encoder(d)).body),
+            ("orjson", lambda: orjson.dumps(d)),
+            ("orjson+gzip", lambda: gzip.compress(orjson.dumps(d), main.GZIP_LEVEL)),
+        ]
+        print(f"{'encoder':<14}{'µs':>10}{'bytes':>10}")
+        for nombre, fn in filas:
+            print(f"{nombre:<14}{us_por_vez(fn):>10.0f}{len(fn()):>10}")
+
+        print(f"\n▶ {args.polls} polls de /search sin novedades")
+        async with AsyncClient(transport=ASGITransport(app=main.app), base_url="http://bench") as c:
+            params = {"q": "respuestas", "engine": "http"}
+            print(f"{'modo':<16}{'p50_ms':>10}{'p95_ms':>10}{'bytes/poll':>12}{'status':>10}")
+            for modo in ("sin ETag", "If-None-Match"):
+                r = await c.get("/search", params=params, headers={"Accept-Encoding": "gzip"})
+                etag = r.headers["etag"]
+                lat, total = [], 0
+                for _ in range(args.polls):
+                    h = {"Accept-Encoding": "gzip", **({"If-None-Match": etag} if modo != "sin ETag" else {})}
+                    t0 = time.perf_counter()
+                    r = await c.get("/search", params=params, headers=h)
+                    lat.append((time.perf_counter() - t0) * 1000)
+                    total += r.num_bytes_downloaded
+                lat.sort()
+                print(f"{modo:<16}{statistics.median(lat):>10.2f}{lat[int(0.95 * len(lat))]:>10.2f}"
+                      f"{total / args.polls:>12.0f}{r.status_code:>10}")
+    finally:
+        await main.on_shutdown()
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--polls", type=int, default=200)
+    ap.add_argument("--cards", type=int, default=50)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, FakeMeli(cards=args.cards) as meli:
+        args.tmp = tmp
+        os.environ.update({
+            "MELI_LISTADO_URL": meli.listado_url,
+            "STORE_DB": os.path.join(tmp, "respuestas.db"),
+            "SCRAPE_CACHE_TTL": "3600",   # el poll reutiliza el scrape: se mide sólo la respuesta
+            "BROWSER_POOL_SIZE": os.getenv("BROWSER_POOL_SIZE", "1"),
+        })
+        asyncio.run(correr(args))
+
+
+if __name__ == "__main__":
+    main_cli()
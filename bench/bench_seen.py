@@ -0,0 +1,37 @@
+# bench/bench_seen.py
+"""
+Huella de memoria de los vistos con N búsquedas: set de URLs (anterior) vs. SeenSet (IDs enteros) vs. BloomSeen.
+
+Uso (desde la raíz del repo):
+    python -m bench.bench_seen [keys] [items_por_key]
+"""
+import sys, tracemalloc
+from seen_set import SeenSet, BloomSeen, item_num
+
+LINK = "https://www.mercadolibre.com.co/juego-pokemon-sol-nintendo-3ds-usado/up/MCOU{:010d}?pdp_filters=price%3A%2A-150000"
+
+
+def medir(nombre, construir, keys, por_key):
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    seen = {f"k{k}": construir(k) for k in range(keys)}
+    usado = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    print(f"{nombre:<22} total={usado / 1024 / 1024:8.1f} MB   por key={usado / keys:9.0f} B   "
+          f"por item={usado / (keys * por_key):6.1f} B")
+    return seen
+
+
+def main(keys: int, por_key: int):
+    def links(k):
+        return [LINK.format(k * por_key + i) for i in range(por_key)]
+
+    print(f"{keys} búsquedas x {por_key} items")
+    medir("set[str] (anterior)", lambda k: set(links(k)), keys, por_key)
+    medir("SeenSet (exact)", lambda k: SeenSet(item_num(l) for l in links(k)), keys, por_key)
+    medir(f"BloomSeen cap={por_key}", lambda k: BloomSeen((item_num(l) for l in links(k)), capacity=por_key), keys, por_key)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 50)
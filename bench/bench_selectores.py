@@ -0,0 +1,49 @@
+# bench/bench_selectores.py
+"""
+Probes de selectores por card con el orden fijo de extractor.SELECTORES vs el orden aprendido por
+EstrategiaSelectores, sobre un listado donde sólo aciertan los selectores de respaldo
+(div.poly-card, h3 ... a, span.poly-price__fraction): el caso de un sitio con otro maquetado.
+Sin navegador (extraer_cards_html / Lexbor).
+
+Uso (desde la raíz del repo):
+    python -m bench.bench_selectores [repeticiones]
+"""
+import sys, time
+from extractor import EstrategiaSelectores, extraer_cards_html
+import extractor
+from bench.fake_servers import pagina_sintetica, plantilla_card
+
+
+def pagina_respaldo(n: int = 50) -> str:
+    """Listado sintético sin los selectores primarios (li de layout, a.poly-component__title, andes-money)."""
+    card = (plantilla_card()
+            .replace('<li class="ui-search-layout__item"', '<li class="otro-layout__item"')
+            .replace('class="poly-component__title"', 'class="otro-titulo"')
+            .replace("andes-money-amount__fraction", "poly-price__fraction"))
+    return pagina_sintetica(n, plantilla=card)
+
+
+def correr(nombre: str, html: str, reps: int, aprender: bool):
+    # ventana enorme = nunca reordena (orden fijo de la tabla)
+    extractor.ESTRATEGIA = est = EstrategiaSelectores(ventana=50 if aprender else 10**12)
+    extraer_cards_html(html, "bench")   # calentamiento (y primera ventana de aprendizaje)
+    est.probes = est.fallidos = 0
+    tiempos, cards = [], 0
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        cards = len(extraer_cards_html(html, "bench"))
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    tiempos.sort()
+    por_card = est.fallidos / (cards * reps) if cards else 0
+    print(f"{nombre:<10} cards={cards:<4} p50={tiempos[len(tiempos) // 2]:7.2f} ms  "
+          f"probes fallidos/card={por_card:5.2f}  reordenes={est.reordenes}")
+
+
+def main(reps: int):
+    html = pagina_respaldo()
+    correr("fijo", html, reps, aprender=False)
+    correr("aprendido", html, reps, aprender=True)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,242 @@
+# bench/bench_suite.py
+"""
+Suite de benchmarks sin red: levanta un MercadoLibre falso (listados grabados y sintéticos) y un
+Telegram falso, y mide el pipeline real:
+- scrape_http:    scraper.scrape_meli_http (descarga + parseo)
+- scrape_browser: scraper.scrape_meli con el pool de navegadores (se salta si no hay Chromium)
+- search:         GET /search completo (app FastAPI en proceso, vía ASGI)
+- subscribe:      POST /subscribe de `--watches` suscripciones
+- run_watch:      una corrida de todos los grupos (scrape + delta + encolado a Telegram)
+- telegram:       entrega de las notificaciones encoladas al Telegram falso
+
+Reporta percentiles de latencia, operaciones/s, RSS y mensajes/s, y compara contra un baseline guardado.
+
+Uso (desde la raíz del repo):
+    python -m bench.bench_suite [--iters 200] [--concurrency 10] [--watches 50] [--cards 50]
+                                [--save bench/baselines/local.json] [--compare bench/baselines/local.json]
+"""
+import argparse, asyncio, json, os, platform, sys, tempfile, time
+import psutil
+from bench.fake_servers import FakeMeli, FakeTelegram
+
+
+def percentiles(ms: list[float]) -> dict:
+    if not ms:
+        return {}
+    s = sorted(ms)
+
+    def p(q):
+        return round(s[min(len(s) - 1, int(q * len(s)))], 2)
+
+    return {"p50_ms": p(0.50), "p95_ms": p(0.95), "p99_ms": p(0.99), "max_ms": round(s[-1], 2)}
+
+
+def rss_mb() -> float:
+    proc = psutil.Process()
+    total = proc.memory_info().rss
+    for c in proc.children(recursive=True):
+        try:
+            total += c.memory_info().rss
+        except psutil.Error:
+            pass
+    return round(total / (1024 * 1024), 1)
+
+
+async def medir_concurrente(fn, iters: int, concurrency: int) -> dict:
+    """Corre `await fn(i)` iters veces con `concurrency` a la vez; latencias y throughput."""
+    sem = asyncio.Semaphore(concurrency)
+    lat, errores = [], 0
+
+    async def una(i):
+        nonlocal errores
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                await fn(i)
+            except Exception as e:
+                errores += 1
+                if errores <= 3:
+                    print(f"   ⚠️ {e.__class__.__name__}: {e}")
+                return
+            lat.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(una(i) for i in range(iters)))
+    total = time.perf_counter() - t0
+    return {**percentiles(lat), "ops_s": round(len(lat) / total, 1) if total else 0,
+            "errors": errores, "rss_mb": rss_mb()}
+
+
+async def correr(args, meli: FakeMeli, tg: FakeTelegram) -> dict:
+    import main, scraper
+    from httpx import ASGITransport, AsyncClient
+
+    # sin JSON viejos que migrar: store limpio
+    main.SEEN_FILE = main.WATCHES_FILE = main.PHONEMAP_FILE = os.path.join(args.tmp, "no-existe.json")
+    await main.on_startup()
+    while not main.ARRANQUE["ready"]:   # Telegram y navegadores se inician en segundo plano
+        await asyncio.sleep(0.01)
+    res = {}
+    try:
+        print("▶ scrape_http")
+        res["scrape_http"] = await medir_concurrente(
+            lambda i: scraper.scrape_meli_http(f"bench-http-{i % args.queries}"), args.iters, args.concurrency)
+
+        print("▶ scrape_browser")
+        if main.browser_pool.iniciado:
+            res["scrape_browser"] = await medir_concurrente(
+                lambda i: scraper.scrape_meli(f"bench-br-{i % args.queries}", pool=main.browser_pool),
+                max(1, args.iters // 10), min(args.concurrency, 4))
+        else:
+            res["scrape_browser"] = {"skipped": "sin Chromium (playwright install chromium)"}
+
+        async with AsyncClient(transport=ASGITransport(app=main.app), base_url="http://bench") as c:
+            print("▶ search")
+
+            async def buscar(i):
+                r = await c.get("/search", params={"q": f"bench-search-{i % args.queries}", "engine": "http"})
+                d = r.json()
+                if "error" in d:
+                    raise RuntimeError(d["error"])
+
+            res["search"] = await medir_concurrente(buscar, args.iters, args.concurrency)
+
+            print("▶ subscribe")
+            grupos = set()
+
+            async def suscribir(i):
+                phone = f"57300{i:05d}"
+                await c.post("/register_chat", json={"phone": phone, "chat_id": str(100000 + i)})
+                r = await c.post("/subscribe", json={"q": f"bench-watch-{i % max(1, args.watches // args.per_group)}",
+                                                     "phone": phone, "engine": "http", "interval_sec": 3600})
+                grupos.add(r.json()["group"])
+
+            res["subscribe"] = await medir_concurrente(suscribir, args.watches, args.concurrency)
+
+        print(f"▶ run_watch ({len(grupos)} grupos)")
+        mensajes0 = tg.messages
+        lat = []
+
+        async def grupo(g):
+            t0 = time.perf_counter()
+            await main.run_group(g)
+            lat.append((time.perf_counter() - t0) * 1000)
+
+        t_run = t0 = time.perf_counter()
+        await asyncio.gather(*(grupo(g) for g in grupos))
+        total = time.perf_counter() - t0
+        res["run_watch"] = {**percentiles(lat), "ops_s": round(len(lat) / total, 1) if total else 0,
+                            "groups": len(grupos), "watches": args.watches, "rss_mb": rss_mb()}
+
+        print("▶ telegram")
+        t0 = time.perf_counter()
+        if not await main.telegram.drain(args.timeout):
+            print("   ⚠️ timeout esperando a que se vacíe la cola de Telegram")
+        drain = time.perf_counter() - t0
+        enviados = tg.messages - mensajes0
+        # throughput de entrega: desde que empezó run_watch (encolado) hasta el último mensaje recibido
+        ventana = (tg.ultimo - t_run) if tg.ultimo else 0
+        res["telegram"] = {"messages": enviados, "calls": sum(tg.calls.values()), "rate_limited": tg.rate_limited,
+                           "drain_s": round(drain, 2), "msgs_s": round(enviados / ventana, 1) if ventana > 0 else 0,
+                           **{f"notifier_{k}": v for k, v in main.telegram.stats().items()
+                              if k in ("retries", "failed", "file_id_hit_rate", "invalid_images")},
+                           "photos_by_url": tg.fotos_url, "photos_by_file_id": tg.fotos_file_id}
+        res["meta"] = {"fake_meli_requests": meli.requests, "rss_mb": rss_mb()}
+    finally:
+        await main.on_shutdown()
+    return res
+
+
+# ------------ baseline ------------
+def comparar(actual: dict, base: dict, tolerancia: float) -> list[str]:
+    """Regresiones: latencias (_ms) que subieron o throughputs (_s) que bajaron más que `tolerancia`."""
+    malas = []
+    for esc, m in actual.items():
+        b = base.get("results", {}).get(esc, {})
+        for k, v in m.items():
+            bv = b.get(k)
+            if not isinstance(v, (int, float)) or not isinstance(bv, (int, float)) or not bv or k == "max_ms":
+                continue   # max_ms es un solo dato: demasiado ruidoso para marcar regresiones
+            if k.endswith("_ms") and v > bv * (1 + tolerancia):
+                malas.append(f"{esc}.{k}: {bv} -> {v} (+{(v / bv - 1) * 100:.0f}%)")
+            elif k.endswith("_s") and not k.startswith("drain") and v < bv * (1 - tolerancia):
+                malas.append(f"{esc}.{k}: {bv} -> {v} ({(v / bv - 1) * 100:.0f}%)")
+    return malas
+
+
+def imprimir(res: dict):
+    cols = ("p50_ms", "p95_ms", "p99_ms", "max_ms", "ops_s", "errors", "rss_mb")
+    print(f"\n{'escenario':<15}" + "".join(f"{c:>10}" for c in cols))
+    for esc, m in res.items():
+        if esc in ("telegram", "meta"):
+            continue
+        if "skipped" in m:
+            print(f"{esc:<15}  (saltado: {m['skipped']})")
+            continue
+        print(f"{esc:<15}" + "".join(f"{m.get(c, ''):>10}" for c in cols))
+    t = res.get("telegram", {})
+    print(f"\ntelegram: {t.get('messages')} mensajes en {t.get('calls')} llamadas, {t.get('msgs_s')} msg/s "
+          f"(429: {t.get('rate_limited')}, reintentos: {t.get('notifier_retries')})")
+    print(f"fotos: {t.get('photos_by_url')} por URL, {t.get('photos_by_file_id')} por file_id "
+          f"(hit rate {t.get('notifier_file_id_hit_rate')})")
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--iters", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=10)
+    ap.add_argument("--queries", type=int, default=50, help="búsquedas distintas (afecta la caché)")
+    ap.add_argument("--watches", type=int, default=50)
+    ap.add_argument("--per-group", type=int, default=2, help="suscriptores por grupo de búsqueda")
+    ap.add_argument("--cards", type=int, default=50, help="cards por página sintética")
+    ap.add_argument("--meli-latency-ms", type=float, default=0)
+    ap.add_argument("--tg-latency-ms", type=float, default=0)
+    ap.add_argument("--tg-fail-every", type=int, default=0, help="una de cada n llamadas a Telegram da 429")
+    ap.add_argument("--cache-ttl", type=float, default=0, help="SCRAPE_CACHE_TTL durante la suite (0 = sin caché)")
+    ap.add_argument("--tg-rate", type=float, default=1000, help="TELEGRAM_GLOBAL_RATE y _CHAT_RATE durante la suite")
+    ap.add_argument("--timeout", type=float, default=60)
+    ap.add_argument("--save", help="guardar resultados como baseline (JSON)")
+    ap.add_argument("--compare", help="baseline contra el que comparar")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="margen antes de marcar regresión (0.25 = 25%%)")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            FakeMeli(cards=args.cards, latency_ms=args.meli_latency_ms) as meli, \
+            FakeTelegram(latency_ms=args.tg_latency_ms, fail_every=args.tg_fail_every) as tg:
+        args.tmp = tmp
+        # la configuración se lee al importar main/scraper/notifier: fijarla antes
+        os.environ.update({
+            "MELI_LISTADO_URL": meli.listado_url,
+            "TELEGRAM_API_URL": tg.api_url,
+            "TELEGRAM_BOT_TOKEN": "bench",   # el Telegram falso acepta cualquiera
+            "STORE_DB": os.path.join(tmp, "bench.db"),
+            "SCRAPE_CACHE_TTL": str(args.cache_ttl),
+            "TELEGRAM_GLOBAL_RATE": str(args.tg_rate),
+            "TELEGRAM_CHAT_RATE": str(args.tg_rate),
+            "BROWSER_POOL_SIZE": os.getenv("BROWSER_POOL_SIZE", "1"),
+        })
+        res = asyncio.run(correr(args, meli, tg))
+
+    imprimir(res)
+    salida = {"results": res, "args": {k: v for k, v in vars(args).items() if k not in ("tmp", "save", "compare")},
+              "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                          "cpus": os.cpu_count()}, "ts": int(time.time())}
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(salida, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Baseline guardado en {args.save}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            base = json.load(f)
+        malas = comparar(res, base, args.tolerance)
+        if malas:
+            print(f"\n❌ Regresiones contra {args.compare} (tolerancia {args.tolerance:.0%}):")
+            for m in malas:
+                print("  -", m)
+            sys.exit(1)
+        print(f"\n✅ Sin regresiones contra {args.compare} (tolerancia {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main_cli()
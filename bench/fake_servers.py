@@ -0,0 +1,185 @@
+# bench/fake_servers.py
+"""
+Servidores locales para benchmarks sin red:
+- FakeMeli:     hace de `listado.<site>` (apuntar MELI_LISTADO_URL a `FakeMeli.listado_url`).
+                Sirve debug_page.html, resultados.html y páginas sintéticas con N cards.
+- FakeTelegram: Bot API mínima (sendMessage / sendPhoto / sendMediaGroup), cuenta los envíos.
+
+Cada uno corre con uvicorn en un hilo propio, para no competir con el event loop medido.
+
+    with FakeMeli(cards=50) as meli, FakeTelegram() as tg:
+        os.environ["MELI_LISTADO_URL"] = meli.listado_url
+        ...
+"""
+import asyncio, os, re, socket, threading, time, zlib
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, JSONResponse
+from starlette.routing import Route
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_ITEM = re.compile(r"M[A-Z]{2}U?-?\d{6,}")
+_DESDE = re.compile(r"_Desde_(\d+)")
+
+
+PAGINA_CAPTCHA = ('<!DOCTYPE html><html><head><title>Mercado Libre</title></head><body>'
+                  '<div id="px-captcha"></div><p>Para continuar, confirma que no eres un robot.</p></body></html>')
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _leer(nombre: str) -> str:
+    with open(os.path.join(RAIZ, nombre), encoding="utf-8") as f:
+        return f.read()
+
+
+def plantilla_card() -> str:
+    """HTML de UNA card real (la primera <li> de debug_page.html), para clonar."""
+    html = _leer("debug_page.html")
+    inicios = [m.start() for m in re.finditer(r'<li class="ui-search-layout__item"', html)]
+    return html[inicios[0]:inicios[1]]
+
+
+def pagina_sintetica(n: int, desde: int = 0, plantilla: str | None = None) -> str:
+    """Listado con `n` cards con IDs únicos a partir de `desde` (una página distinta por offset)."""
+    plantilla = plantilla or plantilla_card()
+    cards = [_ITEM.sub(f"MCOU{9_000_000_000 + desde + i}", plantilla) for i in range(n)]
+    return ('<!DOCTYPE html><html><head><meta charset="utf-8"></head><body>'
+            '<ol class="ui-search-layout">' + "".join(cards) + "</ol></body></html>")
+
+
+class _Servidor:
+    """Uvicorn en un hilo; `with` lo arranca y lo para."""
+    def __init__(self, app, port: int | None = None):
+        self.port = port or _puerto_libre()
+        self._server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port,
+                                                     log_level="warning", access_log=False))
+        self._hilo = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self._hilo.start()
+        while not self._server.started:
+            time.sleep(0.02)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._hilo.join(5)
+
+
+class FakeMeli(_Servidor):
+    """
+    GET /<site>/<slug>:
+    - slug que empieza con "debug"      -> debug_page.html
+    - slug que empieza con "resultados" -> resultados.html
+    - "vacio"                           -> listado sin cards
+    - "bloqueo"                         -> página de captcha (como cuando MercadoLibre bloquea)
+    - cualquier otro                    -> página sintética con `cards` cards (IDs según _Desde_ y el slug)
+    `latency_ms` simula la demora del servidor real. Con `bloqueado = True` TODO responde la página de captcha
+    (`bloqueos` cuenta cuántas se sirvieron).
+    """
+    def __init__(self, cards: int = 50, latency_ms: float = 0.0, port: int | None = None):
+        self.cards = cards
+        self.latency_ms = latency_ms
+        self.requests = 0
+        self.bloqueado = False
+        self.bloqueos = 0
+        self._fijas = {"debug": _leer("debug_page.html"), "resultados": _leer("resultados.html")}
+        self._plantilla = plantilla_card()
+        self._cache: dict[tuple, str] = {}
+        super().__init__(Starlette(routes=[Route("/{site}/{slug:path}", self._listado)]), port)
+
+    @property
+    def listado_url(self) -> str:
+        return self.url + "/{site}"
+
+    async def _listado(self, request: Request):
+        self.requests += 1
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        slug = request.path_params["slug"]
+        if self.bloqueado or slug.startswith("bloqueo"):
+            self.bloqueos += 1
+            return HTMLResponse(PAGINA_CAPTCHA)
+        for nombre, html in self._fijas.items():
+            if slug.startswith(nombre):
+                return HTMLResponse(html)
+        if slug.startswith("vacio"):
+            return HTMLResponse("<html><body><ol></ol></body></html>")
+        m = _DESDE.search(slug)
+        # cada query distinta tiene su propio rango de IDs; _Desde_ avanza dentro de él
+        desde = (zlib.crc32(slug.split("_")[0].encode()) % 10_000) * 100_000 + (int(m.group(1)) - 1 if m else 0)
+        k = (self.cards, desde)
+        if k not in self._cache:
+            self._cache[k] = pagina_sintetica(self.cards, desde, self._plantilla)
+        return HTMLResponse(self._cache[k])
+
+
+class FakeTelegram(_Servidor):
+    """
+    POST /bot<token>/<method>: responde ok y cuenta. Con `fail_every=n`, una de cada n llamadas
+    devuelve 429 con retry_after=`retry_after` (para ejercitar los reintentos del notifier).
+    Las fotos devuelven un file_id por URL; `fotos_url` / `fotos_file_id` cuentan cómo llegó cada foto.
+    Una URL de foto con "roto" responde 400, como una imagen que Telegram no puede descargar.
+    """
+    def __init__(self, latency_ms: float = 0.0, fail_every: int = 0, retry_after: float = 0.1,
+                 port: int | None = None):
+        self.latency_ms = latency_ms
+        self.fail_every = fail_every
+        self.retry_after = retry_after
+        self.calls: dict[str, int] = {}
+        self.messages = 0          # mensajes entregados (un álbum de 10 cuenta 10)
+        self.por_chat: dict[str, int] = {}
+        self.rate_limited = 0
+        self.fotos_url = 0
+        self.fotos_file_id = 0
+        self.primero: float | None = None
+        self.ultimo: float | None = None
+        self._n = 0
+        super().__init__(Starlette(routes=[Route("/bot{token}/{method}", self._api, methods=["POST"])]), port)
+
+    @property
+    def api_url(self) -> str:
+        return self.url   # TELEGRAM_API_URL
+
+    async def _api(self, request: Request):
+        method = request.path_params["method"]
+        payload = await request.json()
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        self._n += 1
+        if self.fail_every and self._n % self.fail_every == 0:
+            self.rate_limited += 1
+            return JSONResponse({"ok": False, "error_code": 429, "description": "Too Many Requests",
+                                 "parameters": {"retry_after": self.retry_after}}, status_code=429)
+        fotos = [m["media"] for m in payload.get("media", ())] or ([payload["photo"]] if "photo" in payload else [])
+        if any("roto" in f for f in fotos):
+            return JSONResponse({"ok": False, "error_code": 400,
+                                 "description": "Bad Request: wrong file identifier/HTTP URL specified"},
+                                status_code=400)
+        por_url = sum(f.startswith("http") for f in fotos)
+        self.fotos_url += por_url
+        self.fotos_file_id += len(fotos) - por_url
+        self.calls[method] = self.calls.get(method, 0) + 1
+        n = len(payload.get("media", ())) or 1
+        self.messages += n
+        chat = str(payload.get("chat_id"))
+        self.por_chat[chat] = self.por_chat.get(chat, 0) + n
+        ahora = time.perf_counter()
+        self.primero = self.primero or ahora
+        self.ultimo = ahora
+        mensajes = [{"message_id": self._n, **({"photo": [{"file_id": f if not f.startswith("http")
+                                                             else f"F{zlib.crc32(f.encode()):08x}"}]} if f else {})}
+                    for f in (fotos or [None])]
+        if method == "sendMediaGroup":
+            return JSONResponse({"ok": True, "result": mensajes})
+        return JSONResponse({"ok": True, "result": mensajes[0]})
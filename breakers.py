@@ -0,0 +1,132 @@
+# breakers.py
+import time
+from contextlib import contextmanager
+from metrics import contar
+
+CERRADO, ABIERTO, PROBANDO = "closed", "open", "half_open"
+
+
+class CircuitoAbierto(RuntimeError):
+    """El sitio tiene el circuito abierto: no se scrapea hasta la próxima prueba."""
+    def __init__(self, site: str, reintento_en: float, motivo: str | None = None):
+        self.site = site
+        self.reintento_en = reintento_en
+        super().__init__(f"circuito abierto para {site} (prueba en {reintento_en:.0f}s"
+                         + (f"; último fallo: {motivo})" if motivo else ")"))
+
+
+class _Circuito:
+    def __init__(self):
+        self.estado = CERRADO
+        self.fallos = 0              # fallos seguidos
+        self.aperturas = 0           # aperturas seguidas sin una prueba exitosa (para el backoff)
+        self.hasta = 0.0             # abierto hasta (epoch): después se deja pasar UNA prueba
+        self.probando = False
+        self.motivo: str | None = None
+        self.total_fallos = 0
+        self.rechazados = 0
+        self.perdido = 0.0           # segundos gastados en scrapes que fallaron
+        self.cambio = 0.0
+
+
+class Breakers:
+    """
+    Circuit breaker por sitio para los scrapes:
+    - cerrado: todo pasa; `umbral` fallos seguidos (bloqueo, timeout, error HTTP...) lo abren.
+    - abierto: se rechaza al instante (CircuitoAbierto) durante `abierto_sec`, que se duplica con cada
+      apertura seguida hasta `max_abierto_sec`.
+    - pasado ese tiempo deja pasar UN scrape de prueba (half_open): si anda se cierra, si falla se reabre.
+    Lleva la cuenta del tiempo perdido en fallos y de los scrapes que se ahorró rechazando.
+    """
+    def __init__(self, umbral: int = 3, abierto_sec: float = 60.0, max_abierto_sec: float = 900.0):
+        self.umbral = max(1, umbral)
+        self.abierto_sec = abierto_sec
+        self.max_abierto_sec = max(abierto_sec, max_abierto_sec)
+        self._sitios: dict[str, _Circuito] = {}
+
+    def _c(self, site: str) -> _Circuito:
+        c = self._sitios.get(site)
+        if c is None:
+            c = self._sitios[site] = _Circuito()
+        return c
+
+    def _pasar(self, site: str, c: _Circuito, estado: str):
+        if c.estado != estado:
+            c.estado, c.cambio = estado, time.time()
+            contar("breaker_transitions_total", site=site, state=estado)
+            print(f"🔌 Circuito de {site}: {estado}" + (f" ({c.motivo})" if estado == ABIERTO else ""))
+
+    def reintento_en(self, site: str) -> float:
+        """Segundos hasta que el circuito de `site` deje pasar una prueba (0 si está cerrado o probando)."""
+        c = self._sitios.get(site)
+        return max(0.0, c.hasta - time.time()) if c and c.estado == ABIERTO else 0.0
+
+    def permitir(self, site: str) -> bool:
+        """True si el scrape puede salir; el que recibe True en half_open ES la prueba (debe informar el resultado)."""
+        c = self._c(site)
+        if c.estado == ABIERTO and time.time() >= c.hasta:
+            self._pasar(site, c, PROBANDO)
+        if c.estado == CERRADO:
+            return True
+        if c.estado == PROBANDO and not c.probando:
+            c.probando = True
+            return True
+        c.rechazados += 1
+        contar("breaker_rejected_total", site=site)
+        return False
+
+    def exito(self, site: str):
+        c = self._c(site)
+        c.fallos = c.aperturas = 0
+        c.probando = False
+        self._pasar(site, c, CERRADO)
+
+    def fallo(self, site: str, dt: float = 0.0, motivo: str | None = None):
+        c = self._c(site)
+        c.fallos += 1
+        c.total_fallos += 1
+        c.perdido += dt
+        c.motivo = motivo
+        contar("breaker_failures_total", site=site)
+        # ya abierto: fallos de scrapes que habían salido antes de abrirse; no alargan la espera
+        if c.estado == PROBANDO or (c.estado == CERRADO and c.fallos >= self.umbral):
+            c.probando = False
+            c.hasta = time.time() + min(self.max_abierto_sec, self.abierto_sec * 2 ** c.aperturas)
+            c.aperturas += 1
+            self._pasar(site, c, ABIERTO)
+
+    @contextmanager
+    def llamada(self, site: str):
+        """Envuelve un scrape: rechaza con CircuitoAbierto si corresponde y registra éxito/fallo y su duración."""
+        if not self.permitir(site):
+            c = self._c(site)
+            raise CircuitoAbierto(site, self.reintento_en(site), c.motivo)
+        t0 = time.perf_counter()
+        try:
+            yield
+        except ValueError:
+            self._c(site).probando = False   # parámetros inválidos: no dicen nada del sitio
+            raise
+        except Exception as e:
+            self.fallo(site, time.perf_counter() - t0, f"{e.__class__.__name__}: {e}"[:200])
+            raise
+        except BaseException:
+            self._c(site).probando = False   # cancelado: la prueba queda libre para otro
+            raise
+        else:
+            self.exito(site)
+
+    def stats(self) -> dict:
+        ahora = time.time()
+        sitios = {}
+        for site, c in self._sitios.items():
+            prom = c.perdido / c.total_fallos if c.total_fallos else 0.0
+            sitios[site] = {"state": c.estado, "consecutive_failures": c.fallos, "failures": c.total_fallos,
+                            "rejected": c.rechazados, "opens_in_a_row": c.aperturas,
+                            "retry_in_s": round(max(0.0, c.hasta - ahora), 1) if c.estado == ABIERTO else 0,
+                            "lost_s": round(c.perdido, 1),
+                            # cada rechazo ahorró (en promedio) lo que tarda un scrape fallido
+                            "saved_s_est": round(c.rechazados * prom, 1),
+                            "last_error": c.motivo, "since": int(c.cambio) or None}
+        return {"threshold": self.umbral, "open_sec": self.abierto_sec, "max_open_sec": self.max_abierto_sec,
+                "open": sorted(s for s, d in sitios.items() if d["state"] != CERRADO), "sites": sitios}
@@ -0,0 +1,273 @@
+# browser_pool.py
+import asyncio, os, time
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+import psutil
+from metrics import medir
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/122.0.0.0 Safari/537.36"
+)
+
+# ------------ bloqueo de recursos ------------
+# Las imágenes se leen de los atributos src/data-src: no hace falta descargar píxeles, fuentes, ads ni analítica.
+_HOSTS_PROPIOS = ("mercadolibre.", "mercadolivre.", "mlstatic.com")
+_TRACKING = ("melidata", "/tracks", "data.mercadolibre.", "click1.mercadolibre.", "mercadoclics")
+
+PERFILES_BLOQUEO = {
+    "none":       {"types": set(),                                            "third_party": False},
+    "default":    {"types": {"image", "media", "font"},                       "third_party": True},
+    # el listado es server-rendered: sin CSS ni JS las cards siguen en el HTML
+    "aggressive": {"types": {"image", "media", "font", "stylesheet", "script"}, "third_party": True},
+}
+PERFIL_BLOQUEO = os.getenv("SCRAPE_BLOCK_PROFILE", "default")
+
+
+def debe_bloquear(url: str, resource_type: str, perfil: str = PERFIL_BLOQUEO) -> bool:
+    conf = PERFILES_BLOQUEO.get(perfil, PERFILES_BLOQUEO["default"])
+    if resource_type == "document":
+        return False
+    if resource_type in conf["types"]:
+        return True
+    if conf["third_party"]:
+        host = urlparse(url).hostname or ""
+        if not any(h in host for h in _HOSTS_PROPIOS) or any(t in url for t in _TRACKING):
+            return True
+    return False
+
+
+class MedidorRed:
+    """Cuenta peticiones, bloqueos y bytes recibidos (tamaño codificado según Chromium/CDP) de una página."""
+    def __init__(self, perfil: str = PERFIL_BLOQUEO):
+        self.perfil = perfil
+        self.requests = 0
+        self.blocked = 0
+        self.bytes = 0
+        self._t0 = time.perf_counter()
+
+    def _on_loading_finished(self, ev):
+        self.bytes += int(ev.get("encodedDataLength") or 0)
+
+    def _decidir(self, request) -> bool:
+        self.requests += 1
+        if debe_bloquear(request.url, request.resource_type, self.perfil):
+            self.blocked += 1
+            return True
+        return False
+
+    async def instalar(self, page):
+        """Activa el bloqueo y la medición en una página de la API async."""
+        async def _route(route):
+            if self._decidir(route.request): await route.abort()
+            else: await route.continue_()
+        await page.route("**/*", _route)
+        try:
+            cdp = await page.context.new_cdp_session(page)
+            cdp.on("Network.loadingFinished", self._on_loading_finished)
+            await cdp.send("Network.enable")
+        except Exception:
+            pass   # sin CDP (navegador no Chromium): sólo se pierde el conteo de bytes
+
+    def instalar_sync(self, page):
+        """Igual que instalar(), para la API síncrona."""
+        def _route(route):
+            if self._decidir(route.request): route.abort()
+            else: route.continue_()
+        page.route("**/*", _route)
+        try:
+            cdp = page.context.new_cdp_session(page)
+            cdp.on("Network.loadingFinished", self._on_loading_finished)
+            cdp.send("Network.enable")
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        return {"ms": round((time.perf_counter() - self._t0) * 1000, 1), "bytes": self.bytes,
+                "requests": self.requests, "blocked": self.blocked, "block_profile": self.perfil}
+
+
+class _Slot:
+    """Un navegador Chromium del pool y sus contadores."""
+    def __init__(self, idx: int):
+        self.idx = idx
+        self.browser = None
+        self.paginas = 0       # páginas servidas desde el último lanzamiento
+        self.activas = 0       # contextos abiertos ahora mismo
+        self.lanzado = 0.0
+        self.reciclajes = 0
+        self.reciclar = False  # marcado para relanzar cuando quede libre
+        self.lock = asyncio.Lock()
+
+    def sano(self) -> bool:
+        return self.browser is not None and self.browser.is_connected()
+
+
+class BrowserPool:
+    """
+    Pool de N navegadores Chromium de larga vida.
+    Cada scrape recibe un contexto NUEVO (cookies/cache aisladas) sobre un navegador ya caliente.
+    - Recicla un navegador tras `max_pages` páginas o si el RSS total de Chromium supera el límite.
+    - Un chequeo periódico relanza navegadores caídos.
+    """
+    def __init__(self, size: int = 2, max_pages: int = 200, max_rss_mb: int = 1500,
+                 contexts_per_browser: int = 4, health_interval: float = 30.0):
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.contexts_per_browser = max(1, contexts_per_browser)
+        self.health_interval = health_interval
+        self._pw = None
+        self._listo = False
+        self._slots: list[_Slot] = []
+        self._sem = None
+        self._health_task = None
+
+    @property
+    def iniciado(self) -> bool:
+        return self._listo   # mientras arranca, los scrapes lanzan su propio navegador
+
+    async def start(self):
+        if self._pw is not None: return
+        from playwright.async_api import async_playwright   # diferido: importar la app no carga Playwright
+        self._pw = await async_playwright().start()
+        self._slots = [_Slot(i) for i in range(self.size)]
+        self._sem = asyncio.Semaphore(self.size * self.contexts_per_browser)
+        try:
+            for s in self._slots:
+                await self._lanzar(s)
+        except Exception:
+            await self._pw.stop()
+            self._pw = None
+            raise
+        self._health_task = asyncio.create_task(self._health_loop())
+        self._listo = True
+
+    async def stop(self):
+        if self._pw is None: return
+        self._listo = False
+        if self._health_task:
+            self._health_task.cancel()
+            try: await self._health_task
+            except asyncio.CancelledError: pass
+            self._health_task = None
+        for s in self._slots:
+            await self._cerrar(s)
+        await self._pw.stop()
+        self._pw = None
+        self._slots = []
+
+    # ---------- ciclo de vida de cada navegador ----------
+    async def _lanzar(self, s: _Slot):
+        with medir("browser_launch", engine="browser"):
+            s.browser = await self._pw.chromium.launch(headless=True)
+        s.paginas = 0
+        s.lanzado = time.time()
+        s.reciclar = False
+
+    async def _cerrar(self, s: _Slot):
+        if s.browser is None: return
+        try:
+            await s.browser.close()
+        except Exception:
+            pass
+        s.browser = None
+
+    async def _relanzar(self, s: _Slot):
+        async with s.lock:
+            # otro llamador pudo haberlo relanzado mientras esperábamos el lock: no cerrar ese navegador nuevo
+            if s.sano() and not s.reciclar:
+                return
+            await self._cerrar(s)
+            await self._lanzar(s)
+            s.reciclajes += 1
+
+    def _elegir_slot(self) -> _Slot:
+        # preferir navegadores que no estén esperando reciclaje, con menos contextos abiertos
+        candidatos = [s for s in self._slots if not s.reciclar] or self._slots
+        return min(candidatos, key=lambda s: s.activas)
+
+    # ---------- API pública ----------
+    @asynccontextmanager
+    async def page(self):
+        """Entrega una página en un contexto nuevo; lo cierra al salir."""
+        if not self.iniciado:
+            raise RuntimeError("BrowserPool no iniciado (llama a start())")
+        async with self._sem:
+            s = self._elegir_slot()
+            if not s.sano():
+                await self._relanzar(s)
+            s.activas += 1
+            context = None
+            try:
+                async with s.lock:   # no crear contextos mientras el navegador se relanza
+                    context = await s.browser.new_context(user_agent=USER_AGENT)
+                page = await context.new_page()
+                yield page
+            finally:
+                if context is not None:
+                    try: await context.close()
+                    except Exception: pass
+                s.activas -= 1
+                s.paginas += 1
+                if s.paginas >= self.max_pages:
+                    s.reciclar = True
+                if s.reciclar and s.activas == 0:
+                    await self._relanzar(s)
+
+    # ---------- salud y memoria ----------
+    def rss_mb(self) -> float:
+        """RSS total (MB) de los procesos Chromium hijos de este proceso."""
+        total = 0
+        try:
+            for p in psutil.Process().children(recursive=True):
+                try:
+                    if "chrom" in p.name().lower():
+                        total += p.memory_info().rss
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    pass
+        except psutil.Error:
+            pass
+        return total / (1024 * 1024)
+
+    async def check_health(self):
+        for s in self._slots:
+            if not s.sano() and s.activas == 0:
+                print(f"♻️ Navegador {s.idx} caído, relanzando…")
+                await self._relanzar(s)
+        if self.max_rss_mb and self.rss_mb() > self.max_rss_mb:
+            # reciclar el que más páginas lleva; se relanza al quedar libre
+            s = max(self._slots, key=lambda s: s.paginas)
+            s.reciclar = True
+            if s.activas == 0:
+                await self._relanzar(s)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                print("⚠️ Error en chequeo del pool:", e)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "rss_mb": round(self.rss_mb(), 1),
+            "browsers": [
+                {"idx": s.idx, "connected": s.sano(), "pages": s.paginas, "active": s.activas,
+                 "recycles": s.reciclajes, "uptime_s": int(time.time() - s.lanzado) if s.lanzado else 0}
+                for s in self._slots
+            ],
+        }
+
+
+def pool_from_env() -> BrowserPool:
+    """Crea el pool con la configuración de variables de entorno."""
+    return BrowserPool(
+        size=int(os.getenv("BROWSER_POOL_SIZE", "2")),
+        max_pages=int(os.getenv("BROWSER_MAX_PAGES", "200")),
+        max_rss_mb=int(os.getenv("BROWSER_MAX_RSS_MB", "1500")),
+        contexts_per_browser=int(os.getenv("BROWSER_CONTEXTS", "4")),
+    )
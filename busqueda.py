@@ -0,0 +1,61 @@
+# busqueda.py
+import unicodedata
+
+SITE_DEFAULT = "mercadolibre.com.co"
+# sinónimos que llegan desde la API, el frontend y los JSON viejos
+_CONDICIONES = {"nuevo": "nuevo", "nueva": "nuevo", "new": "nuevo",
+                "usado": "usado", "usada": "usado", "used": "usado"}
+_ENVIO_GRATIS = {"gratis", "si", "true", "1", "yes", "free"}
+
+
+def normalizar_q(q) -> str:
+    """
+    Minúsculas, sin tildes ni diéresis (la ñ se conserva) y con los espacios colapsados:
+    "PS5 ", "ps5" y "Ps5" son la misma búsqueda; "cámara" y "camara" también.
+    """
+    s = " ".join(str(q or "").split()).lower()
+    return "".join(c if c == "ñ" else "".join(x for x in unicodedata.normalize("NFKD", c)
+                                              if not unicodedata.combining(x))
+                   for c in s)
+
+
+def normalizar_condicion(condition) -> str | None:
+    """"nuevo" / "usado" (y sinónimos); cualquier otra cosa es "sin filtro" (None), como en construir_url."""
+    return _CONDICIONES.get(normalizar_q(condition)) if condition else None
+
+
+def normalizar_envio(envio) -> str | None:
+    """"gratis" (gratis/si/sí/free/true...) o None: "no" y vacío no filtran."""
+    return "gratis" if envio and normalizar_q(envio) in _ENVIO_GRATIS else None
+
+
+def normalizar_precios(min_price, max_price) -> tuple[int | None, int | None]:
+    """Enteros; 0, negativos y vacíos = sin tope. Un rango al revés se da vuelta."""
+    def _p(v):
+        if v is None or v == "":
+            return None
+        v = int(float(v))
+        return v if v > 0 else None
+    lo, hi = _p(min_price), _p(max_price)
+    if lo is not None and hi is not None and lo > hi:
+        lo, hi = hi, lo
+    return lo, hi
+
+
+def normalizar_site(site) -> str:
+    """"https://listado.MercadoLibre.com.co/" -> "mercadolibre.com.co"."""
+    s = str(site or "").strip().lower()
+    s = s.split("://", 1)[-1].split("/", 1)[0]
+    for pre in ("www.", "listado."):
+        s = s.removeprefix(pre)
+    return s or SITE_DEFAULT
+
+
+def spec_canonica(q, min_price=None, max_price=None, condition=None, envio=None, site=SITE_DEFAULT) -> dict:
+    """
+    Forma canónica de una búsqueda: la usan la URL del listado, las keys de vistos, los grupos y los IDs de
+    watch, así dos búsquedas equivalentes comparten scrape, caché y vistos.
+    """
+    lo, hi = normalizar_precios(min_price, max_price)
+    return {"q": normalizar_q(q), "min_price": lo, "max_price": hi, "condition": normalizar_condicion(condition),
+            "envio": normalizar_envio(envio), "site": normalizar_site(site)}
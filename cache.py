@@ -0,0 +1,101 @@
+# cache.py
+import asyncio, time
+from collections import OrderedDict
+
+
+def _tamano_aprox(value) -> int:
+    """Tamaño aproximado (bytes) de un resultado de scrape: suficiente para el tope de memoria."""
+    total = 200
+    for r in value.get("results", []) if isinstance(value, dict) else []:
+        total += 150 + sum(len(v) for v in r.values() if isinstance(v, str))
+    return total
+
+
+class ScrapeCache:
+    """
+    Single-flight + caché TTL/LRU delante del scraper, por URL de listado.
+    - Peticiones concurrentes para la misma URL comparten UN scrape en curso.
+    - Los resultados se guardan `ttl` segundos; se expulsan por LRU si se supera `max_bytes`.
+    - Los errores no se cachean (se propagan a todos los que esperaban).
+    El valor cacheado se comparte entre llamadores: no mutarlo.
+    """
+    def __init__(self, ttl: float = 20.0, max_bytes: int = 32 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._data: OrderedDict[str, tuple[float, int, object]] = OrderedDict()  # key -> (ts, bytes, value)
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    async def get(self, key: str, factory):
+        """Devuelve el valor para `key`; si no está fresco, lo produce con `await factory()`."""
+        e = self._data.get(key)
+        if e is not None:
+            if time.monotonic() - e[0] < self.ttl:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return e[2]
+            self._quitar(key)
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            # el scrape corre en su propia tarea: si el primer llamador se cancela, los demás siguen esperando
+            task = asyncio.ensure_future(self._cargar(key, factory))
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _cargar(self, key, factory):
+        try:
+            value = await factory()
+            if self.ttl > 0:
+                self._guardar(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def _guardar(self, key, value):
+        self._quitar(key)
+        size = _tamano_aprox(value)
+        self._data[key] = (time.monotonic(), size, value)
+        self._bytes += size
+        while self._bytes > self.max_bytes and len(self._data) > 1:
+            old = next(iter(self._data))
+            self._quitar(old)
+            self.evictions += 1
+
+    def _quitar(self, key):
+        e = self._data.pop(key, None)
+        if e is not None:
+            self._bytes -= e[1]
+
+    def disponible(self, key: str) -> bool:
+        """True si `key` está fresco o en curso (get() no lanzaría un scrape nuevo)."""
+        e = self._data.get(key)
+        return key in self._inflight or (e is not None and time.monotonic() - e[0] < self.ttl)
+
+    def put(self, key: str, value):
+        """Guarda un valor producido fuera de get() (p.ej. un scrape en streaming ya terminado)."""
+        if self.ttl > 0:
+            self._guardar(key, value)
+
+    def invalidate(self, key: str | None = None):
+        if key is None:
+            self._data.clear()
+            self._bytes = 0
+        else:
+            self._quitar(key)
+
+    def stats(self) -> dict:
+        consultas = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits, "misses": self.misses, "coalesced": self.coalesced,
+            "evictions": self.evictions, "entries": len(self._data), "bytes": self._bytes,
+            "inflight": len(self._inflight), "ttl": self.ttl, "max_bytes": self.max_bytes,
+            "hit_rate": round((self.hits + self.coalesced) / consultas, 3) if consultas else 0.0,
+        }
@@ -0,0 +1,285 @@
+# extractor.py
+import re
+from selectolax.lexbor import LexborHTMLParser
+
+# Selectores por campo, en orden de preferencia (los de respaldo son los de scrape_worker)
+SELECTORES = {
+    "card": [
+        "li.ui-search-layout__item",
+        "div.ui-search-result__content-wrapper, div.poly-card",
+    ],
+    "title": [
+        "a.poly-component__title",
+        "h3.poly-component__title-wrapper a",
+        "a.ui-search-link",
+    ],
+    "price": [
+        "span.andes-money-amount__fraction",
+        "span.poly-price__fraction",
+        "[data-testid='item-price'] span",
+    ],
+    "condition": ["span.poly-component__item-condition"],
+    "shipping": ["div.poly-component__shipping"],
+    "image": ["img.poly-component__picture", "img"],
+}
+
+# Se evalúa UNA vez en la página: recorre todas las cards y devuelve los datos crudos en un solo lote
+# (en vez de ~10 query_selector/inner_text/get_attribute por card, cada uno con su ida y vuelta al navegador).
+# `sel` trae los selectores ya ordenados por EstrategiaSelectores; `hits` cuenta, por campo, qué posición
+# de la lista acertó en cada card (la última posición = ninguno).
+EXTRACT_CARDS_JS = """
+(sel) => {
+  const hits = {};
+  for (const k of Object.keys(sel)) hits[k] = new Array(sel[k].length + 1).fill(0);
+  const first = (root, campo) => {
+    const list = sel[campo];
+    for (let i = 0; i < list.length; i++) {
+      const el = root.querySelector(list[i]);
+      if (el) { hits[campo][i]++; return el; }
+    }
+    hits[campo][list.length]++;
+    return null;
+  };
+  const text = (el) => el ? el.innerText.trim() : null;
+
+  let cards = [];
+  let i = 0;
+  for (; i < sel.card.length; i++) {
+    cards = Array.from(document.querySelectorAll(sel.card[i]));
+    if (cards.length) break;
+  }
+  hits.card[i]++;
+  const items = cards.map((card) => {
+    const t = first(card, "title");
+    const img = first(card, "image");
+    return {
+      title: text(t),
+      link: t ? t.getAttribute("href") : null,
+      price: text(first(card, "price")),
+      condition: text(first(card, "condition")),
+      shipping: text(first(card, "shipping")),
+      src: img ? img.getAttribute("src") : null,
+      data_src: img ? img.getAttribute("data-src") : null,
+    };
+  });
+  return {items, hits};
+}
+"""
+
+
+class EstrategiaSelectores:
+    """
+    Orden de los selectores de respaldo aprendido por sitio y campo.
+    Cada extracción informa qué selector acertó (registrar); el que más gana en una ventana de
+    `ventana` probes pasa a probarse primero para ese sitio. Si el primero deja de acertar en al menos
+    `min_hit` de los casos, al cerrar la ventana se reordena de nuevo según lo que ganó en ella.
+    exportar()/importar() permiten guardar el orden aprendido entre corridas.
+    """
+    def __init__(self, tabla: dict = SELECTORES, ventana: int = 50, min_hit: float = 0.9):
+        self.tabla = tabla
+        self.ventana = ventana
+        self.min_hit = min_hit
+        self._orden: dict[tuple[str, str], list[int]] = {}     # (site, campo) -> índices de la tabla
+        self._vent: dict[tuple[str, str], list[int]] = {}      # aciertos por índice de la tabla (+ ninguno) en la ventana
+        self.probes = 0        # selectores probados
+        self.fallidos = 0      # ... que no encontraron nada
+        self.reordenes = 0
+        self.cambios = 0       # para saber si hay algo nuevo que persistir
+
+    def orden(self, site: str | None, campo: str) -> list[int]:
+        return self._orden.get((site or "", campo)) or list(range(len(self.tabla[campo])))
+
+    def selectores(self, site: str | None, campo: str) -> list[str]:
+        return [self.tabla[campo][i] for i in self.orden(site, campo)]
+
+    def por_sitio(self, site: str | None) -> dict[str, list[str]]:
+        """Tabla completa ordenada para `site` (lo que recibe EXTRACT_CARDS_JS)."""
+        return {campo: self.selectores(site, campo) for campo in self.tabla}
+
+    def registrar(self, site: str | None, campo: str, hits: list[int]):
+        """
+        `hits[i]` = veces que acertó el i-ésimo selector EN EL ORDEN USADO; `hits[-1]` = ninguno acertó.
+        """
+        key = (site or "", campo)
+        orden = self.orden(site, campo)
+        n = len(orden)
+        vent = self._vent.setdefault(key, [0] * (n + 1))
+        for pos, c in enumerate(hits[:n]):
+            if c:
+                vent[orden[pos]] += c
+                self.probes += c * (pos + 1)
+                self.fallidos += c * pos
+        if len(hits) > n and hits[n]:
+            vent[n] += hits[n]
+            self.probes += hits[n] * n
+            self.fallidos += hits[n] * n
+        total = sum(vent)
+        if total < self.ventana:
+            return
+        primero = vent[orden[0]]
+        if primero < self.min_hit * total:
+            nuevo = sorted(range(n), key=lambda i: (-vent[i], orden.index(i)))
+            if nuevo != orden:
+                self._orden[key] = nuevo
+                self.reordenes += 1
+                self.cambios += 1
+        self._vent[key] = [0] * (n + 1)
+
+    def exportar(self) -> dict:
+        return {f"{site}|{campo}": orden for (site, campo), orden in self._orden.items()}
+
+    def importar(self, data: dict):
+        for k, orden in (data or {}).items():
+            site, _, campo = k.rpartition("|")
+            if campo in self.tabla and sorted(orden) == list(range(len(self.tabla[campo]))):
+                self._orden[(site, campo)] = list(orden)
+
+    def stats(self) -> dict:
+        return {"probes": self.probes, "failed_probes": self.fallidos, "reorders": self.reordenes,
+                "failed_per_probe": round(self.fallidos / self.probes, 4) if self.probes else 0.0,
+                "learned": {f"{s}|{c}": self.selectores(s, c)[0] for (s, c) in self._orden}}
+
+
+ESTRATEGIA = EstrategiaSelectores()
+
+
+def parse_price(text: str | None) -> int | None:
+    """Convierte '1.299.900' -> 1299900"""
+    if not text:
+        return None
+    text = re.sub(r"[^\d]", "", text)
+    return int(text) if text else None
+
+
+def normalizar_cards(raw: list[dict]) -> list[dict]:
+    """Convierte el lote crudo de EXTRACT_CARDS_JS en resultados {title, price, condition, shipping, link, image}."""
+    items = []
+    for c in raw:
+        title = c.get("title")
+        link = c.get("link")
+        price = parse_price(c.get("price"))
+        if not title or not link or not price:
+            continue
+
+        # Imagen (soporta lazy-load data-src)
+        src, data_src = c.get("src"), c.get("data_src")
+        image = None
+        if src and src.startswith("http"):
+            image = src
+        elif data_src and data_src.startswith("http"):
+            image = data_src
+
+        items.append({
+            "title": title,
+            "price": price,
+            "condition": c.get("condition") or "Nuevo",   # si no aparece, asumimos 'Nuevo'
+            "shipping": c.get("shipping"),
+            "link": link,
+            "image": image
+        })
+    return items
+
+
+def _registrar_hits(site, hits: dict):
+    for campo, h in hits.items():
+        ESTRATEGIA.registrar(site, campo, h)
+
+
+async def extraer_cards(page, site: str | None = None) -> list[dict]:
+    """Extrae todas las cards de una página async de Playwright en una sola evaluación."""
+    out = await page.evaluate(EXTRACT_CARDS_JS, ESTRATEGIA.por_sitio(site))
+    _registrar_hits(site, out["hits"])
+    return normalizar_cards(out["items"])
+
+
+def extraer_cards_sync(page, site: str | None = None) -> list[dict]:
+    """Igual que extraer_cards, para la API síncrona de Playwright."""
+    out = page.evaluate(EXTRACT_CARDS_JS, ESTRATEGIA.por_sitio(site))
+    _registrar_hits(site, out["hits"])
+    return normalizar_cards(out["items"])
+
+
+# ------------ HTML estático (sin navegador) ------------
+def _primero(root, selectores, hits):
+    for i, s in enumerate(selectores):
+        el = root.css_first(s)
+        if el is not None:
+            hits[i] += 1
+            return el
+    hits[-1] += 1
+    return None
+
+def _texto(el):
+    # equivalente aproximado a innerText: espacios colapsados
+    return " ".join(el.text().split()) if el is not None else None
+
+def extraer_cards_html(html: str, site: str | None = None) -> list[dict]:
+    """Parsea el HTML server-rendered del listado con Lexbor, con los SELECTORES en el orden aprendido para `site`."""
+    sel = ESTRATEGIA.por_sitio(site)
+    hits = {campo: [0] * (len(lista) + 1) for campo, lista in sel.items()}
+    tree = LexborHTMLParser(html)
+    cards = []
+    for i, s in enumerate(sel["card"]):
+        cards = tree.css(s)
+        if cards:
+            hits["card"][i] += 1
+            break
+    else:
+        hits["card"][-1] += 1
+    raw = []
+    for card in cards:
+        t = _primero(card, sel["title"], hits["title"])
+        img = _primero(card, sel["image"], hits["image"])
+        raw.append({
+            "title": _texto(t),
+            "link": t.attributes.get("href") if t is not None else None,
+            "price": _texto(_primero(card, sel["price"], hits["price"])),
+            "condition": _texto(_primero(card, sel["condition"], hits["condition"])),
+            "shipping": _texto(_primero(card, sel["shipping"], hits["shipping"])),
+            "src": img.attributes.get("src") if img is not None else None,
+            "data_src": img.attributes.get("data-src") if img is not None else None,
+        })
+    _registrar_hits(site, hits)
+    return normalizar_cards(raw)
+
+
+_INICIO_CARD = re.compile(r'<li\b[^>]*\bclass="[^"]*\bui-search-layout__item\b')
+
+
+class ParserIncremental:
+    """
+    Parser por trozos para el HTML que va llegando por la red: cada vez que empieza la
+    siguiente <li class="ui-search-layout__item"> la anterior ya está completa y se parsea sola.
+    feed(trozo) -> cards listas; close() -> las que faltaban (la última, o todo el documento
+    si el listado no usa <li> y hay que ir a los selectores de respaldo).
+    """
+    def __init__(self, site: str | None = None):
+        self.site = site
+        self._buf = ""
+        self._con_li = False   # ya apareció al menos una <li> de card
+        self._desde = 0        # hasta dónde ya se buscaron inicios de card en _buf
+
+    def feed(self, trozo: str) -> list[dict]:
+        self._buf += trozo
+        inicios = [m.start() for m in _INICIO_CARD.finditer(self._buf, self._desde)]
+        # la etiqueta de apertura puede haber quedado partida: re-buscar el final en el próximo trozo
+        self._desde = max(self._desde, len(self._buf) - 512)
+        if not inicios:
+            return []
+        if not self._con_li:
+            self._con_li = True
+        else:
+            inicios.insert(0, 0)   # _buf siempre empieza en la card pendiente
+        listas = []
+        for a, b in zip(inicios, inicios[1:]):
+            listas.extend(extraer_cards_html(self._buf[a:b], self.site))
+        self._buf = self._buf[inicios[-1]:]
+        self._desde = 1
+        return listas
+
+    def close(self) -> list[dict]:
+        buf, self._buf = self._buf, ""
+        if not self._con_li:
+            return extraer_cards_html(buf, self.site)
+        fin = buf.find("</ol>")
+        return extraer_cards_html(buf[:fin] if fin >= 0 else buf, self.site)
@@ -0,0 +1,149 @@
+# feeds.py
+import asyncio, json, time
+from datetime import datetime
+
+
+class _Cliente:
+    """Una conexión abierta (pestaña) suscrita a un feed, con su cola acotada de eventos."""
+    __slots__ = ("feed", "cola", "cerrado", "desde")
+
+    def __init__(self, feed, queue_size: int):
+        self.feed = feed
+        self.cola: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.cerrado = False
+        self.desde = time.monotonic()
+
+    def cerrar(self):
+        if not self.cerrado:
+            self.cerrado = True
+            try:
+                self.cola.put_nowait(None)   # despierta al generador para que termine
+            except asyncio.QueueFull:
+                pass
+
+
+class _Feed:
+    __slots__ = ("key", "spec", "intervalo", "clientes", "vacio_desde", "runs")
+
+    def __init__(self, key: str, spec: dict, intervalo: int):
+        self.key = key
+        self.spec = {**spec, "primera": True}   # True hasta el primer ciclo exitoso de ESTE feed
+        self.intervalo = intervalo
+        self.clientes: set[_Cliente] = set()
+        self.vacio_desde: float | None = None
+        self.runs = 0
+
+
+class FeedHub:
+    """
+    Feeds de novedades por firma de búsqueda, empujados por SSE a todas las pestañas conectadas.
+    - Un solo job del scheduler por feed (`feed:<key>`), al intervalo más corto pedido: la cantidad de
+      scrapes no depende de cuántas pestañas haya abiertas.
+    - `producir(spec)` hace el scrape y devuelve el evento (dict) a publicar, o None para no publicar nada.
+      `spec["primera"]` es True en el primer ciclo del feed (también si se reabre tras darse de baja).
+    - Backpressure: cada cliente tiene una cola de `queue_size` eventos; si se llena (cliente lento o
+      colgado) se lo desconecta y EventSource reconecta solo.
+    - Un feed sin clientes durante `idle_sec` se da de baja (y su job también).
+    """
+    def __init__(self, scheduler, producir, idle_sec: float = 60.0, queue_size: int = 20,
+                 min_interval: int = 10, heartbeat_sec: float = 15.0):
+        self.scheduler = scheduler
+        self.producir = producir
+        self.idle_sec = idle_sec
+        self.queue_size = queue_size
+        self.min_interval = min_interval
+        self.heartbeat_sec = heartbeat_sec
+        self._feeds: dict[str, _Feed] = {}
+        self.publicados = 0
+        self.desconectados_lentos = 0
+
+    # ---------- altas / bajas ----------
+    def join(self, key: str, spec: dict, intervalo: int) -> _Cliente:
+        intervalo = max(self.min_interval, int(intervalo))
+        feed = self._feeds.get(key)
+        if feed is None:
+            feed = self._feeds[key] = _Feed(key, spec, intervalo)
+            self.scheduler.add_job(self._run, "interval", seconds=intervalo, id=f"feed:{key}", args=[key],
+                                   replace_existing=True, next_run_time=datetime.now())
+        elif intervalo < feed.intervalo:
+            feed.intervalo = intervalo
+            self.scheduler.reschedule_job(f"feed:{key}", trigger="interval", seconds=intervalo)
+        cliente = _Cliente(feed, self.queue_size)
+        feed.clientes.add(cliente)
+        feed.vacio_desde = None
+        return cliente
+
+    def leave(self, cliente: _Cliente):
+        cliente.cerrar()
+        feed = cliente.feed
+        feed.clientes.discard(cliente)
+        if not feed.clientes:
+            feed.vacio_desde = time.monotonic()
+            asyncio.get_running_loop().call_later(self.idle_sec, self._quizas_quitar, feed.key)
+
+    def _quizas_quitar(self, key: str):
+        feed = self._feeds.get(key)
+        if feed is None or feed.clientes or feed.vacio_desde is None:
+            return
+        if time.monotonic() - feed.vacio_desde >= self.idle_sec - 0.5:
+            del self._feeds[key]
+            if self.scheduler.get_job(f"feed:{key}"):
+                self.scheduler.remove_job(f"feed:{key}")
+
+    def cerrar(self):
+        for feed in self._feeds.values():
+            for c in list(feed.clientes):
+                c.cerrar()
+
+    # ---------- ciclo del feed ----------
+    async def _run(self, key: str):
+        feed = self._feeds.get(key)
+        if feed is None:
+            return
+        try:
+            evento = await self.producir(feed.spec)
+        except Exception as e:
+            print(f"🔥 ERROR feed {key[:8]}:", e)
+            evento = {"type": "scrape_error", "error": str(e)}
+        else:
+            feed.spec["primera"] = False
+        feed.runs += 1
+        if evento is not None:
+            self.publicar(feed, evento)
+
+    def publicar(self, feed: _Feed, evento: dict):
+        for c in list(feed.clientes):
+            try:
+                c.cola.put_nowait(evento)
+            except asyncio.QueueFull:
+                # cliente que no consume: se corta; al reconectar vuelve a empezar limpio
+                self.desconectados_lentos += 1
+                feed.clientes.discard(c)
+                c.cerrado = True
+        self.publicados += 1
+
+    async def eventos(self, cliente: _Cliente):
+        """Genera el stream SSE del cliente; heartbeat periódico para detectar conexiones muertas."""
+        try:
+            yield "retry: 5000\n\n"
+            while not cliente.cerrado:
+                try:
+                    evento = await asyncio.wait_for(cliente.cola.get(), self.heartbeat_sec)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if evento is None:
+                    break
+                yield f"data: {json.dumps(evento, ensure_ascii=False)}\n\n"
+        finally:
+            self.leave(cliente)
+
+    def stats(self) -> dict:
+        return {
+            "feeds": len(self._feeds),
+            "clients": sum(len(f.clientes) for f in self._feeds.values()),
+            "published": self.publicados,
+            "slow_disconnects": self.desconectados_lentos,
+            "per_feed": [{"key": f.key, "clients": len(f.clientes), "interval_sec": f.intervalo, "runs": f.runs}
+                         for f in self._feeds.values()],
+        }
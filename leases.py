@@ -0,0 +1,105 @@
+# leases.py
+import os, socket, sqlite3, threading, time, uuid
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    name    TEXT PRIMARY KEY,      -- "group:<gkey>", "job:<id>", "proc:<owner>"
+    owner   TEXT NOT NULL,
+    expires REAL NOT NULL          -- epoch; vencido = libre para otro dueño
+);
+"""
+
+
+def owner_por_defecto() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class LeaseManager:
+    """
+    Leases con vencimiento en una tabla SQLite compartida (el mismo STORE_DB), para correr varios procesos
+    (`uvicorn --workers N` o varias réplicas sobre el mismo disco) sin duplicar trabajo:
+    - adquirir(name): toma el lease si está libre, vencido o ya es nuestro. Atómico (un solo UPSERT).
+    - latido(): renueva todos nuestros leases y el de presencia del proceso; si un proceso muere, sus
+      leases vencen a los `ttl` segundos y el siguiente que intente adquirirlos se los queda.
+    - vivos(): procesos con presencia vigente (para saber si estamos solos).
+    Métodos bloqueantes y cortos: desde el event loop, vía asyncio.to_thread.
+    """
+    def __init__(self, path: str, owner: str | None = None, ttl: float = 60.0):
+        self.owner = owner or owner_por_defecto()
+        self.ttl = ttl
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()   # conexión y _mios (se usan desde hilos de asyncio.to_thread y del loop)
+        self.tomados = 0       # leases adquiridos que eran de otro (o nuevos)
+        self.rechazados = 0    # intentos con el lease vigente en manos de otro
+        self._mios: set[str] = set()
+
+    def adquirir(self, name: str) -> bool:
+        ahora = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO leases(name, owner, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET owner=excluded.owner, expires=excluded.expires "
+                "WHERE leases.owner=excluded.owner OR leases.expires < ?",
+                (name, self.owner, ahora + self.ttl, ahora))
+            ok = cur.rowcount > 0
+            if ok and name not in self._mios:
+                self._mios.add(name)
+                self.tomados += 1
+            elif not ok:
+                self._mios.discard(name)
+                self.rechazados += 1
+        return ok
+
+    def es_nuevo(self, name: str) -> bool:
+        """True si `name` no estaba entre nuestros leases (adquirirlo sería tomarlo de otro o crearlo)."""
+        with self._lock:
+            return name not in self._mios
+
+    def propios(self, prefijo: str = "") -> list[str]:
+        with self._lock:
+            mios = list(self._mios)
+        return sorted(n for n in mios if n.startswith(prefijo))
+
+    def soltar(self, name: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE name=? AND owner=?", (name, self.owner))
+            self._mios.discard(name)
+
+    def latido(self) -> int:
+        """Renueva nuestros leases (y la presencia del proceso). Devuelve cuántos seguían siendo nuestros."""
+        ahora = time.time()
+        self.adquirir(f"proc:{self.owner}")
+        with self._lock:
+            vigentes = {n for (n,) in self._conn.execute(
+                "SELECT name FROM leases WHERE owner=? AND expires >= ?", (self.owner, ahora))}
+            self._conn.execute("UPDATE leases SET expires=? WHERE owner=? AND expires >= ?",
+                               (ahora + self.ttl, self.owner, ahora))
+            # limpieza de vencidos hace rato (procesos muertos)
+            self._conn.execute("DELETE FROM leases WHERE expires < ?", (ahora - 10 * self.ttl,))
+            self._mios &= vigentes   # bajo el mismo lock: un adquirir de otro hilo no queda en el medio
+        return len(vigentes)
+
+    def vivos(self) -> list[str]:
+        with self._lock:
+            return [n[5:] for (n,) in self._conn.execute(
+                "SELECT name FROM leases WHERE name LIKE 'proc:%' AND expires >= ?", (time.time(),))]
+
+    def soltar_todo(self):
+        """Al apagar: libera todo para que otro proceso tome los jobs sin esperar el vencimiento."""
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE owner=?", (self.owner,))
+            self._mios.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            filas = self._conn.execute("SELECT owner, COUNT(*) FROM leases WHERE name LIKE 'group:%' "
+                                       "AND expires >= ? GROUP BY owner", (time.time(),)).fetchall()
+            held = len(self._mios)
+        return {"owner": self.owner, "ttl": self.ttl, "held": held, "taken": self.tomados,
+                "refused": self.rechazados, "processes": self.vivos(), "groups_by_owner": dict(filas)}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,61 +1,214 @@
 # main.py
-from fastapi import FastAPI, Query, Body
+from fastapi import FastAPI, Query, Body, Request
+from fastapi.responses import StreamingResponse, PlainTextResponse, Response
 from fastapi.staticfiles import StaticFiles
-from scraper import scrape_meli
-from notifier import send_telegram_message, send_telegram_photo
-import asyncio, hashlib, time, json, os
-from threading import Lock
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from scraper import scrape, scrape_stream, scrape_paginas, construir_url, cerrar_cliente_http, ENGINES
+from browser_pool import pool_from_env
+from extractor import ESTRATEGIA
+from worker_pool import worker_pool_from_env
+from cache import ScrapeCache
+from notifier import TelegramNotifier, FileIdCache
+from feeds import FeedHub
+from scheduling import ScrapeLimiter, siguiente_intervalo
+from breakers import Breakers, CircuitoAbierto
+from store import Store
+from leases import LeaseManager
+from busqueda import spec_canonica, normalizar_site
+from seen_set import nuevo_seen, item_id, item_num, item_num_sitio, VistosLazy
+from prices import PriceIndex, submuestrear
+from metrics import medir, observar, contar, exportar as exportar_metricas
+import asyncio, contextvars, cProfile, gzip, hashlib, json, random, time, os
+import orjson
+from datetime import datetime, timedelta
 from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
 
 app = FastAPI(title="MercadoLibre Scraper API", version="2.0.0")
 
-# --- archivos de persistencia ---
+# --- persistencia ---
+STORE_DB      = os.getenv("STORE_DB", "store.db")   # SQLite (WAL): vistos, watches, phone->chat_id
+STORE_FLUSH_SEC = float(os.getenv("STORE_FLUSH_SEC", "1"))
+ESTRATEGIA_KEY  = "extractor:selectores"   # orden de selectores aprendido por sitio (tabla meta)
+SEEN_MODE       = os.getenv("SEEN_MODE", "exact")               # exact | bloom
+SEEN_MAX_PER_KEY = int(os.getenv("SEEN_MAX_PER_KEY", "2000"))   # items recordados por búsqueda (los más viejos se olvidan)
+SEEN_RETENTION_DAYS = float(os.getenv("SEEN_RETENTION_DAYS", "30"))  # búsquedas sin uso se expulsan
+MAX_PAGES_LIMIT = int(os.getenv("MAX_PAGES_LIMIT", "10"))             # tope de max_pages por búsqueda
+PAGES_CONCURRENCY = int(os.getenv("PAGES_CONCURRENCY", "3"))          # páginas en paralelo por búsqueda
+PRICE_SAMPLE_SEC = int(os.getenv("PRICE_SAMPLE_SEC", "3600"))          # precio sin cambios: re-muestrear cada tanto
+PRICE_RETENTION_DAYS = float(os.getenv("PRICE_RETENTION_DAYS", "90"))  # muestras de precio más viejas se borran
+# --- planificación de watches ---
+WATCH_CONCURRENCY      = int(os.getenv("WATCH_CONCURRENCY", "4"))         # scrapes programados simultáneos
+WATCH_SITE_CONCURRENCY = int(os.getenv("WATCH_SITE_CONCURRENCY", "2"))    # ... por sitio
+WATCH_MAX_INTERVAL     = int(os.getenv("WATCH_MAX_INTERVAL", "3600"))     # tope del backoff de búsquedas sin novedades
+WATCH_BACKOFF          = float(os.getenv("WATCH_BACKOFF", "1.5"))         # factor de alejamiento por corrida sin nuevos
+WATCH_JITTER           = float(os.getenv("WATCH_JITTER", "0.1"))          # jitter por corrida (fracción del intervalo)
+# --- circuit breaker por sitio (bloqueos/captcha, timeouts, errores) ---
+BREAKER_FAILURES     = int(os.getenv("BREAKER_FAILURES", "3"))          # fallos seguidos que abren el circuito
+BREAKER_OPEN_SEC     = float(os.getenv("BREAKER_OPEN_SEC", "60"))       # abierto antes de la primera prueba
+BREAKER_MAX_OPEN_SEC = float(os.getenv("BREAKER_MAX_OPEN_SEC", "900"))  # tope (se duplica con cada apertura)
+# --- varios procesos (uvicorn --workers N / réplicas sobre el mismo STORE_DB) ---
+LEASE_TTL      = float(os.getenv("LEASE_TTL", "60"))        # sin latido en este tiempo, otro proceso toma sus grupos
+CLUSTER_SYNC_SEC = float(os.getenv("CLUSTER_SYNC_SEC", "5"))  # latido + recarga de watches escritos por otros
+# JSON antiguos: sólo se leen una vez para migrar al SQLite
 SEEN_FILE     = "seen_store.json"       # { key: {links:[], last_update:int} }
 WATCHES_FILE  = "watches_store.json"    # { watch_id: { params, phone, interval, last_run } }
 PHONEMAP_FILE = "phone_map.json"        # { phone: chat_id }
 
-_store_lock = Lock()
-SEEN   = {}   # mem: dict[key] -> set(links)
+SEEN   = {}   # mem: key -> SeenSet/BloomSeen (IDs de item); VistosLazy: cada búsqueda se lee del disco al usarla
 LAST_TS= {}   # mem: dict[key] -> int
 WATCHES= {}   # mem: dict[watch_id] -> dict
 PHONEMAP = {} # mem: dict[phone] -> chat_id
+PRICES = PriceIndex()   # mem: último precio por item (item_num_sitio), para el historial
+PRECIOS_VISTOS = {}     # mem: key de watch -> {item_num: último precio que vio ese suscriptor} (alertas de baja)
+ADAPT  = {}   # mem: dict[group] -> {base, interval, idle_runs, last_new} (intervalo adaptativo)
 
-scheduler = AsyncIOScheduler()
+store = None    # Store (SQLite), se abre al arrancar (_abrir_persistencia): importar main no toca el disco
+leases = None   # LeaseManager sobre el mismo STORE_DB, ídem
+CLUSTER = {"solo": True, "procesos": 1}   # solo: sin otros procesos vivos no hace falta releer vistos del disco
+scheduler = None   # AsyncIOScheduler, se crea al arrancar (_crear_scheduler): importar main no carga APScheduler
+browser_pool = pool_from_env()   # navegadores Chromium compartidos (se inician en startup)
+worker_pool = worker_pool_from_env()   # SCRAPE_WORKERS>0: los scrapes corren en procesos aparte
+scrape_cache = ScrapeCache(ttl=float(os.getenv("SCRAPE_CACHE_TTL", "20")),
+                           max_bytes=int(os.getenv("SCRAPE_CACHE_MAX_MB", "32")) * 1024 * 1024)
+TELEGRAM_FILE_CACHE = int(os.getenv("TELEGRAM_FILE_CACHE", "50000"))   # file_id de imágenes recordados
+telegram = TelegramNotifier(global_rate=float(os.getenv("TELEGRAM_GLOBAL_RATE", "30")),
+                            chat_rate=float(os.getenv("TELEGRAM_CHAT_RATE", "1")),
+                            file_ids=FileIdCache(TELEGRAM_FILE_CACHE))   # al_guardar: al abrir el store
+scrape_limiter = ScrapeLimiter(WATCH_CONCURRENCY, WATCH_SITE_CONCURRENCY)
+breakers = Breakers(BREAKER_FAILURES, BREAKER_OPEN_SEC, BREAKER_MAX_OPEN_SEC)
+_flush_task = None
+_cluster_task = None
 
 
 # ------------ utilidades de persistencia ------------
-def _load_json(path):
-    if not os.path.exists(path): return {}
-    try:
-        with open(path, "r", encoding="utf-8") as f: return json.load(f)
-    except: return {}
+def _abrir_persistencia():
+    """Abre el store y los leases (en startup, como el pool de navegadores y el scheduler)."""
+    global store, leases
+    store = Store(STORE_DB)
+    leases = LeaseManager(STORE_DB, os.getenv("LEASE_OWNER") or None, LEASE_TTL)
+    telegram.file_ids.al_guardar = store.put_file_id
 
-def _save_json_atomic(path, data):
-    tmp = path + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f: json.dump(data, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, path)
+def _cerrar_persistencia():
+    """Suelta los leases (los demás toman los grupos sin esperar el vencimiento) y cierra ambos (flush incluido)."""
+    telegram.file_ids.al_guardar = None
+    leases.soltar_todo()
+    leases.close()
+    store.close()
 
 def _sync_mem_from_disk():
+    """Lo imprescindible para atender: watches y chats. Los vistos se cargan por búsqueda al usarse."""
     global SEEN, LAST_TS, WATCHES, PHONEMAP
-    disk_seen = _load_json(SEEN_FILE)
-    for k, v in disk_seen.items():
-        SEEN[k] = set(v.get("links", []))
-        LAST_TS[k] = v.get("last_update", 0)
-    WATCHES = _load_json(WATCHES_FILE)
-    PHONEMAP = _load_json(PHONEMAP_FILE)
+    if store.migrate_from_json(SEEN_FILE, WATCHES_FILE, PHONEMAP_FILE):
+        print("📦 Migrados los JSON de persistencia a", STORE_DB)
+    LAST_TS = {}
+    SEEN = VistosLazy(store.cargar_vistos, LAST_TS, SEEN_MODE, SEEN_MAX_PER_KEY)
+    WATCHES = store.load_watches()
+    PHONEMAP = store.load_phonemap()
+    _migrar_claves_canonicas()
+    try:
+        ESTRATEGIA.importar(json.loads(store.get_kv(ESTRATEGIA_KEY) or "{}"))
+    except ValueError:
+        pass
+
+# dentro de un /search/batch: {key: [items]} que se encolan recién al terminar el batch (ver search_batch)
+_vistos_del_batch: contextvars.ContextVar[dict | None] = contextvars.ContextVar("vistos_del_batch", default=None)
+
+def _sync_seen_to_disk(key, nums):
+    """Encola SOLO los items nuevos de `key`; el flusher los escribe en lote fuera del event loop."""
+    retenidos = _vistos_del_batch.get()
+    if retenidos is not None:
+        retenidos.setdefault(key, []).extend(nums)
+        return
+    store.add_seen(key, nums, LAST_TS.get(key))
+
+def _sync_watches_to_disk(*wids):
+    for wid in wids:
+        store.put_watch(wid, WATCHES.get(wid))
+
+def _registrar_precios(results: list[dict]):
+    """
+    Muestra de precio por item de un scrape recién hecho (historial). Sólo se guarda si cambió o si pasó
+    PRICE_SAMPLE_SEC desde la última. Las alertas de baja no usan esto: ver _bajas_de_precio.
+    """
+    ts = int(time.time())
+    items, precios = [], []
+    for r in results:
+        precio = r.get("price")
+        if not r.get("link") or not isinstance(precio, int):
+            continue
+        n = item_num_sitio(r["link"])
+        prev = PRICES.get(n)
+        if prev is None or prev[0] != precio or ts - prev[1] >= PRICE_SAMPLE_SEC:
+            PRICES.set(n, precio, ts)
+            items.append(n)
+            precios.append(precio)
+    if items:
+        store.add_prices(items, ts, precios)
+
+def _sync_phonemap_to_disk(phone):
+    store.put_phone(phone, PHONEMAP[phone])
+
+_estrategia_guardada = 0
+
+def _guardar_estrategia():
+    """Encola el orden de selectores aprendido si cambió desde la última vez."""
+    global _estrategia_guardada
+    if ESTRATEGIA.cambios != _estrategia_guardada:
+        _estrategia_guardada = ESTRATEGIA.cambios
+        store.put_kv(ESTRATEGIA_KEY, json.dumps(ESTRATEGIA.exportar()))
 
-def _sync_seen_to_disk():
-    disk = {}
-    for k, s in SEEN.items():
-        disk[k] = {"links": list(s), "last_update": LAST_TS.get(k, int(time.time()))}
-    _save_json_atomic(SEEN_FILE, disk)
+async def _flush_loop():
+    while True:
+        await asyncio.sleep(STORE_FLUSH_SEC)
+        _guardar_estrategia()
+        try:
+            await asyncio.to_thread(store.flush)
+        except Exception as e:
+            print("⚠️ Error persistiendo:", e)
 
-def _sync_watches_to_disk():
-    _save_json_atomic(WATCHES_FILE, WATCHES)
+async def _sincronizar_suscripciones():
+    """Recarga watches y phone->chat_id si otro proceso los cambió, y reprograma los grupos afectados."""
+    if not await asyncio.to_thread(store.suscripciones_cambiaron):
+        return
+    await asyncio.to_thread(store.flush)   # lo propio aún encolado no se pierde al recargar
+    nuevos = await asyncio.to_thread(store.load_watches)
+    PHONEMAP.update(await asyncio.to_thread(store.load_phonemap))
+    grupos = {grupo_de_watch(w) for w in WATCHES.values()} | {grupo_de_watch(w) for w in nuevos.values()}
+    WATCHES.clear()
+    WATCHES.update(nuevos)
+    for gkey in grupos:
+        _programar_grupo(gkey)
 
-def _sync_phonemap_to_disk():
-    _save_json_atomic(PHONEMAP_FILE, PHONEMAP)
+def _cupo_grupos() -> int:
+    """Grupos que le tocan a cada proceso vivo (reparto parejo)."""
+    grupos = {grupo_de_watch(w) for w in WATCHES.values()}
+    return -(-len(grupos) // CLUSTER["procesos"])
+
+async def _repartir_grupos():
+    """Si tenemos más grupos que el cupo (llegaron procesos nuevos), soltar los que sobran."""
+    existentes = {grupo_de_watch(w) for w in WATCHES.values()}
+    for name in leases.propios("group:"):
+        if name[6:] not in existentes:
+            await asyncio.to_thread(leases.soltar, name)   # grupo sin suscriptores
+    propios = [n for n in leases.propios("group:") if n[6:] not in _CORRIENDO]
+    sobran = len(leases.propios("group:")) - _cupo_grupos()
+    if CLUSTER["solo"] or sobran <= 0 or not propios:
+        return
+    await asyncio.to_thread(store.flush)   # el próximo dueño tiene que ver lo que ya avisamos
+    for name in random.sample(propios, min(sobran, len(propios))):
+        await asyncio.to_thread(leases.soltar, name)
+
+async def _cluster_loop():
+    """Latido de los leases de este proceso, reparto de grupos y sincronización de suscripciones con los demás."""
+    while True:
+        try:
+            await asyncio.to_thread(leases.latido)
+            CLUSTER["procesos"] = max(1, len(await asyncio.to_thread(leases.vivos)))
+            CLUSTER["solo"] = CLUSTER["procesos"] == 1
+            await _sincronizar_suscripciones()
+            await _repartir_grupos()
+        except Exception as e:
+            print("⚠️ Error sincronizando con otros procesos:", e)
+        await asyncio.sleep(min(CLUSTER_SYNC_SEC, LEASE_TTL / 3))
 
 
 # ------------ normalización de URL ------------
@@ -74,19 +227,350 @@ def limpiar_url(url: str) -> str:
 
 
 # ------------ claves de “búsqueda” (para SEEN) y de “watch” ------------
+# sobre la búsqueda canónica (busqueda.spec_canonica): "PS5 " / "ps5", min_price 0 / None, envio "si" / "gratis"
+# son la misma key, el mismo grupo y el mismo watch
 def firma_busqueda(q, min_price, max_price, condition, envio, site, phone=None):
-    base = f"{q}|{min_price}|{max_price}|{condition}|{envio}|{site}|{phone or ''}"
+    s = spec_canonica(q, min_price, max_price, condition, envio, site)
+    base = f"{s['q']}|{s['min_price']}|{s['max_price']}|{s['condition']}|{s['envio']}|{s['site']}|{phone or ''}"
     return hashlib.sha1(base.encode("utf-8")).hexdigest()
 
 def watch_id_from_params(q, min_price, max_price, condition, envio, site, phone):
     # teléfono obligatorio ahora
-    base = f"WATCH|{q}|{min_price}|{max_price}|{condition}|{envio}|{site}|{phone}"
+    s = spec_canonica(q, min_price, max_price, condition, envio, site)
+    base = f"WATCH|{s['q']}|{s['min_price']}|{s['max_price']}|{s['condition']}|{s['envio']}|{s['site']}|{phone}"
+    return hashlib.sha1(base.encode("utf-8")).hexdigest()
+
+def _firma_cruda(w: dict, phone=None) -> str:
+    """Key con la fórmula anterior (parámetros tal cual llegaron): sólo para migrar datos viejos."""
+    base = f"{w['q']}|{w['min_price']}|{w['max_price']}|{w['condition']}|{w['envio']}|{w['site']}|{phone or ''}"
     return hashlib.sha1(base.encode("utf-8")).hexdigest()
 
+def _migrar_claves_canonicas():
+    """
+    Una sola vez: pasa watches y vistos guardados con las keys viejas (inputs crudos) a las canónicas.
+    Watches equivalentes del mismo teléfono se funden en uno (el intervalo más corto, más páginas, la última
+    corrida) y sus vistos se unen. Sólo se pueden traducir las keys que salen de un watch: las de /search y
+    feeds sueltos son hashes de inputs que ya no tenemos; esas quedan como estaban y vencen por retención.
+    """
+    if store.get_kv("keys_canonical"):
+        return
+    nuevos, renombres, movidos = {}, {}, 0
+    for wid, w in sorted(WATCHES.items(), key=lambda kv: kv[1].get("last_run", 0)):
+        s = spec_canonica(w["q"], w["min_price"], w["max_price"], w["condition"], w["envio"], w["site"])
+        w = {**w, **{k: v for k, v in s.items() if k != "q"}, "q": " ".join(str(w["q"]).split())}
+        nid = watch_id_from_params(w["q"], w["min_price"], w["max_price"], w["condition"], w["envio"], w["site"],
+                                   w["phone"])
+        renombres[_firma_cruda(WATCHES[wid], phone=WATCHES[wid]["phone"])] = _key_de_watch(w)
+        previo = nuevos.get(nid)
+        if previo:   # equivalente ya visto (ordenados por last_run: `w` es el más reciente)
+            w["interval_sec"] = min(previo.get("interval_sec", 300), w.get("interval_sec", 300))
+            w["max_pages"] = max(previo.get("max_pages", 1), w.get("max_pages", 1))
+        nuevos[nid] = w
+        if nid != wid:
+            store.put_watch(wid, None)
+            movidos += 1
+    for nid, w in nuevos.items():
+        store.put_watch(nid, w)
+    fundidas = store.merge_seen(renombres)
+    store.put_kv("keys_canonical", str(int(time.time())))
+    store.flush()
+    WATCHES.clear()
+    WATCHES.update(nuevos)
+    if movidos or fundidas:
+        print(f"🔑 Keys canónicas: {movidos} watches renombrados ({len(WATCHES)} quedan), "
+              f"{fundidas} keys de vistos fundidas")
+
+
+# ------------ scrape compartido (single-flight + caché por URL) ------------
+def _limpiar_card(r: dict) -> dict:
+    if r.get("link"):
+        r["link"] = limpiar_url(r["link"])
+        r["item_id"] = item_id(r["link"])
+    return r
+
+async def scrape_compartido(q, min_price, max_price, condition, envio, site, engine="auto", pagina=1):
+    """
+    Scrape con links ya limpios. Llamadas simultáneas a la misma URL de listado comparten un
+    solo scrape y el resultado se reutiliza durante SCRAPE_CACHE_TTL. El dict devuelto es compartido: no mutarlo.
+    Con el circuito del sitio abierto falla al instante con CircuitoAbierto (sin scrapear).
+    """
+    url = construir_url(q, site, min_price, max_price, condition, envio, pagina)
+
+    async def _scrape():
+        try:
+            with breakers.llamada(normalizar_site(site)), medir("scrape", site=site, engine=engine):
+                if worker_pool.iniciado:
+                    data = await worker_pool.scrape(q=q, site=site, min_price=min_price, max_price=max_price,
+                                                    condition=condition, envio=envio, engine=engine, pagina=pagina)
+                else:
+                    data = await scrape(q, site_domain=site,
+                                        min_price=min_price, max_price=max_price,
+                                        condition=condition, envio=envio,
+                                        engine=engine, pool=browser_pool, pagina=pagina)
+        except Exception:
+            contar("scrapes_total", site=site, engine=engine, result="error")
+            raise
+        contar("scrapes_total", site=site, engine=data.get("engine"), result="ok" if data.get("results") else "empty")
+        contar("results_total", len(data.get("results", [])), site=site, engine=data.get("engine"))
+        with medir("limpiar_url", site=site, engine=data.get("engine")):
+            for r in data.get("results", []):
+                _limpiar_card(r)
+        _registrar_precios(data.get("results", []))
+        return data
+
+    return await scrape_cache.get(url, _scrape)
+
+
+async def scrape_busqueda(q, min_price, max_price, condition, envio, site, engine="auto",
+                          max_pages=1, keys_vistos=()):
+    """
+    Como scrape_compartido, pero con hasta `max_pages` páginas en paralelo (PAGES_CONCURRENCY a la vez),
+    deduplicadas por ID de item. Deja de paginar cuando una página no trae nada nuevo para `keys_vistos`.
+    """
+    max_pages = max(1, min(int(max_pages or 1), MAX_PAGES_LIMIT))
+    if max_pages == 1:
+        return await scrape_compartido(q, min_price, max_price, condition, envio, site, engine)
+
+    for k in keys_vistos or ():
+        _refrescar_vistos(k)
+
+    def es_nuevo(r):
+        # nuevo si alguna de las keys aún no lo vio (una key sin historial lo ve todo nuevo)
+        return any(k not in SEEN or r["link"] not in SEEN[k] for k in keys_vistos)
+
+    return await scrape_paginas(
+        lambda p: scrape_compartido(q, min_price, max_price, condition, envio, site, engine, pagina=p),
+        max_pages, PAGES_CONCURRENCY, es_nuevo if keys_vistos else None)
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return scrape_cache.stats()
+
+
+# ------------ métricas y perfilado ------------
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))        # 0 = perfilado apagado
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.1"))  # fracción de requests que se perfila
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+_perfilando = False   # cProfile admite un solo perfil activo a la vez
+
+@app.middleware("http")
+async def medir_requests(request: Request, call_next):
+    """
+    Latencia por ruta (etapa "http_request" en /metrics). Con PROFILE_SLOW_MS>0, perfila con cProfile
+    una muestra de los requests (PROFILE_SAMPLE_RATE) y guarda el .prof de los que superan ese umbral.
+    El perfil abarca todo el event loop mientras dura el request (también otras tareas concurrentes).
+    En respuestas en streaming se mide hasta que salen los headers, no el cuerpo.
+    """
+    global _perfilando
+    prof = None
+    if PROFILE_SLOW_MS > 0 and not _perfilando and random.random() < PROFILE_SAMPLE_RATE:
+        _perfilando, prof = True, cProfile.Profile()
+        prof.enable()
+    t0 = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        dt = time.perf_counter() - t0
+        if prof is not None:
+            prof.disable()
+            _perfilando = False
+            if dt * 1000 >= PROFILE_SLOW_MS:
+                os.makedirs(PROFILE_DIR, exist_ok=True)
+                nombre = request.url.path.strip("/").replace("/", "_") or "root"
+                ruta = os.path.join(PROFILE_DIR, f"{int(time.time())}_{nombre}_{int(dt * 1000)}ms.prof")
+                prof.dump_stats(ruta)
+                print(f"🐢 Request lento ({dt * 1000:.0f} ms) {request.url.path}: perfil en {ruta}")
+    route = request.scope.get("route")
+    path = getattr(route, "path", None) or "static"
+    observar("http_request", dt, route=path, method=request.method)
+    contar("http_requests_total", route=path, method=request.method, status=response.status_code)
+    return response
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Histogramas por etapa y contadores, formato de exposición de Prometheus."""
+    return PlainTextResponse(exportar_metricas(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/extractor/stats")
+def extractor_stats():
+    """Probes de selectores (y cuántos fallaron) y el selector aprendido por sitio y campo."""
+    return ESTRATEGIA.stats()
+
+
+@app.get("/cluster/stats")
+def cluster_stats():
+    """Leases de este proceso, procesos vivos y cuántos grupos tiene cada uno."""
+    return {**leases.stats(), "solo": CLUSTER["solo"], "watches": len(WATCHES)}
+
+
+@app.get("/breakers/stats")
+def breakers_stats():
+    """Circuito por sitio (estado, fallos, rechazos, tiempo perdido) y grupos de watches en backoff."""
+    ahora = time.time()
+    return {**breakers.stats(),
+            "groups_backoff": [{"group": g, "failures": e["failures"], "retry_in_s": max(0, e["retry_at"] - int(ahora))}
+                               for g, e in ADAPT.items() if e.get("failures")]}
+
+
+@app.get("/workers/stats")
+def workers_stats():
+    return worker_pool.stats()
+
+
+@app.get("/telegram/stats")
+def telegram_stats():
+    return telegram.stats()
+
+
+# ------------ vistos por búsqueda ------------
+def _refrescar_vistos(key: str, forzar: bool = False):
+    """
+    Con otros procesos vivos (o `forzar`, al tomar un grupo de otro): si en disco hay vistos de `key` que no
+    tenemos (otra revisión de seen_meta que la que cargamos o escribimos), sumarlos a SEEN. Así el "nuevo"
+    es el mismo en todos los procesos. Se compara la revisión y no last_update: tiene resolución de 1 s.
+    """
+    if CLUSTER["solo"] and not forzar:
+        return
+    fila = store.seen_rev(key)
+    if not fila:
+        return
+    rev, ts = fila
+    vistos = SEEN.get(key)   # si no estaba en memoria, esto ya la trae del disco
+    if vistos is None:
+        vistos = SEEN[key] = nuevo_seen(mode=SEEN_MODE, max_items=SEEN_MAX_PER_KEY)
+    elif store.vistos_al_dia(key, rev):
+        return
+    for n in store.load_seen_key(key):
+        if n not in vistos:
+            vistos.add(n)
+    store.marcar_vistos(key, rev)
+    LAST_TS[key] = max(LAST_TS.get(key, 0), ts)
+
+def _diff_vistos(key: str, results: list[dict], site: str | None = None) -> list[dict]:
+    """Resultados aún no vistos para `key`; los marca como vistos y encola su persistencia."""
+    _refrescar_vistos(key)
+    vistos = SEEN.get(key)
+    if vistos is None:
+        vistos = SEEN[key] = nuevo_seen(mode=SEEN_MODE, max_items=SEEN_MAX_PER_KEY)
+    with medir("seen_diff", site=site):
+        nuevos = [r for r in results if r.get("link") and r["link"] not in vistos]
+        nums = [vistos.add(r["link"]) for r in nuevos]
+    LAST_TS[key] = int(time.time())
+    _sync_seen_to_disk(key, nums)
+    return nuevos
+
+def _key_de_watch(w: dict) -> str:
+    return firma_busqueda(w["q"], w["min_price"], w["max_price"], w["condition"], w["envio"], w["site"], w["phone"])
+
+def _keys_de_watches() -> set[str]:
+    return {_key_de_watch(w) for w in WATCHES.values()}
+
+async def expulsar_vistos():
+    """Olvida búsquedas sin uso en SEEN_RETENTION_DAYS (salvo las de watches activos) y recorta el disco."""
+    if not await asyncio.to_thread(leases.adquirir, "job:seen:evict"):
+        return   # lo hace otro proceso
+    limite = time.time() - SEEN_RETENTION_DAYS * 86400
+    activas = _keys_de_watches()
+    # las del disco (sin cargarlas) más las que sólo están en memoria
+    candidatas = set(await asyncio.to_thread(store.seen_keys_older, int(limite))) | set(SEEN)
+    viejas = [k for k in candidatas if LAST_TS.get(k, 0) < limite and k not in activas]
+    for k in viejas:
+        SEEN.pop(k, None)
+        LAST_TS.pop(k, None)
+        PRECIOS_VISTOS.pop(k, None)
+    store.drop_seen(viejas)
+    await asyncio.to_thread(store.flush)
+    recortados = await asyncio.to_thread(store.trim_seen, SEEN_MAX_PER_KEY)
+    limite_px = int(time.time() - PRICE_RETENTION_DAYS * 86400)
+    PRICES.expulsar(limite_px)
+    await asyncio.to_thread(store.trim_prices, limite_px)
+    await asyncio.to_thread(store.trim_file_ids, TELEGRAM_FILE_CACHE)
+    if viejas or recortados:
+        print(f"🧹 Vistos: {len(viejas)} búsquedas expulsadas, {recortados} items recortados")
+
+
+@app.get("/seen/stats")
+def seen_stats(top: int = Query(20, description="Búsquedas más pesadas a listar")):
+    per_key = [{"key": k, "items": len(s), "bytes": s.nbytes(), "mode": s.mode, "last_update": LAST_TS.get(k)}
+               for k, s in SEEN.items()]
+    per_key.sort(key=lambda d: d["bytes"], reverse=True)
+    total = sum(d["bytes"] for d in per_key)
+    # keys = búsquedas cargadas en memoria; stored_keys = todas las del disco
+    return {"keys": len(per_key), "stored_keys": store.seen_count(), "lazy_loads": getattr(SEEN, "cargas", 0),
+            "items": sum(d["items"] for d in per_key), "bytes": total,
+            "bytes_per_key": round(total / len(per_key), 1) if per_key else 0,
+            "mode": SEEN_MODE, "max_per_key": SEEN_MAX_PER_KEY, "retention_days": SEEN_RETENTION_DAYS,
+            "top": per_key[:top]}
+
+
+# ------------ respuestas JSON: orjson + gzip + ETag ------------
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", "1024"))   # cuerpos más chicos no se comprimen
+GZIP_LEVEL     = int(os.getenv("GZIP_LEVEL", "5"))          # 1 (rápido) .. 9 (más chico)
+
+def _etag_busqueda(key: str, total_seen: int, results: list[dict], delta: bool) -> str:
+    """
+    ETag débil del estado de la búsqueda: key + cuántos vistos tiene + hash de (ID, precio) de lo devuelto.
+    No depende de url/engine/scrape_stats: dos respuestas con los mismos items valen lo mismo para el cliente.
+    """
+    h = hashlib.blake2b(f"{key}|{total_seen}|{'d' if delta else 'f'}".encode(), digest_size=12)
+    for r in results:
+        h.update(f"|{r.get('item_id') or r.get('link')}:{r.get('price')}".encode())
+    return f'W/"{h.hexdigest()}"'
+
+def _etag_coincide(request: Request, etag: str) -> bool:
+    """If-None-Match (comparación débil: W/ no cuenta)."""
+    inm = request.headers.get("if-none-match")
+    if not inm:
+        return False
+    if inm.strip() == "*":
+        return True
+    return etag.removeprefix("W/") in {t.strip().removeprefix("W/") for t in inm.split(",")}
+
+def _respuesta_json(request: Request, data: dict, etag: str | None = None) -> Response:
+    """
+    Serializa con orjson y, si el cliente lo acepta y el cuerpo pasa de GZIP_MIN_BYTES, lo comprime con gzip.
+    Con `etag`, un If-None-Match que coincide recibe 304 sin cuerpo (sin serializar nada).
+    """
+    route = getattr(request.scope.get("route"), "path", request.url.path)
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag:
+        headers["ETag"] = etag
+        if _etag_coincide(request, etag):
+            return Response(status_code=304, headers=headers)
+    with medir("serializar", route=route):
+        body = orjson.dumps(data)
+        encoding = "identity"
+        if len(body) >= GZIP_MIN_BYTES and "gzip" in request.headers.get("accept-encoding", ""):
+            body = gzip.compress(body, GZIP_LEVEL)
+            headers["Content-Encoding"] = encoding = "gzip"
+    contar("http_response_bytes_total", len(body), route=route, encoding=encoding)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 
 # ------------ endpoint original /search (sigue funcionando) ------------
+async def _buscar(q, min_price=None, max_price=None, condition=None, envio=None, site="mercadolibre.com.co",
+                  delta=False, phone=None, engine="auto", max_pages=1) -> dict:
+    """Una búsqueda de /search (scrape + delta contra su key). Los vistos quedan encolados para el flusher."""
+    if engine not in ENGINES:
+        raise ValueError(f"engine inválido: {engine!r} (usa {', '.join(ENGINES)})")
+    key = firma_busqueda(q, min_price, max_price, condition, envio, site, phone)
+    data = await scrape_busqueda(q, min_price, max_price, condition, envio, site, engine,
+                                 max_pages, keys_vistos=[key])
+    results = data.get("results", [])
+    nuevos = _diff_vistos(key, results, site)
+
+    return ({"url": data.get("url"), "engine": data.get("engine"), "new_results": nuevos, "new_count": len(nuevos),
+             "total_seen": len(SEEN[key]), "key": key, "last_update": LAST_TS[key], "pages": data.get("pages", 1), "scrape_stats": data.get("stats")}
+            if delta else
+            {"url": data.get("url"), "engine": data.get("engine"), "results": results, "returned": len(results),
+             "total_seen": len(SEEN[key]), "key": key, "last_update": LAST_TS[key], "pages": data.get("pages", 1), "scrape_stats": data.get("stats")})
+
 @app.get("/search")
 async def search_items(
+    request: Request,
     q: str = Query(..., description="Palabra clave"),
     min_price: int | None = Query(None),
     max_price: int | None = Query(None),
@@ -94,42 +578,279 @@ async def search_items(
     envio: str | None = Query(None, description="gratis/no"),
     site: str = Query("mercadolibre.com.co"),
     delta: bool = Query(False, description="Si true, devuelve solo nuevos"),
-    phone: str | None = Query(None, description="Teléfono (ahora puede usarse como ID)")
+    phone: str | None = Query(None, description="Teléfono (ahora puede usarse como ID)"),
+    engine: str = Query("auto", description="auto/http/browser"),
+    max_pages: int = Query(1, ge=1, description="Páginas de resultados a recorrer (50 por página)")
 ):
+    """
+    Cada respuesta lleva ETag: un poll con If-None-Match cuyo resultado no cambió (mismos items, mismos
+    vistos) recibe 304 sin cuerpo. Cuerpos grandes van con gzip si el cliente lo acepta.
+    """
     try:
-        data = await asyncio.to_thread(
-            asyncio.run,
-            scrape_meli(q, site_domain=site,
-                        min_price=min_price,
-                        max_price=max_price,
-                        condition=condition,
-                        envio=envio)
-        )
-        results = data.get("results", [])
-
-        # limpiar URLs
-        for r in results:
-            if r.get("link"):
-                r["link"] = limpiar_url(r["link"])
-
-        key = firma_busqueda(q, min_price, max_price, condition, envio, site, phone)
-        with _store_lock:
-            vistos = SEEN.setdefault(key, set())
-            nuevos = [r for r in results if r.get("link") and r["link"] not in vistos]
-            for r in nuevos: vistos.add(r["link"])
-            LAST_TS[key] = int(time.time())
-            _sync_seen_to_disk()
-
-        return ({"url": data.get("url"), "new_results": nuevos, "new_count": len(nuevos),
-                 "total_seen": len(SEEN[key]), "key": key, "last_update": LAST_TS[key]}
-                if delta else
-                {"url": data.get("url"), "results": results, "returned": len(results),
-                 "total_seen": len(SEEN[key]), "key": key, "last_update": LAST_TS[key]})
+        d = await _buscar(q, min_price, max_price, condition, envio, site, delta, phone, engine, max_pages)
+        etag = _etag_busqueda(d["key"], d["total_seen"], d["new_results" if delta else "results"], delta)
+        return _respuesta_json(request, d, etag)
     except Exception as e:
         import traceback; print("🔥 ERROR /search:", traceback.format_exc())
         return {"error": str(e)}
 
 
+# ------------ /search/batch: muchas búsquedas en un request ------------
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))    # búsquedas simultáneas por batch (tope)
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "100"))  # búsquedas máximas por batch
+# parámetros de /search aceptados en cada búsqueda del batch, con su default
+_PARAMS_BUSQUEDA = {"q": None, "min_price": None, "max_price": None, "condition": None, "envio": None,
+                    "site": "mercadolibre.com.co", "delta": False, "phone": None, "engine": "auto", "max_pages": 1}
+
+def _params_batch(spec) -> dict:
+    """Valida una búsqueda del batch (mismos parámetros que /search) y completa los defaults."""
+    if not isinstance(spec, dict):
+        raise ValueError("cada búsqueda debe ser un objeto con los parámetros de /search")
+    sobran = set(spec) - set(_PARAMS_BUSQUEDA)
+    if sobran:
+        raise ValueError(f"parámetros desconocidos: {', '.join(sorted(sobran))}")
+    p = {**_PARAMS_BUSQUEDA, **{k: v for k, v in spec.items() if v is not None}}
+    if not isinstance(p["q"], str) or not p["q"].strip():
+        raise ValueError("falta q")
+    for k in ("min_price", "max_price"):
+        if p[k] is not None:
+            p[k] = int(p[k])
+    p["max_pages"] = max(1, int(p["max_pages"]))
+    p["delta"] = bool(p["delta"])
+    return p
+
+@app.post("/search/batch")
+async def search_batch(
+    request: Request,
+    queries: list = Body(..., description="Búsquedas con los parámetros de /search (q, min_price, ..., max_pages)"),
+    concurrency: int | None = Body(None, description="Búsquedas simultáneas (tope BATCH_CONCURRENCY)")
+):
+    """
+    Varias búsquedas de /search en un solo request. Corren de a `concurrency` a la vez sobre el mismo
+    pool de navegadores y la misma caché (búsquedas repetidas en el batch comparten un solo scrape). Los
+    vistos de todas se retienen en memoria y se escriben juntos al final, en UNA transacción (el flusher
+    periódico no los ve mientras el batch corre; las muestras de precio sí siguen su curso normal).
+    Devuelve {"results": [...]} en el orden recibido: cada elemento es la respuesta de /search o {"error"}.
+    """
+    if not isinstance(queries, list) or not queries:
+        return {"error": "queries debe ser una lista no vacía"}
+    if len(queries) > BATCH_MAX_QUERIES:
+        return {"error": f"demasiadas búsquedas: {len(queries)} (máximo {BATCH_MAX_QUERIES})"}
+    conc = max(1, min(int(concurrency or BATCH_CONCURRENCY), BATCH_CONCURRENCY))
+    sem = asyncio.Semaphore(conc)
+    t0 = time.perf_counter()
+
+    async def una(i, spec):
+        try:
+            p = _params_batch(spec)
+            async with sem:
+                return {"index": i, **await _buscar(**p)}
+        except Exception as e:
+            print(f"⚠️ /search/batch [{i}]:", e)
+            return {"index": i, "error": str(e)}
+
+    retenidos = {}
+    token = _vistos_del_batch.set(retenidos)   # las tareas del gather copian el contexto: comparten el dict
+    try:
+        res = await asyncio.gather(*(una(i, s) for i, s in enumerate(queries)))
+    finally:
+        _vistos_del_batch.reset(token)
+        for key, nums in retenidos.items():
+            store.add_seen(key, nums, LAST_TS.get(key))
+    try:
+        await asyncio.to_thread(store.flush)   # los vistos de todo el batch, en una sola transacción
+    except Exception as e:
+        print("⚠️ Error persistiendo:", e)
+    errores = sum("error" in r for r in res)
+    contar("search_batch_queries_total", len(res) - errores, result="ok")
+    contar("search_batch_queries_total", errores, result="error")
+    return _respuesta_json(request, {"results": res, "count": len(res), "errors": errores, "concurrency": conc,
+                                     "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1)})
+
+
+# ------------ /search en streaming (NDJSON): cada card apenas se parsea ------------
+async def _cards_pagina(q, min_price, max_price, condition, envio, site, engine, pagina, info):
+    """
+    Cards limpias de UNA página a medida que llegan. Si la URL ya está en la caché (o otro
+    request la está scrapeando) se reutiliza ese resultado; si no, se hace streaming y al
+    terminar se guarda en la caché para los /search que vengan detrás.
+    """
+    url = construir_url(q, site, min_price, max_price, condition, envio, pagina)
+    if scrape_cache.disponible(url):
+        data = await scrape_compartido(q, min_price, max_price, condition, envio, site, engine, pagina)
+        info.update(url=data.get("url"), engine=data.get("engine"), stats=data.get("stats"))
+        for r in data.get("results", []):
+            yield r
+        return
+    async def _en_worker(query, site_domain, min_price, max_price, condition, envio, pagina):
+        return await worker_pool.scrape(q=query, site=site_domain, min_price=min_price, max_price=max_price,
+                                        condition=condition, envio=envio, engine="browser", pagina=pagina)
+
+    results = []
+    with breakers.llamada(normalizar_site(site)):   # circuito por sitio canónico (como la URL)
+        async for r in scrape_stream(q, site_domain=site, min_price=min_price, max_price=max_price,
+                                     condition=condition, envio=envio, engine=engine,
+                                     pool=browser_pool, pagina=pagina, info=info,
+                                     navegador=_en_worker if worker_pool.iniciado else None):
+            with medir("limpiar_url", site=site, engine=info.get("engine", "http")):
+                results.append(_limpiar_card(r))
+            yield r
+    contar("scrapes_total", site=site, engine=info.get("engine"), result="ok" if results else "empty")
+    contar("results_total", len(results), site=site, engine=info.get("engine"))
+    _registrar_precios(results)
+    scrape_cache.put(url, {"url": info.get("url"), "results": results,
+                           "engine": info.get("engine"), "stats": info.get("stats")})
+
+def _frame(d: dict) -> str:
+    return json.dumps(d, ensure_ascii=False) + "\n"
+
+@app.get("/search/stream")
+async def search_stream(
+    q: str = Query(..., description="Palabra clave"),
+    min_price: int | None = Query(None),
+    max_price: int | None = Query(None),
+    condition: str | None = Query(None, description="nuevo/usado"),
+    envio: str | None = Query(None, description="gratis/no"),
+    site: str = Query("mercadolibre.com.co"),
+    delta: bool = Query(False, description="Si true, emite solo nuevos"),
+    phone: str | None = Query(None, description="Teléfono (ahora puede usarse como ID)"),
+    engine: str = Query("auto", description="auto/http/browser"),
+    max_pages: int = Query(1, ge=1, description="Páginas de resultados a recorrer (50 por página)")
+):
+    """
+    Igual que /search pero en NDJSON (una línea JSON por evento), para pintar apenas hay datos:
+      {"type":"start", key, url}
+      {"type":"item", new, ...card}      una por resultado (con delta=true, sólo los nuevos)
+      {"type":"summary", key, total_seen, new_count, returned, pages, engine, scrape_stats, last_update}
+      {"type":"error", error}            si algo falla a mitad de camino
+    Las páginas se recorren en orden (no en paralelo) para que la primera card salga cuanto antes.
+    Los vistos se marcan al final, como en /search: si el cliente corta antes, no se marca nada.
+    """
+    if engine not in ENGINES:
+        return {"error": f"engine inválido: {engine!r} (usa {', '.join(ENGINES)})"}
+    key = firma_busqueda(q, min_price, max_price, condition, envio, site, phone)
+    max_pages = max(1, min(int(max_pages or 1), MAX_PAGES_LIMIT))
+
+    async def eventos():
+        t0 = time.perf_counter()
+        yield _frame({"type": "start", "key": key,
+                      "url": construir_url(q, site, min_price, max_price, condition, envio)})
+        results, ids, infos = [], set(), []
+        _refrescar_vistos(key)
+        try:
+            for pagina in range(1, max_pages + 1):
+                info, nuevos_pag = {}, 0
+                async for r in _cards_pagina(q, min_price, max_price, condition, envio, site,
+                                             engine, pagina, info):
+                    if not r.get("link"): continue
+                    n = item_num(r["link"])
+                    if n in ids: continue
+                    ids.add(n)
+                    results.append(r)
+                    vistos = SEEN.get(key)
+                    nuevo = vistos is None or r["link"] not in vistos
+                    nuevos_pag += nuevo
+                    if nuevo or not delta:
+                        yield _frame({"type": "item", "new": nuevo, **r})
+                infos.append(info)
+                if nuevos_pag == 0:
+                    break   # página vacía o sin nada nuevo: como scrape_paginas
+        except Exception as e:
+            import traceback; print("🔥 ERROR /search/stream:", traceback.format_exc())
+            yield _frame({"type": "error", "error": str(e)})
+            if not infos:
+                return
+        nuevos = _diff_vistos(key, results, site)
+        stats = [i.get("stats") or {} for i in infos]
+        yield _frame({"type": "summary", "key": key, "url": infos[0].get("url") if infos else None,
+                      "engine": infos[0].get("engine") if infos else None,
+                      "total_seen": len(SEEN[key]), "new_count": len(nuevos), "returned": len(results),
+                      "pages": len(infos), "last_update": LAST_TS[key],
+                      "scrape_stats": {"ms": round((time.perf_counter() - t0) * 1000, 1),
+                                       "bytes": sum(s.get("bytes", 0) for s in stats),
+                                       "requests": sum(s.get("requests", 0) for s in stats),
+                                       "blocked": sum(s.get("blocked", 0) for s in stats)}})
+
+    return StreamingResponse(eventos(), media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# ------------ feed de novedades por SSE (reemplaza el polling de /search desde el frontend) ------------
+async def _producir_feed(spec: dict) -> dict | None:
+    """Un ciclo del feed: scrape compartido + delta contra la key del feed."""
+    key = spec["key"]
+    _refrescar_vistos(key)
+    # primer ciclo de este feed (nuevo o reabierto): la pestaña ya pintó el listado por /search/stream,
+    # así que sólo se registran los vistos; no depende de si la key ya existía en SEEN
+    primera = spec["primera"]
+    async with scrape_limiter.slot(spec["site"]):
+        data = await scrape_busqueda(spec["q"], spec["min_price"], spec["max_price"], spec["condition"],
+                                     spec["envio"], spec["site"], spec["engine"], spec["max_pages"], keys_vistos=[key])
+    nuevos = _diff_vistos(key, data.get("results", []), spec["site"])
+    if primera:
+        return None
+    return {"type": "delta", "new_results": nuevos, "new_count": len(nuevos),
+            "total_seen": len(SEEN[key]), "last_update": LAST_TS[key]}
+
+feeds = FeedHub(None, _producir_feed,   # el scheduler se le asigna al arrancar
+                idle_sec=float(os.getenv("FEED_IDLE_SEC", "60")),
+                queue_size=int(os.getenv("FEED_QUEUE_SIZE", "20")))
+
+@app.get("/search/feed")
+async def search_feed(
+    q: str = Query(..., description="Palabra clave"),
+    min_price: int | None = Query(None),
+    max_price: int | None = Query(None),
+    condition: str | None = Query(None, description="nuevo/usado"),
+    envio: str | None = Query(None, description="gratis/no"),
+    site: str = Query("mercadolibre.com.co"),
+    engine: str = Query("auto", description="auto/http/browser"),
+    max_pages: int = Query(1, ge=1, description="Páginas de resultados a recorrer (50 por página)"),
+    refresh_sec: int = Query(60, description="Intervalo deseado (el feed usa el más corto de sus clientes)")
+):
+    """
+    Server-Sent Events con SOLO los items nuevos de una búsqueda. Todas las pestañas con la misma
+    búsqueda comparten un feed: el servidor la scrapea una vez por intervalo y empuja
+    {"type":"delta", new_results, new_count, total_seen, last_update} a cada una.
+    """
+    if engine not in ENGINES:
+        return {"error": f"engine inválido: {engine!r} (usa {', '.join(ENGINES)})"}
+    max_pages = max(1, min(int(max_pages or 1), MAX_PAGES_LIMIT))
+    # key propia del feed (no la de /search): los vistos del feed no se mezclan con los de otras llamadas
+    key = firma_busqueda(q, min_price, max_price, condition, envio, site, f"feed:{engine}:{max_pages}")
+    # búsqueda canónica (como watches y /search): el cupo por sitio de scrape_limiter es por sitio canónico
+    spec = {"key": key, **spec_canonica(q, min_price, max_price, condition, envio, site),
+            "engine": engine, "max_pages": max_pages}
+    cliente = feeds.join(key, spec, refresh_sec)
+    return StreamingResponse(feeds.eventos(cliente), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/feeds/stats")
+def feeds_stats():
+    return feeds.stats()
+
+
+# ------------ historial de precios ------------
+@app.get("/history")
+def price_history(
+    item: str = Query(..., description="ID de item (MCOU3280931767) o link del producto"),
+    points: int = Query(100, ge=1, le=2000, description="Puntos máximos de la serie (se agrupa por tramos de tiempo)"),
+    since: int | None = Query(None, description="Desde (epoch)"),
+    until: int | None = Query(None, description="Hasta (epoch)")
+):
+    """Serie de precios de un item, reducida a `points` tramos (min/max/último por tramo)."""
+    try:
+        n = item_num_sitio(item)
+        ts, precios = store.price_series(n, since or 0, until)
+        ultimo = PRICES.get(n)
+        return {"item_id": item_id(item), "samples": len(ts),
+                "latest": {"price": ultimo[0], "ts": ultimo[1]} if ultimo else None,
+                "min": min(precios) if precios else None, "max": max(precios) if precios else None,
+                "points": submuestrear(ts, precios, points)}
+    except Exception as e:
+        return {"error": str(e)}
+
+
 # ------------ registrar chat_id para un teléfono ------------
 @app.post("/register_chat")
 def register_chat(phone: str = Body(...), chat_id: str = Body(...)):
@@ -137,9 +858,9 @@ def register_chat(phone: str = Body(...), chat_id: str = Body(...)):
     Registra la relación phone -> chat_id. El usuario debe haber hablado al bot.
     (En producción conviene hacerlo por Webhook /getUpdates y capturar automáticamente)
     """
-    with _store_lock:
-        PHONEMAP[phone] = chat_id
-        _sync_phonemap_to_disk()
+    PHONEMAP[phone] = chat_id
+    _sync_phonemap_to_disk(phone)
+    store.flush()   # endpoint síncrono (threadpool): persistir ya
     return {"ok": True, "phone": phone, "chat_id": chat_id}
 
 
@@ -153,86 +874,286 @@ def subscribe(
     condition: str | None = Body(None),
     envio: str | None = Body(None),
     site: str = Body("mercadolibre.com.co"),
-    interval_sec: int = Body(300, embed=True)  # por defecto, 5 minutos
+    interval_sec: int = Body(300, embed=True),  # por defecto, 5 minutos
+    engine: str = Body("auto"),                 # auto/http/browser
+    max_pages: int = Body(1),                   # páginas de resultados a vigilar
+    price_drop_pct: float | None = Body(None),  # avisar si un item ya visto baja más de X%
+    price_below: int | None = Body(None)        # ... o si baja de este precio
 ):
     """
     Crea una suscripción (watch) que ejecuta el scraper cada interval_sec y
     envía por Telegram SOLO los NUEVOS hallazgos (primera vez que aparezcan).
+    Con price_drop_pct / price_below también avisa cuando un item ya visto baja de precio.
     phone es obligatorio y será el ID lógico de la suscripción.
     """
+    if engine not in ENGINES:
+        return {"ok": False, "error": f"engine inválido: {engine!r} (usa {', '.join(ENGINES)})"}
     wid = watch_id_from_params(q, min_price, max_price, condition, envio, site, phone)
+    s = spec_canonica(q, min_price, max_price, condition, envio, site)   # q se guarda como se escribió (mensajes)
     WATCHES[wid] = {
-        "q": q, "phone": phone, "min_price": min_price, "max_price": max_price,
-        "condition": condition, "envio": envio, "site": site,
+        "q": " ".join(q.split()), "phone": phone, "min_price": s["min_price"], "max_price": s["max_price"],
+        "condition": s["condition"], "envio": s["envio"], "site": s["site"],
         "interval_sec": max(30, int(interval_sec)),  # hard floor 30s
+        "engine": engine,
+        "max_pages": max(1, min(int(max_pages), MAX_PAGES_LIMIT)),
+        "price_drop_pct": price_drop_pct,
+        "price_below": price_below,
         "last_run": 0
     }
-    _sync_watches_to_disk()
+    _sync_watches_to_disk(wid)
+    store.flush()   # endpoint síncrono (threadpool): persistir ya
+
+    # (Re)programar el grupo de la búsqueda (un solo scrape para todos sus suscriptores)
+    gkey = grupo_de_watch(WATCHES[wid])
+    _programar_grupo(gkey)
+
+    return {"ok": True, "watch_id": wid, "interval_sec": WATCHES[wid]["interval_sec"],
+            "group": gkey, "group_interval_sec": _intervalo_grupo(gkey),
+            "subscribers": len(_miembros_grupo(gkey))}
+
+
+# ------------ grupos de watches: misma búsqueda (sin phone) => un solo scrape ------------
+def grupo_de_watch(w: dict) -> str:
+    return firma_busqueda(w["q"], w["min_price"], w["max_price"], w["condition"], w["envio"], w["site"])
+
+def _miembros_grupo(gkey: str) -> list[str]:
+    return [wid for wid, w in WATCHES.items() if grupo_de_watch(w) == gkey]
+
+def _intervalo_grupo(gkey: str) -> int | None:
+    ivs = [max(30, int(WATCHES[wid].get("interval_sec", 300))) for wid in _miembros_grupo(gkey)]
+    return min(ivs) if ivs else None
+
+def _agendar_grupo(gkey: str, iv: int, primera: datetime | None = None):
+    """(Re)crea el job del grupo: intervalo `iv` con jitter; `primera` fija la fase de la primera corrida."""
+    kw = {"next_run_time": primera} if primera else {}
+    scheduler.add_job(run_group, "interval", seconds=iv, jitter=max(1, int(iv * WATCH_JITTER)),
+                      id=f"group:{gkey}", args=[gkey], replace_existing=True,
+                      coalesce=True, misfire_grace_time=iv, **kw)
+
+def _programar_grupo(gkey: str):
+    """
+    Crea/ajusta el job del grupo al intervalo más corto de sus miembros (o lo quita si quedó vacío).
+    Un job nuevo arranca con fase aleatoria dentro del intervalo: tras un reinicio no disparan todos juntos.
+    """
+    if scheduler is None:
+        return   # todavía no arrancó: al arrancar se programan todos los grupos
+    job_id = f"group:{gkey}"
+    base = _intervalo_grupo(gkey)
+    job = scheduler.get_job(job_id)
+    if base is None:
+        if job: scheduler.remove_job(job_id)
+        ADAPT.pop(gkey, None)
+        return
+    estado = ADAPT.get(gkey)
+    if job and estado and estado["base"] == base:
+        return  # sin cambios: no reiniciar el temporizador ni el intervalo adaptado
+    ADAPT[gkey] = {"base": base, "interval": base, "idle_runs": 0, "last_new": 0, "failures": 0}
+    primera = None if job else datetime.now() + timedelta(seconds=random.uniform(0, base))
+    _agendar_grupo(gkey, base, primera)
+
+def _adaptar_grupo(gkey: str, nuevos: int):
+    """Búsquedas sin novedades se espacian hacia WATCH_MAX_INTERVAL; las que traen nuevos vuelven hacia interval_sec."""
+    estado = ADAPT.get(gkey)
+    if estado is None or not scheduler.get_job(f"group:{gkey}"):
+        return
+    if estado.get("failures"):
+        estado["failures"] = 0   # volvió a andar: el job ya sigue con su intervalo normal
+        estado.pop("retry_at", None)
+    estado["idle_runs"] = 0 if nuevos else estado["idle_runs"] + 1
+    if nuevos: estado["last_new"] = int(time.time())
+    iv = siguiente_intervalo(estado["interval"], estado["base"], WATCH_MAX_INTERVAL, nuevos,
+                             estado["idle_runs"], WATCH_BACKOFF)
+    if iv != estado["interval"]:
+        estado["interval"] = iv
+        _agendar_grupo(gkey, iv)
+
+def _backoff_grupo(gkey: str, espera_min: float = 0):
+    """
+    Scrape fallido o circuito abierto: la próxima corrida del grupo se aleja x2 por cada fallo seguido
+    (hasta WATCH_MAX_INTERVAL) y nunca antes de que el circuito del sitio deje pasar una prueba.
+    """
+    estado = ADAPT.get(gkey)
+    if estado is None or scheduler is None or not scheduler.get_job(f"group:{gkey}"):
+        return
+    estado["failures"] = estado.get("failures", 0) + 1
+    espera = max(espera_min, min(WATCH_MAX_INTERVAL, estado["interval"] * 2 ** estado["failures"]))
+    estado["retry_at"] = int(time.time() + espera)
+    _agendar_grupo(gkey, estado["interval"], datetime.now() + timedelta(seconds=espera))
+
+# hora programada de cada corrida (para medir el lag) y corridas salteadas por seguir ocupadas
+_PROGRAMADO: dict[str, float] = {}
+_CORRIENDO: set[str] = set()   # grupos con una corrida en curso (no se sueltan a otro proceso)
+SALTEADAS = {"count": 0}
+
+def _al_enviar_job(ev):
+    if ev.scheduled_run_times:
+        _PROGRAMADO[ev.job_id] = ev.scheduled_run_times[-1].timestamp()
+
+def _al_saltear_job(ev):
+    SALTEADAS["count"] += 1
+
+def _crear_scheduler():
+    global scheduler
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+    from apscheduler.events import EVENT_JOB_SUBMITTED, EVENT_JOB_MAX_INSTANCES
+    scheduler = feeds.scheduler = AsyncIOScheduler()
+    scheduler.add_listener(_al_enviar_job, EVENT_JOB_SUBMITTED)
+    scheduler.add_listener(_al_saltear_job, EVENT_JOB_MAX_INSTANCES)
+
+
+@app.get("/scheduler/stats")
+def scheduler_stats():
+    """Profundidad de cola / lag de los scrapes programados e intervalos adaptados por grupo."""
+    if scheduler is None:
+        return {"ready": False}
+    ahora = datetime.now().astimezone()
+    vencidos = [j for j in scheduler.get_jobs() if j.next_run_time and j.next_run_time <= ahora]
+    return {**scrape_limiter.stats(), "overdue_jobs": len(vencidos), "skipped_busy": SALTEADAS["count"],
+            "jobs": len(scheduler.get_jobs()),
+            "groups": [{"group": g, **e} for g, e in sorted(ADAPT.items(), key=lambda kv: kv[1]["interval"])]}
+
+
+# ------------ tarea programada: un scrape por grupo, delta/notificación por suscriptor ------------
+async def run_group(gkey: str):
+    wids = _miembros_grupo(gkey)
+    if not wids: return
+    # con varios procesos, cada grupo lo corre sólo el dueño de su lease; si el dueño muere, el lease
+    # vence y lo toma el primero que llegue (trayendo del disco lo que el anterior ya había visto)
+    lease = f"group:{gkey}"
+    tomado = leases.es_nuevo(lease)
+    if tomado and not CLUSTER["solo"] and len(leases.propios("group:")) >= _cupo_grupos():
+        return   # ya tenemos nuestra parte: que lo tome otro proceso
+    if gkey in _CORRIENDO or not await asyncio.to_thread(leases.adquirir, lease):
+        return
+    if tomado:
+        for wid in wids:
+            _refrescar_vistos(_key_de_watch(WATCHES[wid]), forzar=True)
+    _CORRIENDO.add(gkey)
+    try:
+        await _correr_grupo(gkey, wids)
+    finally:
+        _CORRIENDO.discard(gkey)
+
+
+async def _correr_grupo(gkey: str, wids: list[str]):
+    programado = _PROGRAMADO.pop(f"group:{gkey}", None)
+    w0 = WATCHES[wids[0]]
+    engines = {WATCHES[wid].get("engine", "auto") for wid in wids}
+    engine = engines.pop() if len(engines) == 1 else "auto"
+    max_pages = max(WATCHES[wid].get("max_pages", 1) for wid in wids)
 
-    # (Re)programar tarea
     try:
-        scheduler.remove_job(wid)
+        async with scrape_limiter.slot(w0["site"], programado):
+            data = await scrape_busqueda(w0["q"], w0["min_price"], w0["max_price"],
+                                         w0["condition"], w0["envio"], w0["site"], engine, max_pages,
+                                         keys_vistos=[_key_de_watch(WATCHES[wid]) for wid in wids])
+    except CircuitoAbierto as e:
+        if not ADAPT.get(gkey, {}).get("failures"):   # avisar al entrar en backoff, no en cada corrida
+            print(f"⏸️ Grupo {gkey[:8]}: {e}")
+        _backoff_grupo(gkey, e.reintento_en)
+        return
     except Exception:
-        pass
-    scheduler.add_job(run_watch, "interval", seconds=WATCHES[wid]["interval_sec"], id=wid, args=[wid], replace_existing=True)
+        import traceback; print("🔥 ERROR run_group:", traceback.format_exc())
+        _backoff_grupo(gkey, breakers.reintento_en(normalizar_site(w0["site"])))
+        return
+
+    results = data.get("results", [])
+    nuevos = 0
+    for wid in wids:
+        try:
+            nuevos += run_watch(wid, results)
+        except Exception:
+            import traceback; print("🔥 ERROR run_watch:", traceback.format_exc())
 
-    return {"ok": True, "watch_id": wid, "interval_sec": WATCHES[wid]["interval_sec"]}
+    _sync_watches_to_disk(*wids)
+    _adaptar_grupo(gkey, nuevos)
 
 
-# ------------ tarea programada: ejecuta el scraper y notifica ------------
-async def run_watch(wid: str):
+def run_watch(wid: str, results: list[dict]) -> int:
+    """
+    Aplica el resultado compartido del grupo a UNA suscripción: delta SEEN por phone y envío por Telegram.
+    Devuelve cuántos items nuevos hubo.
+    """
     w = WATCHES.get(wid)
-    if not w: return
+    if not w: return 0
     q, phone = w["q"], w["phone"]
-    min_price, max_price = w["min_price"], w["max_price"]
-    condition, envio, site = w["condition"], w["envio"], w["site"]
 
     # si no tenemos chat_id para ese teléfono, salimos (aún no habló al bot)
     chat_id = PHONEMAP.get(phone)
     if not chat_id:
         print(f"ℹ️ Sin chat_id para {phone}. Usa /register_chat para asociarlo.")
-        return
+        return 0
 
-    # scrape
-    try:
-        data = await asyncio.to_thread(
-            asyncio.run,
-            scrape_meli(q, site_domain=site,
-                        min_price=min_price, max_price=max_price,
-                        condition=condition, envio=envio)
-        )
-        results = data.get("results", [])
-        for r in results:
-            if r.get("link"): r["link"] = limpiar_url(r["link"])
-
-        # clave SEEN por búsqueda+phone para que el "nuevo" sea por suscripción
-        key = firma_busqueda(q, min_price, max_price, condition, envio, site, phone)
-        with _store_lock:
-            vistos = SEEN.setdefault(key, set())
-            nuevos = [r for r in results if r.get("link") and r["link"] not in vistos]
-            for r in nuevos: vistos.add(r["link"])
-            LAST_TS[key] = int(time.time())
-            _sync_seen_to_disk()
-
-        # enviar sólo si hay nuevos
-        if nuevos:
-            for it in nuevos[:10]:  # enviar hasta 10 productos por ciclo
-                caption = f"{it['title']}\n💰 ${it['price']:,}\n{it['link']}"
-                if it.get("image"):
-                    send_telegram_photo(chat_id, it["image"], caption)
-                else:
-                    send_telegram_message(chat_id, caption)
-            if len(nuevos) > 10:
-                send_telegram_message(chat_id, f"🔎 Hay {len(nuevos)-10} resultados adicionales para \"{q}\"…")
-            print(f"Telegram a {phone} ({chat_id}) → {len(nuevos)} nuevos con imágenes")
+    # clave SEEN por búsqueda+phone para que el "nuevo" sea por suscripción
+    key = _key_de_watch(w)
+    nuevos = _diff_vistos(key, results, w["site"])
 
-            ok = send_telegram_message(chat_id, texto)
-            print(f"Telegram a {phone} ({chat_id}) → {len(nuevos)} nuevos | ok={ok}")
+    bajas = _bajas_de_precio(w, key, results, {id(r) for r in nuevos})
+    if bajas:
+        lineas = [f"📉 Bajó de precio ({q}):"]
+        for it in bajas[:10]:
+            pct = (it["prev_price"] - it["price"]) * 100 / it["prev_price"]
+            lineas.append(f"• {it['title']}\n  ${it['prev_price']:,} → ${it['price']:,} (-{pct:.0f}%)\n  {it['link']}")
+        if len(bajas) > 10:
+            lineas.append(f"… y {len(bajas)-10} más.")
+        telegram.send_message(chat_id, "\n".join(lineas))
 
-        WATCHES[wid]["last_run"] = int(time.time())
-        _sync_watches_to_disk()
-    except Exception as e:
-        import traceback; print("🔥 ERROR run_watch:", traceback.format_exc())
+    # enviar sólo si hay nuevos (se encola: el envío real lo hace el notifier en segundo plano)
+    if nuevos:
+        fotos = []
+        for it in nuevos[:10]:  # enviar hasta 10 productos por ciclo, las fotos en un solo álbum
+            caption = f"{it['title']}\n💰 ${it['price']:,}\n{it['link']}"
+            if it.get("image"):
+                fotos.append((it["image"], caption))
+            else:
+                telegram.send_message(chat_id, caption)
+        if fotos:
+            telegram.send_album(chat_id, fotos)
+        if len(nuevos) > 10:
+            telegram.send_message(chat_id, f"🔎 Hay {len(nuevos)-10} resultados adicionales para \"{q}\"…")
+        print(f"Telegram a {phone} ({chat_id}) → {len(nuevos)} nuevos encolados ({len(fotos)} con imagen)")
+
+    WATCHES[wid]["last_run"] = int(time.time())
+    return len(nuevos) + len(bajas)
+
+
+def _precios_vistos(key: str) -> dict[int, int]:
+    """Último precio que vio el suscriptor `key` por item; del disco la primera vez o con otros procesos vivos."""
+    precios = PRECIOS_VISTOS.get(key)
+    if precios is None or not CLUSTER["solo"]:
+        precios = PRECIOS_VISTOS[key] = store.load_seen_prices(key)
+    return precios
+
+def _bajas_de_precio(w: dict, key: str, results: list[dict], excluir: set[int]) -> list[dict]:
+    """
+    Items ya vistos cuyo precio bajó más de price_drop_pct % o por debajo de price_below respecto del último
+    precio que vio ESTE suscriptor (no del último scrape de cualquiera: /search, feeds u otro grupo pueden
+    haber visto el cambio antes). Devuelve copias con `prev_price` (los resultados son del grupo).
+    """
+    pct, umbral = w.get("price_drop_pct"), w.get("price_below")
+    if not pct and not umbral:
+        return []
+    vistos = _precios_vistos(key)
+    bajas, cambios = [], {}
+    for r in results:
+        precio = r.get("price")
+        if not r.get("link") or not isinstance(precio, int):
+            continue
+        n = item_num(r["link"])
+        prev = vistos.get(n)
+        if prev == precio:
+            continue
+        vistos[n] = cambios[n] = precio
+        if id(r) in excluir or not prev or precio >= prev:
+            continue
+        if (pct and (prev - precio) * 100 / prev >= pct) or (umbral and precio <= umbral < prev):
+            bajas.append({**r, "prev_price": prev})
+    if SEEN_MAX_PER_KEY:
+        while len(vistos) > SEEN_MAX_PER_KEY:
+            del vistos[next(iter(vistos))]
+    if cambios:
+        store.put_seen_prices(key, cambios)
+    return bajas
 
 
 def build_message(query, items, site):
@@ -246,21 +1167,92 @@ def build_message(query, items, site):
 
 
 # ------------ ciclo de vida de la app ------------
+ARRANQUE = {"ready": False}   # etapas del arranque en ms (GET /ready)
+_warmup_task = None
+
 @app.on_event("startup")
 async def on_startup():
+    """
+    Arranque por etapas: sólo lo imprescindible antes de atender (watches/chats, scheduler vacío);
+    Telegram, precios, programación de grupos y navegadores/workers se calientan en segundo plano.
+    Mientras tanto /search ya responde (sin pool, el scrape por navegador lanza uno propio).
+    """
+    global _flush_task, _cluster_task, _warmup_task
+    t0 = time.perf_counter()
+    ARRANQUE.clear()
+    ARRANQUE["ready"] = False
+    _abrir_persistencia()
     _sync_mem_from_disk()
-    # reprogramar todas las suscripciones guardadas
-    for wid, w in WATCHES.items():
-        try:
-            scheduler.add_job(run_watch, "interval", seconds=max(30, int(w.get("interval_sec", 300))),
-                              id=wid, args=[wid], replace_existing=True)
-        except Exception as e:
-            print("No se pudo programar", wid, e)
+    _crear_scheduler()
     scheduler.start()
+    _flush_task = asyncio.create_task(_flush_loop())
+    _cluster_task = asyncio.create_task(_cluster_loop())
+    ARRANQUE["serving_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    _warmup_task = asyncio.create_task(_calentar(t0))
+
+async def _calentar(t0: float):
+    def etapa(nombre):
+        ARRANQUE[f"{nombre}_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+
+    try:
+        await telegram.start()   # antes que los grupos: son los únicos que envían (crear el cliente TLS tarda)
+        for url, fid in await asyncio.to_thread(store.load_file_ids, TELEGRAM_FILE_CACHE):
+            if telegram.file_ids.get(url) is None:
+                telegram.file_ids.put(url, fid, persistir=False)
+        etapa("telegram")
+        # último precio por item (lo registrado mientras cargaba es más nuevo: no se pisa)
+        for i, (item, price, ts) in enumerate(await asyncio.to_thread(store.load_latest_prices)):
+            if item not in PRICES:
+                PRICES.set(item, price, ts)
+            if i % 50_000 == 49_999:
+                await asyncio.sleep(0)
+        etapa("prices")
+
+        # reprogramar las suscripciones guardadas: un job por grupo de búsqueda
+        for i, gkey in enumerate({grupo_de_watch(w) for w in WATCHES.values()}):
+            try:
+                _programar_grupo(gkey)
+            except Exception as e:
+                print("No se pudo programar el grupo", gkey, e)
+            if i % 500 == 499:
+                await asyncio.sleep(0)   # no acaparar el loop con miles de grupos
+        scheduler.add_job(expulsar_vistos, "interval", hours=1, id="seen:evict", replace_existing=True)
+        etapa("scheduler")
+
+        if worker_pool.size > 0:
+            # los workers traen su propio navegador: el pool en proceso no hace falta
+            await worker_pool.start()
+        else:
+            try:
+                await browser_pool.start()
+            except Exception as e:
+                print("⚠️ No se pudo iniciar el pool de navegadores:", e)
+        etapa("browsers")
+    finally:
+        ARRANQUE["ready"] = True
+        etapa("ready")
+
+
+@app.get("/ready")
+def ready():
+    """Si terminó el calentamiento en segundo plano, y cuánto tardó cada etapa desde el arranque."""
+    return ARRANQUE
+
 
 @app.on_event("shutdown")
 async def on_shutdown():
-    scheduler.shutdown(wait=False)
+    feeds.cerrar()
+    if _warmup_task: _warmup_task.cancel()
+    if scheduler: scheduler.shutdown(wait=False)
+    await browser_pool.stop()
+    await worker_pool.stop()
+    await cerrar_cliente_http()
+    await telegram.stop()
+    if _flush_task: _flush_task.cancel()
+    if _cluster_task: _cluster_task.cancel()
+    if store:
+        _guardar_estrategia()
+        await asyncio.to_thread(_cerrar_persistencia)
 
 # ------- servir frontend ----------
 app.mount("/", StaticFiles(directory="static", html=True), name="static")
@@ -0,0 +1,97 @@
+# metrics.py
+"""
+Métricas en memoria con salida en formato texto de Prometheus (GET /metrics).
+Sin dependencias: histogramas de latencia por etapa y contadores, con labels (site, engine, ...).
+
+    from metrics import medir, contar
+    with medir("goto", site=site, engine="browser"):
+        await page.goto(url)
+    contar("scrapes_total", site=site, engine="http", result="ok")
+"""
+import threading, time
+from contextlib import contextmanager
+
+# segundos: de 1 ms (limpiar_url, diff de vistos) a 60 s (navegador lento)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()   # Store.flush corre en otro hilo
+_hist: dict[tuple, list] = {}        # (stage, labels) -> [counts por bucket..., +Inf, suma]
+_counters: dict[tuple, float] = {}   # (name, labels) -> valor
+
+
+def _labels(kw: dict) -> tuple:
+    return tuple(sorted((k, "" if v is None else str(v)) for k, v in kw.items()))
+
+
+def observar(stage: str, segundos: float, **labels):
+    """Registra una duración (segundos) en el histograma de la etapa."""
+    k = (stage, _labels(labels))
+    with _lock:
+        h = _hist.get(k)
+        if h is None:
+            h = _hist[k] = [0] * (len(BUCKETS) + 1) + [0.0]
+        for i, b in enumerate(BUCKETS):
+            if segundos <= b:
+                h[i] += 1
+                break
+        else:
+            h[len(BUCKETS)] += 1
+        h[-1] += segundos
+
+
+@contextmanager
+def medir(stage: str, **labels):
+    """Mide el bloque (también si lanza excepción) y lo suma al histograma de `stage`."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar(stage, time.perf_counter() - t0, **labels)
+
+
+def contar(name: str, n: float = 1, **labels):
+    k = (name, _labels(labels))
+    with _lock:
+        _counters[k] = _counters.get(k, 0) + n
+
+
+def _fmt_labels(labels: tuple, extra: tuple = ()) -> str:
+    todos = labels + extra
+    if not todos:
+        return ""
+    return "{" + ",".join(f'{k}="{v.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                          for k, v in todos) + "}"
+
+
+def exportar() -> str:
+    """Todo en formato de exposición de Prometheus (text/plain; version=0.0.4)."""
+    with _lock:
+        hist = {k: list(v) for k, v in _hist.items()}
+        counters = dict(_counters)
+    lineas = []
+    if hist:
+        lineas += ["# HELP meli_stage_seconds Duración por etapa del pipeline (scrape, vistos, persistencia, Telegram).",
+                   "# TYPE meli_stage_seconds histogram"]
+        for (stage, labels), h in sorted(hist.items()):
+            base = (("stage", stage),) + labels
+            acum = 0
+            for b, c in zip(BUCKETS, h):
+                acum += c
+                lineas.append(f"meli_stage_seconds_bucket{_fmt_labels(base, (('le', repr(b)),))} {acum}")
+            acum += h[len(BUCKETS)]
+            lineas.append(f"meli_stage_seconds_bucket{_fmt_labels(base, (('le', '+Inf'),))} {acum}")
+            lineas.append(f"meli_stage_seconds_sum{_fmt_labels(base)} {h[-1]:.6f}")
+            lineas.append(f"meli_stage_seconds_count{_fmt_labels(base)} {acum}")
+    for name in sorted({n for n, _ in counters}):
+        lineas += [f"# TYPE meli_{name} counter"]
+        for (n, labels), v in sorted(counters.items()):
+            if n == name:
+                # valor exacto: con :g (6 cifras) un contador de bytes queda "plano" y rate() da cualquier cosa
+                lineas.append(f"meli_{name}{_fmt_labels(labels)} {int(v) if v == int(v) else repr(float(v))}")
+    return "\n".join(lineas) + "\n"
+
+
+def resetear():
+    with _lock:
+        _hist.clear()
+        _counters.clear()
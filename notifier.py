@@ -1,23 +1,37 @@
-
-import os, requests
+import asyncio, os, random, time
+from collections import OrderedDict
+from urllib.parse import urlparse
+import httpx
+from metrics import medir, contar
 from dotenv import load_dotenv
 
 load_dotenv()
-BOT_TOKEN = "8436903007:AAHReCa7ljClXrTThVSW0sk7gkzvEXbwNIM"
+BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")   # permite apuntar a un Telegram falso
+
+BASE_URL = f"{API_URL}/bot{BOT_TOKEN}" if BOT_TOKEN else None   # sin token: notificaciones desactivadas
+
+_session = None
 
-BASE_URL = f"https://api.telegram.org/bot{BOT_TOKEN}"
+def _sesion():
+    """requests sólo para estas funciones bloqueantes de scripts: se importa al primer uso."""
+    global _session
+    if _session is None:
+        import requests
+        _session = requests.Session()
+    return _session
 
 def send_telegram_message(chat_id: str, text: str) -> bool:
-    """Envía un mensaje de texto simple."""
+    """Envía un mensaje de texto simple (bloqueante; para scripts. La app usa TelegramNotifier)."""
     if not BOT_TOKEN:
         print("⚠️ TELEGRAM_BOT_TOKEN no configurado")
         return False
     try:
-        r = requests.post(f"{BASE_URL}/sendMessage", json={
+        r = _sesion().post(f"{BASE_URL}/sendMessage", json={
             "chat_id": chat_id,
             "text": text,
             "disable_web_page_preview": True
-        })
+        }, timeout=10)
         return r.ok
     except Exception as e:
         print("❌ Error enviando texto:", e)
@@ -25,7 +39,7 @@ def send_telegram_message(chat_id: str, text: str) -> bool:
 
 
 def send_telegram_photo(chat_id: str, photo_url: str, caption: str | None = None) -> bool:
-    """Envía una foto con texto opcional (caption)."""
+    """Envía una foto con texto opcional (caption). Bloqueante, igual que send_telegram_message."""
     if not BOT_TOKEN:
         print("⚠️ TELEGRAM_BOT_TOKEN no configurado")
         return False
@@ -33,8 +47,359 @@ def send_telegram_photo(chat_id: str, photo_url: str, caption: str | None = None
         payload = {"chat_id": chat_id, "photo": photo_url}
         if caption:
             payload["caption"] = caption[:1024]  # límite de 1024 caracteres
-        r = requests.post(f"{BASE_URL}/sendPhoto", json=payload)
+        r = _sesion().post(f"{BASE_URL}/sendPhoto", json=payload, timeout=10)
         return r.ok
     except Exception as e:
         print("❌ Error enviando foto:", e)
         return False
+
+
+# ------------ envío asíncrono con cola, límites y reintentos ------------
+class TokenBucket:
+    """Limitador token-bucket: `rate` envíos/seg con ráfagas de hasta `capacity`."""
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._ts = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def take(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._ts) * self.rate)
+                self._ts = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# ------------ imágenes: validación local y caché de file_id ------------
+_EXT_MALAS = (".svg", ".gif", ".ico", ".bmp")   # placeholders / formatos que sendPhoto rechaza
+
+def imagen_valida(url: str | None) -> bool:
+    """
+    Chequeo local (sin red) de la URL de una foto antes de mandarla a Telegram: http(s) con host,
+    sin placeholders de carga diferida (data:, .gif, .svg...) y de largo razonable.
+    """
+    if not url or len(url) > 2000 or not url.startswith(("http://", "https://")):
+        return False
+    try:
+        p = urlparse(url)
+    except ValueError:
+        return False
+    ruta = p.path.lower()
+    return bool(p.hostname) and "." in p.hostname and not ruta.endswith(_EXT_MALAS) \
+        and "placeholder" not in ruta and "lazy" not in ruta
+
+
+class FileIdCache:
+    """
+    URL de imagen -> file_id que devolvió Telegram la primera vez que se envió. Reenviar por file_id evita que
+    Telegram vuelva a descargar la imagen. LRU acotado a `max_items`; `al_guardar(url, file_id)` permite
+    persistirlo (main lo encola en el Store).
+    """
+    def __init__(self, max_items: int = 50_000, al_guardar=None):
+        self.max_items = max_items
+        self.al_guardar = al_guardar
+        self._d: OrderedDict[str, str] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._d)
+
+    def get(self, url: str) -> str | None:
+        fid = self._d.get(url)
+        if fid is not None:
+            self._d.move_to_end(url)
+        return fid
+
+    def put(self, url: str, file_id: str, persistir: bool = True):
+        self._d[url] = file_id
+        self._d.move_to_end(url)
+        while len(self._d) > self.max_items:
+            self._d.popitem(last=False)
+        if persistir and self.al_guardar:
+            self.al_guardar(url, file_id)
+
+    def quitar(self, url: str):
+        self._d.pop(url, None)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"file_ids": len(self._d), "file_id_hits": self.hits, "file_id_misses": self.misses,
+                "file_id_hit_rate": round(self.hits / total, 3) if total else 0.0}
+
+
+def _file_id(msg) -> str | None:
+    """file_id de la foto más grande de un Message devuelto por sendPhoto / sendMediaGroup."""
+    fotos = msg.get("photo") if isinstance(msg, dict) else None
+    return fotos[-1].get("file_id") if fotos else None
+
+
+class TelegramError(Exception):
+    def __init__(self, msg: str, permanente: bool = False):
+        super().__init__(msg)
+        self.permanente = permanente   # 4xx distinto de 429: reintentar igual no sirve
+
+
+class TelegramNotifier:
+    """
+    Cola de envíos a Telegram en segundo plano:
+    - cliente HTTP compartido (keep-alive) con timeout
+    - límites token-bucket global (~30 msg/s) y por chat (~1 msg/s), como pide Telegram
+    - reintentos con backoff exponencial; en 429 respeta `retry_after`
+    - álbumes con sendMediaGroup (hasta 10 fotos en una sola llamada)
+    - fotos por file_id cuando ya se enviaron antes (FileIdCache); si varios chats mandan la misma imagen
+      a la vez, uno la sube por URL y los demás esperan su file_id. URLs inválidas van como texto.
+    Cada chat tiene su propia cola y tarea, así el orden por chat se mantiene y un chat lento no frena a los demás.
+    """
+    def __init__(self, base_url: str | None = BASE_URL, global_rate: float = 30.0, chat_rate: float = 1.0,
+                 max_retries: int = 4, timeout: float = 10.0, file_ids: FileIdCache | None = None):
+        self.base_url = base_url
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._client: httpx.AsyncClient | None = None
+        self._global: TokenBucket | None = None
+        self._chats: dict[str, tuple[asyncio.Queue, TokenBucket, asyncio.Task]] = {}
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.file_ids = file_ids if file_ids is not None else FileIdCache()
+        self._subiendo: dict[str, asyncio.Future] = {}   # url -> file_id que está subiendo otro chat
+        self._rechazadas: set[str] = set()               # URLs que Telegram ya rechazó
+        self.invalid_images = 0
+
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10))
+            self._global = TokenBucket(self.global_rate)
+
+    async def drain(self, timeout: float | None = None) -> bool:
+        """Espera a que se envíe todo lo encolado. False si se agotó `timeout`."""
+        try:
+            await asyncio.wait_for(asyncio.gather(*(q.join() for q, _, _ in self._chats.values())), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def stop(self, drain_timeout: float = 10.0):
+        """Espera (con tope) a que se vacíen las colas y cierra el cliente."""
+        if not await self.drain(drain_timeout):
+            print("⚠️ Quedaron mensajes de Telegram sin enviar al apagar")
+        for _, _, task in self._chats.values():
+            task.cancel()
+        self._chats.clear()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # ---------- API pública (no bloquea: encola y devuelve un Future con el resultado) ----------
+    def send_message(self, chat_id: str, text: str) -> asyncio.Future:
+        return self._encolar(chat_id, "sendMessage",
+                             {"chat_id": chat_id, "text": text, "disable_web_page_preview": True})
+
+    def _foto_ok(self, url: str | None) -> bool:
+        if imagen_valida(url) and url not in self._rechazadas:
+            return True
+        self.invalid_images += 1
+        return False
+
+    def send_photo(self, chat_id: str, photo_url: str, caption: str | None = None) -> asyncio.Future:
+        if not self._foto_ok(photo_url):
+            return self.send_message(chat_id, caption or photo_url or "")
+        payload = {"chat_id": chat_id, "photo": photo_url}
+        if caption:
+            payload["caption"] = caption[:1024]  # límite de 1024 caracteres
+        return self._encolar(chat_id, "sendPhoto", payload)
+
+    def send_album(self, chat_id: str, photos: list[tuple[str, str | None]]) -> list[asyncio.Future]:
+        """Envía [(photo_url, caption), ...] en álbumes de hasta 10 (sendMediaGroup); las fotos inválidas, como texto."""
+        futs = [self.send_message(chat_id, cap or url or "") for url, cap in photos if not self._foto_ok(url)]
+        photos = [(url, cap) for url, cap in photos if imagen_valida(url) and url not in self._rechazadas]
+        for i in range(0, len(photos), 10):
+            lote = photos[i:i + 10]
+            if len(lote) == 1:
+                futs.append(self.send_photo(chat_id, *lote[0]))
+                continue
+            media = [{"type": "photo", "media": url, **({"caption": cap[:1024]} if cap else {})} for url, cap in lote]
+            futs.append(self._encolar(chat_id, "sendMediaGroup", {"chat_id": chat_id, "media": media}))
+        return futs
+
+    def pending(self) -> int:
+        return sum(q.qsize() for q, _, _ in self._chats.values())
+
+    def stats(self) -> dict:
+        return {"sent": self.sent, "failed": self.failed, "retries": self.retries,
+                "rate_limited": self.rate_limited, "pending": self.pending(), "chats": len(self._chats),
+                "invalid_images": self.invalid_images, "rejected_images": len(self._rechazadas),
+                **self.file_ids.stats()}
+
+    # ---------- internos ----------
+    def _encolar(self, chat_id: str, method: str, payload: dict) -> asyncio.Future:
+        if self._client is None:
+            raise RuntimeError("TelegramNotifier no iniciado (llama a start())")
+        fut = asyncio.get_running_loop().create_future()
+        if self.base_url is None:
+            if not self.failed:
+                print("⚠️ TELEGRAM_BOT_TOKEN no configurado: no se envían notificaciones")
+            self.failed += 1
+            fut.set_exception(RuntimeError("TELEGRAM_BOT_TOKEN no configurado"))
+            fut.exception()   # como en _worker: quien encola puede ignorar el resultado
+            return fut
+        chat = self._chats.get(str(chat_id))
+        if chat is None or chat[2].done():
+            q, bucket = asyncio.Queue(), TokenBucket(self.chat_rate)
+            chat = (q, bucket, asyncio.create_task(self._worker(str(chat_id), q, bucket)))
+            self._chats[str(chat_id)] = chat
+        chat[0].put_nowait((method, payload, fut))
+        return fut
+
+    async def _worker(self, chat_id: str, q: asyncio.Queue, bucket: TokenBucket):
+        while True:
+            try:
+                method, payload, fut = await asyncio.wait_for(q.get(), timeout=60)
+            except asyncio.TimeoutError:
+                # chat inactivo: liberar la tarea (se recrea al siguiente envío)
+                if q.empty() and self._chats.get(chat_id, (None,))[0] is q:
+                    del self._chats[chat_id]
+                    return
+                continue
+            try:
+                res = await self._procesar(method, payload, bucket)
+                if not fut.done(): fut.set_result(res)
+            except Exception as e:
+                self.failed += 1
+                print(f"❌ Telegram {method} a {chat_id}:", e)
+                if not fut.done(): fut.set_exception(e)
+                fut.exception()   # marcada como leída: quien encola puede ignorar el resultado
+            finally:
+                q.task_done()
+
+    async def _procesar(self, method: str, payload: dict, bucket: TokenBucket):
+        """
+        Envía respetando los límites. Si Telegram rechaza el contenido (4xx, p.ej. una URL de imagen rota):
+        un álbum se reintenta foto por foto, y una foto se degrada a texto con su caption.
+        """
+        await bucket.take()
+        await self._global.take()
+        urls, mias = [], []
+        if method in ("sendPhoto", "sendMediaGroup"):
+            payload, urls, mias = await self._usar_file_ids(method, payload)
+        try:
+            res = await self._enviar(method, payload)
+            self.sent += 1
+            self._guardar_file_ids(method, payload, urls, res)
+            return res
+        except TelegramError as e:
+            if not e.permanente or method not in ("sendMediaGroup", "sendPhoto"):
+                raise
+        finally:
+            for url in mias:   # despertar a los que esperaban esta imagen (con o sin file_id)
+                fut = self._subiendo.pop(url, None)
+                if fut is not None and not fut.done():
+                    fut.set_result(self.file_ids.get(url))
+        chat_id = payload["chat_id"]
+        if method == "sendMediaGroup":
+            return [await self._procesar("sendPhoto", {"chat_id": chat_id, "photo": url,
+                                                       **({"caption": m["caption"]} if m.get("caption") else {})}, bucket)
+                    for m, url in zip(payload["media"], urls)]
+        url = urls[0]
+        if payload["photo"] != url:
+            # file_id guardado que Telegram ya no acepta: olvidarlo y probar con la URL
+            self.file_ids.quitar(url)
+            return await self._procesar("sendPhoto", {**payload, "photo": url}, bucket)
+        if len(self._rechazadas) > 10_000:
+            self._rechazadas.clear()
+        self._rechazadas.add(url)
+        return await self._procesar("sendMessage", {"chat_id": chat_id, "text": payload.get("caption") or url,
+                                                    "disable_web_page_preview": True}, bucket)
+
+    async def _usar_file_ids(self, method: str, payload: dict) -> tuple[dict, list[str], list[str]]:
+        """
+        Cambia las URLs ya enviadas por su file_id. Si otro chat está subiendo la misma imagen, espera su
+        file_id (con tope); las demás las sube este envío (`mias`), y quien venga después lo espera a él.
+        Devuelve (payload, URLs originales en orden, URLs que sube este envío).
+        """
+        media = payload["media"] if method == "sendMediaGroup" else [{"media": payload["photo"]}]
+        urls = [m["media"] for m in media]
+        ajenas, mias = {}, []
+        for url in urls:
+            if not url.startswith(("http://", "https://")) or self.file_ids.get(url):
+                continue
+            fut = self._subiendo.get(url)
+            if fut is None:
+                self._subiendo[url] = asyncio.get_running_loop().create_future()
+                mias.append(url)
+            else:
+                ajenas[url] = fut
+        if ajenas:
+            try:
+                await asyncio.wait(list(ajenas.values()), timeout=self.timeout)
+            except BaseException:
+                for url in mias:
+                    self._subiendo.pop(url).set_result(None)
+                raise
+        fids = []
+        for url in urls:
+            fid = self.file_ids.get(url)
+            if fid:
+                self.file_ids.hits += 1
+            elif url.startswith(("http://", "https://")):
+                self.file_ids.misses += 1
+            fids.append(fid or url)
+        contar("telegram_file_ids_total", sum(f != u for f, u in zip(fids, urls)), result="hit")
+        contar("telegram_file_ids_total", sum(f == u for f, u in zip(fids, urls)), result="miss")
+        if method == "sendMediaGroup":
+            payload = {**payload, "media": [{**m, "media": f} for m, f in zip(media, fids)]}
+        else:
+            payload = {**payload, "photo": fids[0]}
+        return payload, urls, mias
+
+    def _guardar_file_ids(self, method: str, payload: dict, urls: list[str], res):
+        if not urls:
+            return
+        enviados = [m["media"] for m in payload["media"]] if method == "sendMediaGroup" else [payload["photo"]]
+        mensajes = res if isinstance(res, list) else [res]
+        for url, enviado, msg in zip(urls, enviados, mensajes):
+            fid = _file_id(msg)
+            if fid and enviado == url:
+                self.file_ids.put(url, fid)
+
+    async def _enviar(self, method: str, payload: dict):
+        """POST con reintentos. 429 -> espera retry_after; 5xx/red -> backoff exponencial; otros 4xx -> error."""
+        delay = 1.0
+        for intento in range(self.max_retries + 1):
+            try:
+                with medir("telegram", method=method):
+                    r = await self._client.post(f"{self.base_url}/{method}", json=payload)
+            except httpx.HTTPError as e:
+                contar("telegram_calls_total", method=method, status="network_error")
+                err, espera = TelegramError(f"red: {e}"), delay
+            else:
+                contar("telegram_calls_total", method=method, status=r.status_code)
+                if r.status_code == 200:
+                    return r.json().get("result")
+                try: body = r.json()
+                except ValueError: body = {}
+                err = TelegramError(f"{r.status_code} {body.get('description', r.text[:200])}")
+                if r.status_code == 429:
+                    self.rate_limited += 1
+                    espera = float(body.get("parameters", {}).get("retry_after", delay))
+                elif r.status_code >= 500:
+                    espera = delay
+                else:
+                    raise TelegramError(str(err), permanente=True)
+            if intento == self.max_retries:
+                raise err
+            self.retries += 1
+            await asyncio.sleep(espera + random.uniform(0, 0.25 * delay))
+            delay = min(delay * 2, 30.0)
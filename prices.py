@@ -0,0 +1,78 @@
+# prices.py
+import sys
+from array import array
+
+
+class PriceIndex:
+    """
+    Último precio conocido por item (clave seen_set.item_num), en columnas: un dict item -> fila
+    y dos array('q') con precio y timestamp. Mucho más compacto que un dict de tuplas por item.
+    """
+    __slots__ = ("_fila", "_precio", "_ts")
+
+    def __init__(self):
+        self._fila: dict[int, int] = {}
+        self._precio = array("q")
+        self._ts = array("q")
+
+    def __len__(self) -> int:
+        return len(self._fila)
+
+    def __contains__(self, item: int) -> bool:
+        return item in self._fila
+
+    def get(self, item: int) -> tuple[int, int] | None:
+        """(precio, ts) más reciente, o None."""
+        i = self._fila.get(item)
+        return None if i is None else (self._precio[i], self._ts[i])
+
+    def set(self, item: int, precio: int, ts: int):
+        i = self._fila.get(item)
+        if i is None:
+            self._fila[item] = len(self._precio)
+            self._precio.append(precio)
+            self._ts.append(ts)
+        else:
+            self._precio[i] = precio
+            self._ts[i] = ts
+
+    def expulsar(self, limite_ts: int) -> int:
+        """Olvida items sin muestras desde `limite_ts` (compacta las columnas). Devuelve cuántos quitó."""
+        vivos = [(it, i) for it, i in self._fila.items() if self._ts[i] >= limite_ts]
+        quitados = len(self._fila) - len(vivos)
+        if quitados:
+            precio, ts = array("q"), array("q")
+            fila = {}
+            for it, i in vivos:
+                fila[it] = len(precio)
+                precio.append(self._precio[i])
+                ts.append(self._ts[i])
+            self._fila, self._precio, self._ts = fila, precio, ts
+        return quitados
+
+    def nbytes(self) -> int:
+        return sys.getsizeof(self._fila) + sys.getsizeof(self._precio) + sys.getsizeof(self._ts)
+
+
+def submuestrear(ts: list[int], precios: list[int], puntos: int) -> list[dict]:
+    """
+    Reduce una serie a ~`puntos` tramos de tiempo iguales. Por tramo: inicio, mínimo, máximo y último precio
+    (el mínimo no se pierde al reducir: es lo que importa para ver bajas). Series cortas se devuelven tal cual.
+    """
+    if not ts:
+        return []
+    if len(ts) <= puntos:
+        return [{"t": t, "min": p, "max": p, "last": p} for t, p in zip(ts, precios)]
+    t0, t1 = ts[0], ts[-1]
+    ancho = max(1, -(-(t1 - t0 + 1) // puntos))
+    out, actual = [], None
+    for t, p in zip(ts, precios):
+        b = t0 + (t - t0) // ancho * ancho
+        if actual is None or actual["t"] != b:
+            actual = {"t": b, "min": p, "max": p, "last": p}
+            out.append(actual)
+        else:
+            actual["min"] = min(actual["min"], p)
+            actual["max"] = max(actual["max"], p)
+            actual["last"] = p
+    return out
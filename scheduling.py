@@ -0,0 +1,73 @@
+# scheduling.py
+import asyncio, time
+from collections import deque
+from contextlib import asynccontextmanager
+
+
+def siguiente_intervalo(actual: int, base: int, maximo: int, nuevos: int, corridas_sin_nuevos: int,
+                        factor: float = 1.5, tolerancia: int = 2) -> int:
+    """
+    Intervalo adaptativo de una búsqueda vigilada:
+    - trajo nuevos -> se acerca a `base` (la mitad del actual, nunca menos que base)
+    - más de `tolerancia` corridas seguidas sin nuevos -> se aleja (x`factor`) hasta `maximo`
+    """
+    maximo = max(base, maximo)
+    if nuevos:
+        return max(base, actual // 2)
+    if corridas_sin_nuevos > tolerancia:
+        return min(maximo, max(actual + 1, int(actual * factor)))
+    return actual
+
+
+class ScrapeLimiter:
+    """
+    Tope de scrapes simultáneos (global y por sitio) para los jobs programados, con métricas para
+    dimensionar la máquina: cuántos esperan turno (profundidad de cola) y el retraso (lag) entre la
+    hora programada del job y el momento en que realmente empieza a scrapear.
+    """
+    def __init__(self, global_limit: int = 4, per_site: int = 2, muestras: int = 500):
+        self.global_limit = global_limit
+        self.per_site = per_site
+        self._global = asyncio.Semaphore(global_limit)
+        self._sitios: dict[str, asyncio.Semaphore] = {}
+        self._lags: deque[float] = deque(maxlen=muestras)
+        self.waiting = 0
+        self.max_waiting = 0
+        self.running = 0
+        self.done = 0
+
+    @asynccontextmanager
+    async def slot(self, site: str, programado: float | None = None):
+        """Espera turno para `site`. `programado` (epoch) = hora a la que debía correr, para medir el lag."""
+        sem_sitio = self._sitios.setdefault(site, asyncio.Semaphore(self.per_site))
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await sem_sitio.acquire()   # primero el del sitio: no ocupar un cupo global esperando al sitio
+            try:
+                await self._global.acquire()
+            except BaseException:
+                sem_sitio.release()
+                raise
+        finally:
+            self.waiting -= 1
+        if programado is not None:
+            self._lags.append(max(0.0, time.time() - programado))
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self.done += 1
+            self._global.release()
+            sem_sitio.release()
+
+    def stats(self) -> dict:
+        lags = sorted(self._lags)
+
+        def pct(p):
+            return round(lags[min(len(lags) - 1, int(p * len(lags)))] * 1000, 1) if lags else None
+
+        return {"running": self.running, "waiting": self.waiting, "max_waiting": self.max_waiting,
+                "done": self.done, "global_limit": self.global_limit, "per_site_limit": self.per_site,
+                "lag_ms": {"p50": pct(0.5), "p95": pct(0.95), "max": pct(1.0), "samples": len(lags)}}
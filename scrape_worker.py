@@ -1,138 +1,201 @@
 # scrape_worker.py
-import sys, json, re
-from urllib.parse import quote_plus
+"""
+Worker de scraping fuera del proceso de la API.
+
+- Modo CLI (una búsqueda y sale), como antes:
+    python scrape_worker.py "<query>" [site] [min_price] [max_price] [condition] [envio]
+- Modo persistente (lo usa worker_pool.WorkerPool): lee trabajos JSON por stdin, uno por línea, y responde
+  una línea JSON por trabajo en stdout, con el navegador ya abierto entre trabajos:
+    python scrape_worker.py --serve
+    -> {"id": 1, "q": "pokemon", "site": "mercadolibre.com.co", "min_price": null, ..., "engine": "auto", "pagina": 1}
+    <- {"id": 1, "url": ..., "results": [...], "engine": "http", "stats": {...}, "error": ""}
+    -> {"id": 2, "op": "ping"}   <- {"id": 2, "ok": true, "pid": ..., "jobs": ...}
+"""
+import sys, json, os
+import time
 
 # Política de asyncio (por si Playwright interno la usa)
 import asyncio
 if sys.platform.startswith("win"):
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
+import httpx
 from playwright.sync_api import sync_playwright
-
-def parse_price(text):
-    if not text:
-        return None
-    text = re.sub(r"[^\d]", "", text)
-    return int(text) if text else None
-
-def construir_url(query, site_domain="mercadolibre.com.co",
-                  min_price=None, max_price=None,
-                  condition=None, envio=None):
-    query_slug = quote_plus(query.replace(" ", "-"))
-    cond_slug = ""
-    if condition:
-        c = condition.lower()
-        if c == "nuevo":
-            cond_slug = "_ITEM*CONDITION_2230284"
-        elif c == "usado":
-            cond_slug = "_ITEM*CONDITION_2230581"
-    envio_slug = "_CostoEnvio_Gratis" if (envio and envio.lower() in ["gratis","si","free"]) else ""
-    rango_slug = f"_PriceRange_{min_price or 0}-{max_price or ''}" if (min_price or max_price) else ""
-    return f"https://listado.{site_domain}/{query_slug}{cond_slug}{envio_slug}{rango_slug}_NoIndex_True"
-
-
-def scrape_once(query, site_domain, min_price, max_price, condition, envio):
-    url = construir_url(query, site_domain, min_price, max_price, condition, envio)
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        context = browser.new_context(user_agent=(
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/122.0.0.0 Safari/537.36"
-        ))
-        page = context.new_page()
-        page.goto(url, wait_until="domcontentloaded")
-
-        # Esperas + scroll para asegurar carga de cards e imágenes
-        page.wait_for_timeout(2500)
-        for _ in range(3):
-            page.mouse.wheel(0, 25000)
-            page.wait_for_timeout(800)
-
-        # Intentar esperar la lista principal (no romper si falla)
+from extractor import extraer_cards_sync, extraer_cards_html
+from browser_pool import MedidorRed, USER_AGENT
+from scraper import construir_url, ENGINES, detectar_bloqueo, es_captcha, PaginaBloqueada, BLOQUEO_SELECTOR
+
+CARD_SELECTOR = "li.ui-search-layout__item, div.poly-card"
+
+
+class Worker:
+    """
+    Estado que sobrevive entre trabajos: Playwright + Chromium (se lanza con el primer trabajo de
+    navegador y se recicla cada `max_pages` páginas) y un cliente HTTP con keep-alive.
+    """
+    def __init__(self, max_pages: int = 200, dump_vacios: bool = True):
+        self.max_pages = max_pages
+        self.dump_vacios = dump_vacios
+        self._pw = None
+        self._browser = None
+        self._pages = 0
+        self._http: httpx.Client | None = None
+        self.jobs = 0
+
+    # ---------- navegador ----------
+    def _navegador(self):
+        if self._browser is not None and (self._pages >= self.max_pages or not self._browser.is_connected()):
+            self._cerrar_navegador()
+        if self._browser is None:
+            if self._pw is None:
+                self._pw = sync_playwright().start()
+            self._browser = self._pw.chromium.launch(headless=True)
+            self._pages = 0
+        return self._browser
+
+    def _cerrar_navegador(self):
         try:
-            page.wait_for_selector("li.ui-search-layout__item, ol.ui-search-layout", timeout=10000)
+            if self._browser is not None:
+                self._browser.close()
         except Exception:
             pass
+        self._browser = None
 
-        # 1) Cards por li clásico
-        cards = page.query_selector_all("li.ui-search-layout__item")
+    def scrape_browser(self, url: str, site: str | None = None) -> dict:
+        context = self._navegador().new_context(user_agent=USER_AGENT)
+        self._pages += 1
+        try:
+            page = context.new_page()
+            red = MedidorRed()
+            red.instalar_sync(page)   # sin imágenes/fuentes/terceros: las URLs de imagen salen de src/data-src
+            resp = page.goto(url, wait_until="domcontentloaded")
+
+            # Bloqueo/captcha en la primera respuesta: fallar ya (sin esperar las cards ni hacer dump)
+            motivo = detectar_bloqueo(resp.status if resp else None, page.url, url)
+            if motivo:
+                raise PaginaBloqueada(f"{site}: {motivo}")
+
+            # Esperar la lista principal en cuanto aparezca (no romper si falla); sin scroll ni pausas fijas:
+            # las imágenes lazy ya traen su URL en data-src
+            try:
+                page.wait_for_selector(f"{CARD_SELECTOR}, {BLOQUEO_SELECTOR}", timeout=10000)
+            except Exception:
+                try:
+                    page.wait_for_load_state("networkidle", timeout=3000)
+                except Exception:
+                    pass
+
+            # Cards con los selectores de respaldo (li clásico, luego div.poly-card…) en una sola evaluación
+            items = extraer_cards_sync(page, site)
+            if not items and page.query_selector(BLOQUEO_SELECTOR) is not None:
+                raise PaginaBloqueada(f"{site}: captcha en la página")
+
+            # Dump de diagnóstico si quedó vacío
+            if not items and self.dump_vacios:
+                try:
+                    with open("worker_dump.html", "w", encoding="utf-8") as f:
+                        f.write(page.content())
+                except Exception:
+                    pass
+            return {"url": url, "results": items, "engine": "browser", "stats": red.stats()}
+        finally:
+            context.close()
+
+    # ---------- HTTP ----------
+    def scrape_http(self, url: str, site: str | None = None) -> dict:
+        if self._http is None:
+            self._http = httpx.Client(headers={"User-Agent": USER_AGENT, "Accept-Language": "es-CO,es;q=0.9"},
+                                      follow_redirects=True, timeout=httpx.Timeout(15.0, connect=5.0))
+        t0 = time.perf_counter()
+        r = self._http.get(url)
+        motivo = detectar_bloqueo(r.status_code, str(r.url), url)
+        if motivo:
+            raise PaginaBloqueada(f"{site}: {motivo}")
+        r.raise_for_status()
+        items = extraer_cards_html(r.text, site)
+        if not items and es_captcha(r.text):
+            raise PaginaBloqueada(f"{site}: captcha en la página")
+        return {"url": url, "results": items, "engine": "http",
+                "stats": {"ms": round((time.perf_counter() - t0) * 1000, 1), "bytes": r.num_bytes_downloaded,
+                          "requests": 1, "blocked": 0}}
+
+    # ---------- trabajo ----------
+    def scrape(self, job: dict) -> dict:
+        """Mismo criterio de motores que scraper.scrape (auto = HTTP y, si no hay cards, navegador)."""
+        engine = job.get("engine") or "browser"
+        if engine not in ENGINES:
+            raise ValueError(f"engine inválido: {engine!r} (usa {', '.join(ENGINES)})")
+        pagina = int(job.get("pagina") or 1)
+        site = job.get("site") or "mercadolibre.com.co"
+        url = construir_url(job["q"], site, job.get("min_price"),
+                            job.get("max_price"), job.get("condition"), job.get("envio"), pagina)
+        self.jobs += 1
+        if engine == "browser":
+            return self.scrape_browser(url, site)
+        if engine == "http":
+            return self.scrape_http(url, site)
+        try:
+            data = self.scrape_http(url, site)
+            if data["results"] or pagina > 1:
+                return data
+        except httpx.HTTPError as e:
+            print("⚠️ Motor HTTP falló, usando navegador:", e, file=sys.stderr)
+        return self.scrape_browser(url, site)
+
+    def close(self):
+        self._cerrar_navegador()
+        if self._pw is not None:
+            self._pw.stop()
+            self._pw = None
+        if self._http is not None:
+            self._http.close()
+            self._http = None
 
-        # 2) Respaldo si no hay li (algunas variantes)
-        if not cards:
-            cards = page.query_selector_all("div.ui-search-result__content-wrapper, div.poly-card")
 
-        items = []
-        for card in cards:
-            # Título + link (varios selectores de respaldo)
-            title_el = (
-                card.query_selector("a.poly-component__title")
-                or card.query_selector("h3.poly-component__title-wrapper a")
-                or card.query_selector("a.ui-search-link")
-            )
-            title = title_el.inner_text().strip() if title_el else None
-            link = title_el.get_attribute("href") if title_el else None
-
-            # Precio (respaldo)
-            price_el = (
-                card.query_selector("span.andes-money-amount__fraction")
-                or card.query_selector("span.poly-price__fraction")
-                or card.query_selector("[data-testid='item-price'] span")
-            )
-            price_text = price_el.inner_text().strip() if price_el else None
-            price = parse_price(price_text)
-
-            # Condición
-            cond_el = card.query_selector("span.poly-component__item-condition")
-            cond_text = cond_el.inner_text().strip() if cond_el else None
-            if not cond_text:
-                cond_text = "Nuevo"
-
-            # Envío
-            ship_el = card.query_selector("div.poly-component__shipping")
-            shipping = ship_el.inner_text().strip() if ship_el else None
-
-            # Imagen (src / data-src)
-            img_el = card.query_selector("img.poly-component__picture") or card.query_selector("img")
-            image = None
-            if img_el:
-                src = img_el.get_attribute("src")
-                data_src = img_el.get_attribute("data-src")
-                if src and src.startswith("http"):
-                    image = src
-                elif data_src and data_src.startswith("http"):
-                    image = data_src
-
-            if not title or not link or not price:
+def scrape_once(query, site_domain, min_price, max_price, condition, envio):
+    w = Worker()
+    try:
+        return w.scrape({"q": query, "site": site_domain, "min_price": min_price, "max_price": max_price,
+                         "condition": condition, "envio": envio, "engine": "browser"})
+    finally:
+        w.close()
+
+
+def serve(entrada=sys.stdin, salida=None):
+    """Bucle JSON-lines: un trabajo por línea, una respuesta por línea. Termina con EOF o {"op": "stop"}."""
+    # stdout es el canal del protocolo: cualquier print() del scraper va a stderr
+    salida = salida or sys.stdout
+    sys.stdout = sys.stderr
+    w = Worker(max_pages=int(os.getenv("BROWSER_MAX_PAGES", "200")), dump_vacios=False)
+    try:
+        for linea in entrada:
+            if not linea.strip():
                 continue
-
-            items.append({
-                "title": title,
-                "price": price,
-                "condition": cond_text,
-                "shipping": shipping,
-                "link": link,
-                "image": image
-            })
-
-        # Dump de diagnóstico si quedó vacío
-        if not items:
+            job_id = None
             try:
-                html = page.content()
-                with open("worker_dump.html", "w", encoding="utf-8") as f:
-                    f.write(html)
-            except Exception:
-                pass
-
-        context.close()
-        browser.close()
-    return {"url": url, "results": items}
+                job = json.loads(linea)
+                job_id = job.get("id")
+                op = job.get("op", "scrape")
+                if op == "stop":
+                    break
+                if op == "ping":
+                    out = {"ok": True, "pid": os.getpid(), "jobs": w.jobs}
+                else:
+                    out = {**w.scrape(job), "error": ""}
+            except Exception as e:
+                out = {"url": None, "results": [], "error": f"{e.__class__.__name__}: {e}"}
+            salida.write(json.dumps({"id": job_id, **out}, ensure_ascii=False) + "\n")
+            salida.flush()
+    finally:
+        w.close()
 
 
 if __name__ == "__main__":
-    import traceback, os, json, sys, asyncio
-    if sys.platform.startswith("win"):
-        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    import traceback
+
+    if len(sys.argv) > 1 and sys.argv[1] == "--serve":
+        serve()
+        sys.exit(0)
 
     out = {"url": None, "results": [], "error": ""}
     try:
@@ -143,7 +206,7 @@ if __name__ == "__main__":
         condition = sys.argv[5] if len(sys.argv) > 5 and sys.argv[5].strip() else None
         envio = sys.argv[6] if len(sys.argv) > 6 and sys.argv[6].strip() else None
 
-        out = scrape_once(query, site, min_price, max_price, condition, envio)
+        out = {**scrape_once(query, site, min_price, max_price, condition, envio), "error": ""}
 
         # Si no encontró nada, deja una pista en `error`
         if not out.get("results"):
@@ -1,114 +1,318 @@
 # scraper.py
-import asyncio, re
-from urllib.parse import quote_plus
-from playwright.async_api import async_playwright
+import asyncio, os, time
+from contextlib import asynccontextmanager
+from urllib.parse import quote_plus, urlparse
+import httpx
+from selectolax.lexbor import LexborHTMLParser
+from browser_pool import USER_AGENT, MedidorRed
+from extractor import extraer_cards, extraer_cards_html, ParserIncremental
+from seen_set import item_num
+from busqueda import spec_canonica
+from metrics import medir, observar
 
-def parse_price(text: str | None) -> int | None:
-    """Convierte '1.299.900' -> 1299900"""
-    if not text:
-        return None
-    text = re.sub(r"[^\d]", "", text)
-    return int(text) if text else None
+ENGINES = ("auto", "http", "browser")   # auto = HTTP y, si no hay cards, Playwright
+CARD_SELECTOR = "li.ui-search-layout__item, div.poly-card"
+WAIT_MS = int(os.getenv("SCRAPE_WAIT_MS", "20000"))   # tope de espera de las cards en el navegador
+
+# página de bloqueo/captcha de MercadoLibre (o de su CDN) en vez del listado. Nunca se busca texto suelto:
+# la URL y el HTML repiten lo que buscó el usuario ("funda recaptcha" no es un bloqueo). Se reconoce por:
+# - status 403/429 de la primera respuesta;
+# - una redirección a una ruta de verificación/login (segmentos exactos de la ruta de la URL final);
+# - estructura: un captcha en el DOM (#px-captcha, iframe/form de captcha), sólo si no vino ninguna card.
+RUTAS_BLOQUEO = ("account-verification", "negative_traffic", "suspicious-traffic", "lgz")
+BLOQUEO_STATUS = (403, 429)
+BLOQUEO_BYTES = 64 * 1024      # HTML que se guarda (streaming) para buscar el captcha si no hubo cards
+BLOQUEO_SELECTOR = "#px-captcha, iframe[src*='captcha'], form[action*='captcha'], div.g-recaptcha"
+
+
+class PaginaBloqueada(RuntimeError):
+    """El sitio respondió una página de bloqueo/captcha en vez del listado."""
+
+
+def detectar_bloqueo(status: int | None, url: str = "", pedida: str | None = None) -> str | None:
+    """
+    Motivo ("status 403", "redirección a /gz/account-verification") si la primera respuesta es de bloqueo.
+    La URL sólo cuenta si difiere de la `pedida` (hubo redirección) y por segmentos de su ruta.
+    """
+    if status in BLOQUEO_STATUS:
+        return f"status {status}"
+    if url and url != pedida:
+        ruta = urlparse(url).path
+        if any(seg in RUTAS_BLOQUEO for seg in ruta.lower().split("/")):
+            return f"redirección a {ruta}"
+    return None
+
+
+def es_captcha(html: str) -> bool:
+    """¿El HTML tiene un captcha (por estructura, no por texto)?"""
+    return bool(html) and LexborHTMLParser(html).css_first(BLOQUEO_SELECTOR) is not None
+
+
+RESULTS_PER_PAGE = 50
+# base del listado; se puede apuntar a un servidor local (benchmarks): MELI_LISTADO_URL=http://127.0.0.1:8801/{site}
+LISTADO_URL = os.getenv("MELI_LISTADO_URL", "https://listado.{site}")
 
 def construir_url(query, site_domain="mercadolibre.com.co",
                   min_price=None, max_price=None,
-                  condition=None, envio=None) -> str:
+                  condition=None, envio=None, pagina=1) -> str:
     """
-    URL moderna (Nordic) con filtros embebidos:
+    URL moderna (Nordic) con filtros embebidos, a partir de la búsqueda canónica (busqueda.spec_canonica:
+    "PS5 " y "ps5", o envio "si" y "gratis", dan la misma URL y comparten caché):
     - _ITEM*CONDITION_2230284 => Nuevo
     - _ITEM*CONDITION_2230581 => Usado
     - _CostoEnvio_Gratis
     - _PriceRange_MIN-MAX
+    - _Desde_N => página (N = offset 1-based, 50 por página)
     """
-    query_slug = quote_plus(query.replace(" ", "-"))
+    s = spec_canonica(query, min_price, max_price, condition, envio, site_domain)
+    query_slug = quote_plus(s["q"].replace(" ", "-"))
 
-    cond_slug = ""
-    if condition:
-        c = condition.lower()
-        if c == "nuevo":
-            cond_slug = "_ITEM*CONDITION_2230284"
-        elif c == "usado":
-            cond_slug = "_ITEM*CONDITION_2230581"
+    cond_slug = {"nuevo": "_ITEM*CONDITION_2230284", "usado": "_ITEM*CONDITION_2230581"}.get(s["condition"], "")
 
-    envio_slug = "_CostoEnvio_Gratis" if (envio and envio.lower() in ["gratis", "si", "free"]) else ""
+    envio_slug = "_CostoEnvio_Gratis" if s["envio"] else ""
 
     rango_slug = ""
-    if (min_price or max_price):
-        rango_slug = f"_PriceRange_{min_price or 0}-{max_price or ''}"
+    if (s["min_price"] or s["max_price"]):
+        rango_slug = f"_PriceRange_{s['min_price'] or 0}-{s['max_price'] or ''}"
+
+    desde_slug = f"_Desde_{(pagina - 1) * RESULTS_PER_PAGE + 1}" if pagina and pagina > 1 else ""
 
-    return f"https://listado.{site_domain}/{query_slug}{cond_slug}{envio_slug}{rango_slug}_NoIndex_True"
+    base = LISTADO_URL.format(site=s["site"])
+    return f"{base}/{query_slug}{desde_slug}{cond_slug}{envio_slug}{rango_slug}_NoIndex_True"
+
+@asynccontextmanager
+async def _pagina(pool=None):
+    """Página desde el pool compartido; sin pool, lanza un navegador propio (uso standalone)."""
+    if pool is not None and pool.iniciado:
+        async with pool.page() as page:
+            yield page
+        return
+    from playwright.async_api import async_playwright   # diferido: sólo el uso standalone lo necesita
+    async with async_playwright() as p:
+        with medir("browser_launch", engine="browser"):
+            browser = await p.chromium.launch(headless=True)
+        try:
+            context = await browser.new_context(user_agent=USER_AGENT)
+            yield await context.new_page()
+        finally:
+            await browser.close()
 
 async def scrape_meli(query, site_domain="mercadolibre.com.co",
                       min_price=None, max_price=None,
-                      condition=None, envio=None):
+                      condition=None, envio=None, pool=None, pagina=1):
     """
-    Devuelve: {"url": <url_consultada>, "results": [ {title, price, condition, shipping, link, image}, ... ]}
+    Devuelve: {"url": <url_consultada>, "results": [ {title, price, condition, shipping, link, image}, ... ],
+               "stats": {ms, bytes, requests, blocked}}
+    Si se pasa `pool` (BrowserPool iniciado) reutiliza sus navegadores en vez de lanzar uno.
     """
-    url = construir_url(query, site_domain, min_price, max_price, condition, envio)
+    url = construir_url(query, site_domain, min_price, max_price, condition, envio, pagina)
 
-    async with async_playwright() as p:
-        # Puedes cambiar a chromium si prefieres
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(
-            user_agent=(
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/122.0.0.0 Safari/537.36"
-            )
+    async with _pagina(pool) as page:
+        red = MedidorRed()
+        await red.instalar(page)   # aborta imágenes/fuentes/terceros según SCRAPE_BLOCK_PROFILE
+        with medir("goto", site=site_domain, engine="browser"):
+            resp = await page.goto(url, wait_until="domcontentloaded")
+
+        # Bloqueo/captcha: falla ya, sin esperar WAIT_MS a unas cards que no van a llegar
+        motivo = detectar_bloqueo(resp.status if resp else None, page.url, url)
+        if motivo:
+            raise PaginaBloqueada(f"{site_domain}: {motivo}")
+
+        # Espera a que aparezcan las cards (sin pausa fija), con tope; un captcha armado por JS también corta
+        with medir("selector_wait", site=site_domain, engine="browser"):
+            await page.wait_for_selector(f"{CARD_SELECTOR}, {BLOQUEO_SELECTOR}", timeout=WAIT_MS)
+        if await page.query_selector(CARD_SELECTOR) is None:
+            raise PaginaBloqueada(f"{site_domain}: captcha en la página")
+
+        # Todas las cards en una sola evaluación dentro de la página
+        with medir("extract", site=site_domain, engine="browser"):
+            items = await extraer_cards(page, site_domain)
+        return {"url": url, "results": items, "engine": "browser", "stats": red.stats()}
+
+
+# ------------ motor HTTP (sin navegador) ------------
+_http_client: httpx.AsyncClient | None = None
+
+def _cliente_http() -> httpx.AsyncClient:
+    """Cliente HTTP compartido (keep-alive / pool de conexiones)."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT, "Accept-Language": "es-CO,es;q=0.9"},
+            follow_redirects=True,
+            timeout=httpx.Timeout(15.0, connect=5.0),
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
         )
-        page = await context.new_page()
-        await page.goto(url, wait_until="domcontentloaded")
-        await page.wait_for_timeout(2500)
-
-        # Espera contenedor de resultados
-        await page.wait_for_selector("li.ui-search-layout__item", timeout=20000)
-
-        cards = await page.query_selector_all("li.ui-search-layout__item")
-        items = []
-
-        for card in cards:
-            # Título + enlace
-            title_el = await card.query_selector("a.poly-component__title")
-            title = (await title_el.inner_text()).strip() if title_el else None
-            link = await title_el.get_attribute("href") if title_el else None
-
-            # Precio
-            price_el = await card.query_selector("span.andes-money-amount__fraction")
-            price_text = (await price_el.inner_text()).strip() if price_el else None
-            price = parse_price(price_text)
-
-            # Condición (si no aparece, asumimos 'Nuevo')
-            cond_el = await card.query_selector("span.poly-component__item-condition")
-            cond_text = (await cond_el.inner_text()).strip() if cond_el else None
-            if not cond_text:
-                cond_text = "Nuevo"
-
-            # Envío
-            ship_el = await card.query_selector("div.poly-component__shipping")
-            shipping = (await ship_el.inner_text()).strip() if ship_el else None
-
-            # Imagen (soporta lazy-load data-src)
-            img_el = await card.query_selector("img.poly-component__picture")
-            image = None
-            if img_el:
-                src = await img_el.get_attribute("src")
-                data_src = await img_el.get_attribute("data-src")
-                if src and src.startswith("http"):
-                    image = src
-                elif data_src and data_src.startswith("http"):
-                    image = data_src
-
-            if not title or not link or not price:
-                continue
-
-            items.append({
-                "title": title,
-                "price": price,
-                "condition": cond_text,
-                "shipping": shipping,
-                "link": link,
-                "image": image
-            })
-
-        await browser.close()
-        return {"url": url, "results": items}
+    return _http_client
+
+async def cerrar_cliente_http():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+async def scrape_meli_http(query, site_domain="mercadolibre.com.co",
+                           min_price=None, max_price=None,
+                           condition=None, envio=None, pagina=1):
+    """Descarga el listado (server-rendered) y parsea las cards sin navegador."""
+    url = construir_url(query, site_domain, min_price, max_price, condition, envio, pagina)
+    t0 = time.perf_counter()
+    with medir("fetch", site=site_domain, engine="http"):
+        r = await _cliente_http().get(url)
+    motivo = detectar_bloqueo(r.status_code, str(r.url), url)
+    if motivo:
+        raise PaginaBloqueada(f"{site_domain}: {motivo}")
+    r.raise_for_status()
+    with medir("extract", site=site_domain, engine="http"):
+        items = extraer_cards_html(r.text, site_domain)
+    if not items and es_captcha(r.text):
+        raise PaginaBloqueada(f"{site_domain}: captcha en la página")
+    return {"url": url, "results": items, "engine": "http",
+            "stats": {"ms": round((time.perf_counter() - t0) * 1000, 1), "bytes": r.num_bytes_downloaded,
+                      "requests": 1, "blocked": 0}}
+
+
+async def scrape(query, site_domain="mercadolibre.com.co",
+                 min_price=None, max_price=None,
+                 condition=None, envio=None, engine="auto", pool=None, pagina=1):
+    """
+    Punto de entrada con elección de motor:
+    - "http":    sólo HTTP + parser HTML
+    - "browser": sólo Playwright
+    - "auto":    HTTP; si falla o no encuentra cards, cae a Playwright
+                 (desde la página 2, una página vacía es el final del listado: sin fallback;
+                 una página de bloqueo tampoco cae al navegador: PaginaBloqueada enseguida)
+    El resultado incluye "engine" con el motor que lo produjo.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"engine inválido: {engine!r} (usa {', '.join(ENGINES)})")
+    kw = dict(site_domain=site_domain, min_price=min_price, max_price=max_price,
+              condition=condition, envio=envio, pagina=pagina)
+    if engine == "browser":
+        return await scrape_meli(query, pool=pool, **kw)
+    if engine == "http":
+        return await scrape_meli_http(query, **kw)
+    try:
+        data = await scrape_meli_http(query, **kw)
+        if data["results"] or pagina > 1:
+            return data
+    except httpx.HTTPError as e:
+        print("⚠️ Motor HTTP falló, usando navegador:", e)
+    return await scrape_meli(query, pool=pool, **kw)
+
+
+# ------------ streaming: cards a medida que se parsean ------------
+async def scrape_meli_http_stream(query, site_domain="mercadolibre.com.co",
+                                  min_price=None, max_price=None,
+                                  condition=None, envio=None, pagina=1, info=None):
+    """
+    Como scrape_meli_http, pero va entregando cada card apenas termina de llegar su HTML
+    (no espera el documento completo). Al final deja url/engine/stats en `info`.
+    """
+    url = construir_url(query, site_domain, min_price, max_price, condition, envio, pagina)
+    info = {} if info is None else info
+    info.update(url=url, engine="http")
+    t0 = time.perf_counter()
+    parser = ParserIncremental(site_domain)
+    async with _cliente_http().stream("GET", url) as r:
+        motivo = detectar_bloqueo(r.status_code, str(r.url), url)
+        if motivo:
+            raise PaginaBloqueada(f"{site_domain}: {motivo}")
+        r.raise_for_status()
+        n, inicio = 0, []   # comienzo del HTML: si no sale ninguna card, ver si era un captcha
+        async for trozo in r.aiter_text():
+            if not n and sum(map(len, inicio)) < BLOQUEO_BYTES:
+                inicio.append(trozo)
+            with medir("extract", site=site_domain, engine="http_stream"):
+                cards = parser.feed(trozo)
+            for card in cards:
+                n += 1
+                yield card
+        for card in parser.close():
+            n += 1
+            yield card
+        if not n and es_captcha("".join(inicio)):
+            raise PaginaBloqueada(f"{site_domain}: captcha en la página")
+        observar("fetch", time.perf_counter() - t0, site=site_domain, engine="http_stream")
+        info["stats"] = {"ms": round((time.perf_counter() - t0) * 1000, 1), "bytes": r.num_bytes_downloaded,
+                         "requests": 1, "blocked": 0}
+
+
+async def scrape_stream(query, site_domain="mercadolibre.com.co",
+                        min_price=None, max_price=None,
+                        condition=None, envio=None, engine="auto", pool=None, pagina=1, info=None,
+                        navegador=None):
+    """
+    Versión en streaming de scrape(): async generator de cards.
+    Con HTTP las cards salen a medida que se parsean; el navegador no deja leer el DOM
+    por partes, así que ahí salen todas juntas al terminar. `info` recibe url/engine/stats.
+    En "auto" sólo se cae al navegador si HTTP falla o no trajo ninguna card (nada se repite).
+    `navegador(**kw)` reemplaza a scrape_meli para la parte con navegador (p.ej. workers externos).
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"engine inválido: {engine!r} (usa {', '.join(ENGINES)})")
+    info = {} if info is None else info
+    kw = dict(site_domain=site_domain, min_price=min_price, max_price=max_price,
+              condition=condition, envio=envio, pagina=pagina)
+    if engine != "browser":
+        n = 0
+        try:
+            async for card in scrape_meli_http_stream(query, info=info, **kw):
+                n += 1
+                yield card
+            if n or engine == "http" or pagina > 1:
+                return
+        except httpx.HTTPError as e:
+            if engine == "http" or n:
+                raise
+            print("⚠️ Motor HTTP falló, usando navegador:", e)
+    data = await (navegador(query, **kw) if navegador else scrape_meli(query, pool=pool, **kw))
+    info.update(url=data["url"], engine=data["engine"], stats=data["stats"])
+    for card in data["results"]:
+        yield card
+
+
+# ------------ paginación ------------
+async def scrape_paginas(fetch_pagina, max_pages: int, concurrency: int = 3, es_nuevo=None):
+    """
+    Pide las páginas 1..max_pages en tandas de `concurrency` en paralelo con `await fetch_pagina(n)`,
+    une los resultados y quita duplicados por ID de item.
+    Corta antes si una página viene vacía o (con `es_nuevo`) no trae nada nuevo.
+    """
+    t0 = time.perf_counter()
+    datas, merged, ids = [], [], set()
+    pagina, parar = 1, False
+    while pagina <= max_pages and not parar:
+        tanda = list(range(pagina, min(max_pages, pagina + max(1, concurrency) - 1) + 1))
+        res = await asyncio.gather(*(fetch_pagina(p) for p in tanda), return_exceptions=True)
+        for p, d in zip(tanda, res):
+            if isinstance(d, BaseException):
+                if p == 1: raise d
+                print(f"⚠️ Página {p} falló, se corta la paginación:", d)
+                parar = True
+                break
+            datas.append(d)
+            nuevos = 0
+            for r in d.get("results", []):
+                n = item_num(r["link"])
+                if n in ids: continue
+                ids.add(n)
+                merged.append(r)
+                if es_nuevo is None or es_nuevo(r): nuevos += 1
+            if not d.get("results") or nuevos == 0:
+                parar = True
+                break
+        pagina += len(tanda)
+
+    stats = [d.get("stats") or {} for d in datas]
+    return {
+        "url": datas[0].get("url"),
+        "urls": [d.get("url") for d in datas],
+        "results": merged,
+        "engine": datas[0].get("engine"),
+        "pages": len(datas),
+        "stats": {"ms": round((time.perf_counter() - t0) * 1000, 1),
+                  "bytes": sum(s.get("bytes", 0) for s in stats),
+                  "requests": sum(s.get("requests", 0) for s in stats),
+                  "blocked": sum(s.get("blocked", 0) for s in stats)},
+    }
@@ -0,0 +1,196 @@
+# seen_set.py
+import hashlib, math, re, sys
+
+# MCOU3280931767, MCO-123456789, MLA1234567890 ... (sitio + U opcional + número)
+_ITEM_RE = re.compile(r"\b(M[A-Z]{2})(U?)-?(\d{6,})")
+
+
+def item_id(link: str | None) -> str | None:
+    """ID de MercadoLibre del link ('MCOU3280931767'), o None si el link no lo trae (p.ej. clicks de publicidad)."""
+    if not link: return None
+    m = _ITEM_RE.search(link)
+    return f"{m.group(1)}{m.group(2)}{m.group(3)}" if m else None
+
+
+def item_num(link: str) -> int:
+    """
+    Clave entera compacta para el set de vistos: número del item con 1 bit para el sufijo 'U'.
+    (El prefijo de sitio no hace falta: la clave de búsqueda ya incluye el sitio.)
+    Links sin ID -> hash de 62 bits del link, en negativo para no chocar con IDs reales.
+    """
+    m = _ITEM_RE.search(link)
+    if m:
+        return (int(m.group(3)) << 1) | (1 if m.group(2) else 0)
+    return -(int.from_bytes(hashlib.blake2b(link.encode("utf-8"), digest_size=8).digest(), "big") >> 2)
+
+
+def codigo_sitio(prefijo: str) -> int:
+    """'MCO' -> entero de 10 bits (las dos letras después de la M)."""
+    return (ord(prefijo[1]) - 65) * 26 + (ord(prefijo[2]) - 65)
+
+
+def item_num_sitio(link: str) -> int:
+    """
+    Como item_num pero con el sitio (10 bits bajos): MLA-123 y MCO-123 son items distintos.
+    Es la clave del historial de precios, que es global y no por búsqueda.
+    """
+    m = _ITEM_RE.search(link)
+    return (item_num(link) << 10) | codigo_sitio(m.group(1)) if m else item_num(link)
+
+
+class SeenSet:
+    """
+    Vistos de UNA búsqueda, guardados como enteros (item_num) en orden de llegada.
+    Acepta links o enteros en `in` / add(). Si se supera `max_items`, se olvidan los más antiguos.
+    """
+    __slots__ = ("_ids", "max_items")
+    mode = "exact"
+
+    def __init__(self, nums=(), max_items: int = 0):
+        self._ids: dict[int, None] = dict.fromkeys(nums)
+        self.max_items = max_items
+        self._recortar()
+
+    @staticmethod
+    def _num(x) -> int:
+        return x if isinstance(x, int) else item_num(x)
+
+    def __contains__(self, x) -> bool:
+        return self._num(x) in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def add(self, x) -> int:
+        n = self._num(x)
+        self._ids[n] = None
+        self._recortar()
+        return n
+
+    def _recortar(self):
+        if self.max_items:
+            while len(self._ids) > self.max_items:
+                del self._ids[next(iter(self._ids))]
+
+    def nbytes(self) -> int:
+        # tabla del dict + cada entero (los IDs son grandes: no son enteros cacheados)
+        return sys.getsizeof(self._ids) + sum(sys.getsizeof(n) for n in self._ids)
+
+
+class BloomSeen:
+    """
+    Variante aproximada con dos filtros Bloom rotativos (generación actual + anterior).
+    Memoria fija ~ 2 * m bits; puede dar falsos positivos (un item nuevo tomado como visto) con prob. ~`fp_rate`.
+    Al llenarse la generación actual, la anterior se descarta: así se "olvidan" los más antiguos.
+    """
+    __slots__ = ("capacity", "m", "k", "_cur", "_old", "_n", "_total")
+    mode = "bloom"
+
+    def __init__(self, nums=(), capacity: int = 5000, fp_rate: float = 0.001):
+        self.capacity = max(64, capacity)
+        self.m = max(64, int(-self.capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        self.k = max(1, round(self.m / self.capacity * math.log(2)))
+        self._cur = bytearray((self.m + 7) // 8)
+        self._old = None
+        self._n = 0
+        self._total = 0
+        for n in nums:
+            self.add(n)
+
+    def _posiciones(self, n: int):
+        h = hashlib.blake2b(n.to_bytes(9, "big", signed=True), digest_size=16).digest()
+        h1, h2 = int.from_bytes(h[:8], "big"), int.from_bytes(h[8:], "big") | 1
+        return [(h1 + i * h2) % self.m for i in range(self.k)]
+
+    @staticmethod
+    def _tiene(bits, pos) -> bool:
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in pos)
+
+    def __contains__(self, x) -> bool:
+        pos = self._posiciones(SeenSet._num(x))
+        return self._tiene(self._cur, pos) or (self._old is not None and self._tiene(self._old, pos))
+
+    def __len__(self) -> int:
+        return self._total   # aproximado: items añadidos (no distingue duplicados)
+
+    def add(self, x) -> int:
+        n = SeenSet._num(x)
+        if self._n >= self.capacity:
+            self._old, self._cur, self._n = self._cur, bytearray(len(self._cur)), 0
+        for p in self._posiciones(n):
+            self._cur[p >> 3] |= 1 << (p & 7)
+        self._n += 1
+        self._total += 1
+        return n
+
+    def nbytes(self) -> int:
+        return sys.getsizeof(self._cur) + (sys.getsizeof(self._old) if self._old is not None else 0)
+
+
+def nuevo_seen(nums=(), mode: str = "exact", max_items: int = 0):
+    """Fábrica según el modo configurado ('exact' | 'bloom')."""
+    if mode == "bloom":
+        return BloomSeen(nums, capacity=max_items or 5000)
+    return SeenSet(nums, max_items=max_items)
+
+
+class VistosLazy:
+    """
+    dict key -> set de vistos que carga cada búsqueda del store la primera vez que se la usa
+    (get / [] / in), en vez de leer todo al arrancar. `cargar(key)` devuelve (nums, last_update)
+    o None si la búsqueda no existe; al cargar se completa también `last_ts`.
+    Iterar (items / keys / len) recorre sólo lo ya cargado en memoria.
+    """
+    def __init__(self, cargar, last_ts: dict, mode: str = "exact", max_items: int = 0):
+        self._cargar = cargar
+        self._sets: dict = {}
+        self._ausentes: set[str] = set()   # ya consultadas y sin nada en disco
+        self.last_ts = last_ts
+        self.mode = mode
+        self.max_items = max_items
+        self.cargas = 0
+
+    def get(self, key: str, default=None):
+        s = self._sets.get(key)
+        if s is not None:
+            return s
+        if key in self._ausentes:
+            return default
+        datos = self._cargar(key)
+        self.cargas += 1
+        if datos is None:
+            self._ausentes.add(key)
+            return default
+        nums, ts = datos
+        s = self._sets[key] = nuevo_seen(nums, self.mode, self.max_items)
+        self.last_ts.setdefault(key, ts)
+        return s
+
+    def __getitem__(self, key: str):
+        s = self.get(key)
+        if s is None:
+            raise KeyError(key)
+        return s
+
+    def __setitem__(self, key: str, s):
+        self._ausentes.discard(key)
+        self._sets[key] = s
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def pop(self, key: str, default=None):
+        self._ausentes.discard(key)
+        return self._sets.pop(key, default)
+
+    def __iter__(self):
+        return iter(list(self._sets))
+
+    def __len__(self) -> int:
+        return len(self._sets)
+
+    def items(self):
+        return list(self._sets.items())
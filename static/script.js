@@ -2,46 +2,107 @@ const form = document.getElementById('searchForm');
 const resultsDiv = document.getElementById('results');
 const metaDiv = document.getElementById('meta');
 
-let timer = null;
-let sessionId = null;
+let feed = null;
+let poll = null;
+// última respuesta de /search por URL, con su ETag: si no cambió nada el servidor responde 304 sin cuerpo
+const ultimas = new Map();
+
+function renderCard(item) {
+  const condition = item.condition && item.condition.toLowerCase() === 'usado' ? 'Usado' : 'Nuevo';
+  const shipping = item.shipping || 'No especificado';
+  const image = item.image || 'https://via.placeholder.com/120x120?text=Sin+Imagen';
+  const priceFmt = (item.price || 0).toLocaleString('es-CO');
+
+  return `
+    <div class="result-card">
+      <img src="${image}" alt="img" />
+      <div class="info-box">
+        <a href="${item.link}" target="_blank">${item.title}</a><br/>
+        💰 ${priceFmt} COP<br/>
+        🏷️ ${condition} | 🚚 ${shipping}
+      </div>
+    </div>
+  `;
+}
 
 function renderItems(items) {
   if (!items || items.length === 0) return "<p>Sin nuevos resultados en este ciclo.</p>";
+  return items.map(renderCard).join('');
+}
 
-  return items.map(item => {
-    const condition = item.condition && item.condition.toLowerCase() === 'usado' ? 'Usado' : 'Nuevo';
-    const shipping = item.shipping || 'No especificado';
-    const image = item.image || 'https://via.placeholder.com/120x120?text=Sin+Imagen';
-    const priceFmt = (item.price || 0).toLocaleString('es-CO');
-
-    return `
-      <div class="result-card">
-        <img src="${image}" alt="img" />
-        <div class="info-box">
-          <a href="${item.link}" target="_blank">${item.title}</a><br/>
-          💰 ${priceFmt} COP<br/>
-          🏷️ ${condition} | 🚚 ${shipping}
-        </div>
-      </div>
-    `;
-  }).join('');
+// Lee /search/stream (NDJSON) y pinta cada card apenas llega. Devuelve el frame "summary".
+async function streamSearch(params, onItem) {
+  const res = await fetch(`/search/stream?${params.toString()}`);
+  if (!res.ok) throw new Error(`HTTP ${res.status}`);
+  if (!res.body) {  // navegador sin streams: leer todo de una
+    const lines = (await res.text()).split('\n');
+    return handleFrames(lines, onItem);
+  }
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buf = '', summary = null;
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buf += decoder.decode(value, { stream: true });
+    const lines = buf.split('\n');
+    buf = lines.pop();
+    summary = handleFrames(lines, onItem) || summary;
+  }
+  return handleFrames([buf], onItem) || summary;
+}
+
+function handleFrames(lines, onItem) {
+  let summary = null;
+  for (const line of lines) {
+    if (!line.trim()) continue;
+    const frame = JSON.parse(line);
+    if (frame.type === 'item') onItem(frame);
+    else if (frame.type === 'summary') summary = frame;
+    else if (frame.type === 'error') throw new Error(frame.error);
+  }
+  return summary;
 }
 
 async function fetchDelta(params) {
   const url = `/search?${params.toString()}`;
-  const res = await fetch(url);
+  const prev = ultimas.get(url);
+  // no-store: el If-None-Match lo manda este código, no la caché del navegador
+  const res = await fetch(url, { cache: 'no-store', headers: prev ? { 'If-None-Match': prev.etag } : {} });
+  if (res.status === 304 && prev) return { ...prev.data, new_results: [], new_count: 0, not_modified: true };
   if (!res.ok) throw new Error(`HTTP ${res.status}`);
-  return await res.json();
+  const data = await res.json();
+  const etag = res.headers.get('ETag');
+  if (etag) ultimas.set(url, { etag, data });
+  return data;
+}
+
+// Sin SSE (navegador viejo o feed caído): polling de /search?delta=true con If-None-Match
+function pollDelta(baseParams, refresh_sec) {
+  const params = new URLSearchParams(baseParams);
+  params.set('delta', 'true');
+  poll = setInterval(async () => {
+    const hora = new Date().toLocaleTimeString('es-CO');
+    try {
+      const data = await fetchDelta(params);
+      if (data.error) throw new Error(data.error);
+      if (data.new_results && data.new_results.length) {
+        resultsDiv.insertAdjacentHTML('afterbegin', data.new_results.map(renderCard).join(''));
+      }
+      metaDiv.textContent = `🔁 Polling cada ${refresh_sec}s | nuevos: ${data.new_count || 0} (${hora}) | total vistos servidor: ${data.total_seen || 0}`;
+    } catch (err) {
+      metaDiv.textContent = `❌ Error en refresh (${hora}): ${err.message}`;
+    }
+  }, refresh_sec * 1000);
 }
 
 form.addEventListener('submit', async (e) => {
   e.preventDefault();
-  if (timer) { clearInterval(timer); timer = null; }
+  if (feed) { feed.close(); feed = null; }
+  if (poll) { clearInterval(poll); poll = null; }
   resultsDiv.innerHTML = "";
   metaDiv.textContent = "🔄 Buscando…";
 
-  sessionId = Date.now().toString();
-
   const q = document.getElementById('q').value;
   const min_price = document.getElementById('min_price').value;
   const max_price = document.getElementById('max_price').value;
@@ -98,34 +159,56 @@ btnSubscribe.addEventListener('click', async () => {
   const baseParams = new URLSearchParams({
     q,
     site,
-    delta: "true",
-    session_id: sessionId,
     ...(min_price && { min_price }),
     ...(max_price && { max_price }),
     ...(condition && { condition }),
     ...(envio && { envio }),
   });
 
-  // 1) Primer ciclo: pinta SOLO los nuevos (que serán todos la primera vez)
+  // 1) Primer ciclo: pinta cada card apenas el servidor la parsea (streaming)
+  let totalSeen = 0;
   try {
-    const data = await fetchDelta(baseParams);
-    resultsDiv.innerHTML = renderItems(data.new_results || []);
-    metaDiv.textContent = `🔁 Auto-refresh ${refresh_sec}s | nuevos: ${data.new_count || 0} | total vistos servidor: ${data.total_seen || 0}`;
+    let count = 0;
+    const data = await streamSearch(baseParams, item => {
+      resultsDiv.insertAdjacentHTML('beforeend', renderCard(item));
+      metaDiv.textContent = `🔄 Recibiendo… ${++count} resultados`;
+    });
+    if (!count) resultsDiv.innerHTML = renderItems([]);
+    totalSeen = data ? data.returned : count;
+    metaDiv.textContent = `🔁 En vivo cada ${refresh_sec}s | resultados: ${totalSeen}`;
   } catch (err) {
     console.error(err);
     metaDiv.textContent = `❌ Error inicial: ${err.message}`;
     return;
   }
 
-  // 2) Siguientes ciclos: reemplaza el contenido con el NUEVO lote
-  timer = setInterval(async () => {
-    try {
-      const data = await fetchDelta(baseParams);
-      resultsDiv.innerHTML = renderItems(data.new_results || []);
-      metaDiv.textContent = `🔁 Auto-refresh ${refresh_sec}s | nuevos: ${data.new_count || 0} | total vistos servidor: ${data.total_seen || 0}`;
-    } catch (err) {
-      console.error(err);
-      metaDiv.textContent = `❌ Error en refresh: ${err.message}`;
+  // 2) Después: el servidor empuja SOLO los nuevos por SSE (sin polling; un scrape por búsqueda, no por pestaña)
+  if (!window.EventSource) {
+    pollDelta(baseParams, refresh_sec);
+    return;
+  }
+  const feedParams = new URLSearchParams(baseParams);
+  feedParams.set('refresh_sec', refresh_sec);
+  feed = new EventSource(`/search/feed?${feedParams.toString()}`);
+  feed.onmessage = (ev) => {
+    const data = JSON.parse(ev.data);
+    const hora = new Date().toLocaleTimeString('es-CO');
+    if (data.type === 'delta') {
+      if (data.new_results && data.new_results.length) {
+        resultsDiv.insertAdjacentHTML('afterbegin', data.new_results.map(renderCard).join(''));
+      }
+      metaDiv.textContent = `🔁 En vivo cada ${refresh_sec}s | nuevos: ${data.new_count || 0} (${hora}) | total vistos servidor: ${data.total_seen || 0}`;
+    } else if (data.type === 'scrape_error') {
+      metaDiv.textContent = `❌ Error en refresh (${hora}): ${data.error}`;
     }
-  }, refresh_sec * 1000);
+  };
+  feed.onerror = () => {
+    if (feed.readyState === EventSource.CLOSED) {   // no va a reconectar: pasar a polling
+      feed = null;
+      pollDelta(baseParams, refresh_sec);
+      return;
+    }
+    // EventSource reconecta solo; sólo avisamos
+    metaDiv.textContent = `⚠️ Conexión en vivo interrumpida, reconectando…`;
+  };
 });
@@ -0,0 +1,484 @@
+# store.py
+import json, os, sqlite3, threading, time
+from array import array
+from seen_set import item_num, nuevo_seen, codigo_sitio
+from metrics import medir
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS seen_items (
+    id   INTEGER PRIMARY KEY,      -- orden de llegada (para recortar los más antiguos)
+    key  TEXT NOT NULL,
+    item INTEGER NOT NULL,         -- seen_set.item_num(link)
+    UNIQUE (key, item)
+);
+CREATE TABLE IF NOT EXISTS seen_meta (
+    key         TEXT PRIMARY KEY,
+    last_update INTEGER NOT NULL,
+    rev         INTEGER NOT NULL DEFAULT 0   -- +1 por cada escritura (last_update sólo tiene resolución de 1 s)
+);
+CREATE TABLE IF NOT EXISTS watches (
+    id   TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS phonemap (
+    phone   TEXT PRIMARY KEY,
+    chat_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS seen_prices (
+    key   TEXT NOT NULL,           -- key de vistos de un watch (búsqueda + phone)
+    item  INTEGER NOT NULL,        -- seen_set.item_num(link), como en seen_items
+    price INTEGER NOT NULL,        -- último precio que vio ese suscriptor (alertas de baja)
+    PRIMARY KEY (key, item)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS price_samples (
+    item  INTEGER NOT NULL,        -- seen_set.item_num_sitio(link)
+    ts    INTEGER NOT NULL,
+    price INTEGER NOT NULL,
+    PRIMARY KEY (item, ts)         -- agrupado por item: la serie de un item queda contigua en disco
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tg_files (
+    url     TEXT PRIMARY KEY,      -- URL de la imagen
+    file_id TEXT NOT NULL,         -- file_id de Telegram de la primera vez que se envió
+    ts      INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    k TEXT PRIMARY KEY,
+    v TEXT
+);
+"""
+
+# campos que cambian en cada corrida del watch: escribirlos no es un cambio de suscripción
+_CAMPOS_DE_CORRIDA = ("last_run",)
+
+
+def _sin_corrida(w: dict | None) -> dict | None:
+    return None if w is None else {k: v for k, v in w.items() if k not in _CAMPOS_DE_CORRIDA}
+
+
+class Store:
+    """
+    Persistencia en SQLite (modo WAL) para vistos, watches, phone->chat_id e historial de precios.
+    Los vistos se guardan como IDs enteros de item (seen_set.item_num), no como URLs.
+    Las escrituras se encolan en memoria (add_seen / put_watch / put_phone) y flush()
+    las escribe en UNA transacción; solo se insertan los items nuevos, nunca se reescribe todo.
+    flush() es bloqueante: llamarlo fuera del event loop (asyncio.to_thread).
+    """
+    def __init__(self, path: str = "store.db"):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()     # protege las colas pendientes
+        self._db_lock = threading.Lock()  # serializa el uso de la conexión
+        # segunda conexión sólo para lecturas puntuales desde el event loop (WAL: no espera al flush)
+        self._rconn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._rlock = threading.Lock()
+        self._migrar_links()
+        self._migrar_precios_sitio()
+        self._migrar_rev_vistos()
+        self._rev_vistos: dict[str, int] = {}   # key -> rev de seen_meta que ya está en memoria (ver vistos_al_dia)
+        self._pend_links: list[tuple[str, int]] = []
+        self._pend_drop: set[str] = set()
+        self._pend_meta: dict[str, int] = {}
+        self._pend_watches: dict[str, dict | None] = {}
+        self._pend_phones: dict[str, str] = {}
+        self._pend_kv: dict[str, str] = {}                    # tabla meta (k, v)
+        self._pend_files: dict[str, str] = {}                 # url -> file_id de Telegram
+        self._pend_sp: dict[str, dict[int, int]] = {}         # key -> {item: precio} (seen_prices)
+        self._rev: str | None = None      # última revisión de suscripciones conocida (ver suscripciones_cambiaron)
+        self._rev_ajena = False
+        self._pend_px = (array("q"), array("q"), array("q"))   # columnas item, ts, price
+
+    def _migrar_links(self):
+        """Stores creados con la tabla `seen` de URLs: convertir a IDs enteros y borrarla."""
+        with self._db_lock:
+            c = self._conn
+            if not c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='seen'").fetchone():
+                return
+            filas = [(k, item_num(l)) for k, l in c.execute("SELECT key, link FROM seen")]
+            c.execute("BEGIN")
+            c.executemany("INSERT OR IGNORE INTO seen_items(key, item) VALUES (?, ?)", filas)
+            c.execute("DROP TABLE seen")
+            c.execute("COMMIT")
+
+    def _migrar_precios_sitio(self):
+        """
+        price_samples de antes de item_num_sitio (sin sitio en la clave): se asumen de MercadoLibre Colombia,
+        el sitio por defecto. Una sola vez.
+        """
+        with self._db_lock:
+            c = self._conn
+            if c.execute("SELECT 1 FROM meta WHERE k='prices_site'").fetchone():
+                return
+            c.execute("BEGIN IMMEDIATE")   # otro proceso pudo migrar entre la consulta y acá: volver a mirar
+            if c.execute("SELECT 1 FROM meta WHERE k='prices_site'").fetchone():
+                c.execute("COMMIT")
+                return
+            c.execute("UPDATE price_samples SET item = item * 1024 + ? WHERE item >= 0", (codigo_sitio("MCO"),))
+            c.execute("INSERT INTO meta(k, v) VALUES ('prices_site', ?)", (str(int(time.time())),))
+            c.execute("COMMIT")
+
+    def _migrar_rev_vistos(self):
+        """Stores de antes de seen_meta.rev: agregar la columna."""
+        with self._db_lock:
+            if not any(col[1] == "rev" for col in self._conn.execute("PRAGMA table_info(seen_meta)")):
+                self._conn.execute("ALTER TABLE seen_meta ADD COLUMN rev INTEGER NOT NULL DEFAULT 0")
+
+    # ---------- lectura (arranque) ----------
+    def load_seen(self, mode: str = "exact", max_items: int = 0) -> tuple[dict, dict[str, int]]:
+        """Devuelve ({key: SeenSet|BloomSeen}, {key: last_update})."""
+        nums, last = {}, {}
+        with self._db_lock:
+            for k, ts, rev in self._conn.execute("SELECT key, last_update, rev FROM seen_meta"):
+                last[k] = ts
+                nums.setdefault(k, [])
+                self._rev_vistos[k] = rev
+            for k, item in self._conn.execute("SELECT key, item FROM seen_items ORDER BY id"):
+                nums.setdefault(k, []).append(item)
+        return {k: nuevo_seen(v, mode, max_items) for k, v in nums.items()}, last
+
+    def seen_last_update(self, key: str) -> int | None:
+        """last_update de `key` en disco (puede haberlo escrito otro proceso)."""
+        with self._rlock:
+            fila = self._rconn.execute("SELECT last_update FROM seen_meta WHERE key=?", (key,)).fetchone()
+        return fila[0] if fila else None
+
+    def seen_rev(self, key: str) -> tuple[int, int] | None:
+        """(rev, last_update) de `key` en disco, o None si no existe."""
+        with self._rlock:
+            return self._rconn.execute("SELECT rev, last_update FROM seen_meta WHERE key=?", (key,)).fetchone()
+
+    def vistos_al_dia(self, key: str, rev: int) -> bool:
+        """¿La revisión `rev` de `key` (de seen_rev) ya está en memoria (la cargamos o la escribimos nosotros)?"""
+        with self._lock:
+            return self._rev_vistos.get(key) == rev
+
+    def marcar_vistos(self, key: str, rev: int):
+        """Los items de `key` hasta la revisión `rev` ya están en memoria."""
+        with self._lock:
+            self._rev_vistos[key] = rev
+
+    def cargar_vistos(self, key: str) -> tuple[list[int], int] | None:
+        """(items, last_update) de UNA búsqueda, o None si no existe (para seen_set.VistosLazy)."""
+        fila = self.seen_rev(key)   # antes que los items: si alguien escribe en el medio, se relee después
+        if fila is None:
+            return None
+        items = self.load_seen_key(key)
+        self.marcar_vistos(key, fila[0])
+        return items, fila[1]
+
+    def seen_keys_older(self, limite: int) -> list[str]:
+        """Búsquedas sin actualizar desde `limite` (epoch), sin cargarlas."""
+        with self._rlock:
+            return [k for (k,) in self._rconn.execute("SELECT key FROM seen_meta WHERE last_update < ?", (limite,))]
+
+    def seen_count(self) -> int:
+        with self._rlock:
+            return self._rconn.execute("SELECT COUNT(*) FROM seen_meta").fetchone()[0]
+
+    def load_seen_key(self, key: str) -> list[int]:
+        """Items vistos de UNA búsqueda, en orden de llegada."""
+        with self._rlock:
+            return [n for (n,) in self._rconn.execute("SELECT item FROM seen_items WHERE key=? ORDER BY id", (key,))]
+
+    def suscripciones_cambiaron(self) -> bool:
+        """
+        True si OTRO proceso escribió watches o phone->chat_id desde la última consulta (hay que recargarlos).
+        Cada flush con esos cambios deja una revisión nueva en meta; las propias no cuentan.
+        """
+        with self._rlock:
+            fila = self._rconn.execute("SELECT v FROM meta WHERE k='subs_rev'").fetchone()
+        rev = fila[0] if fila else None
+        with self._lock:
+            cambio = self._rev_ajena or rev != self._rev
+            self._rev, self._rev_ajena = rev, False
+        return cambio
+
+    def load_latest_prices(self):
+        """Última muestra de cada item: iterador de (item, price, ts)."""
+        with self._db_lock:
+            # con MAX(), SQLite devuelve el price de la fila del máximo
+            return [(item, price, ts) for item, ts, price in
+                    self._conn.execute("SELECT item, MAX(ts), price FROM price_samples GROUP BY item")]
+
+    def price_series(self, item: int, since: int = 0, until: int | None = None) -> tuple[list[int], list[int]]:
+        """Serie (ts, precios) de un item, incluyendo lo que todavía no se escribió."""
+        until = until if until is not None else 2 ** 62
+        with self._db_lock:
+            filas = self._conn.execute(
+                "SELECT ts, price FROM price_samples WHERE item=? AND ts BETWEEN ? AND ? ORDER BY ts",
+                (item, since, until)).fetchall()
+        with self._lock:
+            items, tss, precios = self._pend_px
+            filas += [(t, p) for it, t, p in zip(items, tss, precios) if it == item and since <= t <= until]
+        filas.sort()
+        return [t for t, _ in filas], [p for _, p in filas]
+
+    def load_seen_prices(self, key: str) -> dict[int, int]:
+        """{item: precio} que vio la búsqueda `key`, incluyendo lo que todavía no se escribió."""
+        with self._rlock:
+            precios = dict(self._rconn.execute("SELECT item, price FROM seen_prices WHERE key=?", (key,)))
+        with self._lock:
+            precios.update(self._pend_sp.get(key, {}))
+        return precios
+
+    def load_watches(self) -> dict[str, dict]:
+        with self._db_lock:
+            return {wid: json.loads(d) for wid, d in self._conn.execute("SELECT id, data FROM watches")}
+
+    def load_phonemap(self) -> dict[str, str]:
+        with self._db_lock:
+            return dict(self._conn.execute("SELECT phone, chat_id FROM phonemap"))
+
+    # ---------- escritura (encolada) ----------
+    def add_seen(self, key: str, nums, last_update: int | None = None):
+        """Encola items nuevos (enteros de item_num) de una búsqueda."""
+        with self._lock:
+            self._pend_links.extend((key, n) for n in nums)
+            self._pend_meta[key] = int(last_update or time.time())
+
+    def drop_seen(self, keys):
+        """Encola el borrado completo de búsquedas (expulsadas por retención)."""
+        with self._lock:
+            for k in keys:
+                self._pend_drop.add(k)
+                self._pend_meta.pop(k, None)
+                self._pend_sp.pop(k, None)
+                self._rev_vistos.pop(k, None)
+            self._pend_links = [(k, n) for k, n in self._pend_links if k not in self._pend_drop]
+
+    def put_watch(self, wid: str, w: dict | None):
+        """Encola el estado de un watch (None = borrarlo)."""
+        with self._lock:
+            self._pend_watches[wid] = None if w is None else dict(w)
+
+    def put_seen_prices(self, key: str, precios: dict[int, int]):
+        """Encola el último precio visto por item para la búsqueda `key`."""
+        with self._lock:
+            self._pend_sp.setdefault(key, {}).update(precios)
+
+    def add_prices(self, items, ts: int, prices):
+        """Encola muestras de precio (mismo ts para todo el lote de un scrape)."""
+        with self._lock:
+            ci, ct, cp = self._pend_px
+            ci.extend(items)
+            cp.extend(prices)
+            ct.extend([ts] * (len(ci) - len(ct)))
+
+    def trim_prices(self, older_than: int) -> int:
+        """Borra muestras anteriores a `older_than` (epoch). Bloqueante."""
+        with self._db_lock:
+            return self._conn.execute("DELETE FROM price_samples WHERE ts < ?", (older_than,)).rowcount
+
+    def put_phone(self, phone: str, chat_id: str):
+        with self._lock:
+            self._pend_phones[phone] = chat_id
+
+    def get_kv(self, k: str, default: str | None = None) -> str | None:
+        """Valor de la tabla meta (incluye lo encolado y aún no escrito)."""
+        with self._lock:
+            if k in self._pend_kv:
+                return self._pend_kv[k]
+        with self._db_lock:
+            fila = self._conn.execute("SELECT v FROM meta WHERE k=?", (k,)).fetchone()
+        return fila[0] if fila else default
+
+    def load_file_ids(self, limit: int) -> list[tuple[str, str]]:
+        """Los `limit` file_id más recientes, del más viejo al más nuevo (para llenar un LRU en orden)."""
+        with self._rlock:
+            filas = self._rconn.execute("SELECT url, file_id FROM tg_files ORDER BY ts DESC LIMIT ?", (limit,)).fetchall()
+        return filas[::-1]
+
+    def put_file_id(self, url: str, file_id: str):
+        with self._lock:
+            self._pend_files[url] = file_id
+
+    def trim_file_ids(self, max_items: int) -> int:
+        """Deja sólo los `max_items` más recientes. Bloqueante."""
+        with self._db_lock:
+            return self._conn.execute(
+                "DELETE FROM tg_files WHERE url NOT IN (SELECT url FROM tg_files ORDER BY ts DESC LIMIT ?)",
+                (max_items,)).rowcount
+
+    def put_kv(self, k: str, v: str):
+        with self._lock:
+            self._pend_kv[k] = v
+
+    def pending(self) -> int:
+        with self._lock:
+            return (len(self._pend_links) + len(self._pend_meta) + len(self._pend_drop)
+                    + len(self._pend_watches) + len(self._pend_phones) + len(self._pend_kv) + len(self._pend_files) + len(self._pend_px[0])
+                    + sum(map(len, self._pend_sp.values())))
+
+    def flush(self) -> int:
+        """Escribe todo lo pendiente en una transacción. Devuelve cuántas filas se enviaron."""
+        with self._lock:
+            links, self._pend_links = self._pend_links, []
+            meta, self._pend_meta = self._pend_meta, {}
+            drop, self._pend_drop = self._pend_drop, set()
+            watches, self._pend_watches = self._pend_watches, {}
+            phones, self._pend_phones = self._pend_phones, {}
+            kv, self._pend_kv = self._pend_kv, {}
+            files, self._pend_files = self._pend_files, {}
+            px, self._pend_px = self._pend_px, (array("q"), array("q"), array("q"))
+            sp, self._pend_sp = self._pend_sp, {}
+        if not (links or meta or drop or watches or phones or kv or files or px[0] or sp):
+            return 0
+        with self._db_lock, medir("persist"):
+            c = self._conn
+            # IMMEDIATE: se lee (watches/phonemap/subs_rev) antes de escribir; con BEGIN a secas, otro proceso que
+            # escribió en el medio hace fallar el upgrade a escritura con "database is locked" sin esperar
+            nueva_rev, revs = None, {}
+            try:
+                c.execute("BEGIN IMMEDIATE")   # dentro del try: si no se obtiene el lock, también se reencola
+                c.executemany("DELETE FROM seen_items WHERE key=?", [(k,) for k in drop])
+                c.executemany("DELETE FROM seen_meta WHERE key=?", [(k,) for k in drop])
+                c.executemany("DELETE FROM seen_prices WHERE key=?", [(k,) for k in drop])
+                c.executemany("INSERT OR IGNORE INTO seen_items(key, item) VALUES (?, ?)", links)
+                # revisión de cada key antes y después de escribirla (con el lock de escritura tomado)
+                revs = {k: c.execute("SELECT rev FROM seen_meta WHERE key=?", (k,)).fetchone() for k in meta}
+                revs = {k: ((f[0] if f else None), (f[0] + 1 if f else 1)) for k, f in revs.items()}
+                c.executemany(
+                    "INSERT INTO seen_meta(key, last_update, rev) VALUES (?, ?, 1) "
+                    "ON CONFLICT(key) DO UPDATE SET last_update=excluded.last_update, rev=seen_meta.rev + 1",
+                    meta.items())
+                cambio_subs = self._cambian_suscripciones(watches, phones)
+                c.executemany("INSERT OR REPLACE INTO watches(id, data) VALUES (?, ?)",
+                              [(wid, json.dumps(w, ensure_ascii=False)) for wid, w in watches.items() if w is not None])
+                c.executemany("DELETE FROM watches WHERE id=?", [(wid,) for wid, w in watches.items() if w is None])
+                if cambio_subs:   # sólo last_run (cada corrida) no hace recargar a los demás procesos
+                    prev = c.execute("SELECT v FROM meta WHERE k='subs_rev'").fetchone()
+                    rev = f"{time.time_ns()}:{os.getpid()}"
+                    c.execute("INSERT OR REPLACE INTO meta(k, v) VALUES ('subs_rev', ?)", (rev,))
+                    nueva_rev = (prev[0] if prev else None, rev)
+                c.executemany("INSERT OR REPLACE INTO phonemap(phone, chat_id) VALUES (?, ?)", phones.items())
+                c.executemany("INSERT OR REPLACE INTO meta(k, v) VALUES (?, ?)", kv.items())
+                ahora = int(time.time())
+                c.executemany("INSERT OR REPLACE INTO tg_files(url, file_id, ts) VALUES (?, ?, ?)",
+                              [(u, f, ahora) for u, f in files.items()])
+                c.executemany("INSERT OR REPLACE INTO price_samples(item, ts, price) VALUES (?, ?, ?)", zip(*px))
+                c.executemany("INSERT OR REPLACE INTO seen_prices(key, item, price) VALUES (?, ?, ?)",
+                              [(k, n, p) for k, d in sp.items() for n, p in d.items()])
+                c.execute("COMMIT")
+            except Exception:
+                if c.in_transaction:
+                    c.execute("ROLLBACK")
+                # devolver lo no escrito a la cola para el siguiente intento
+                with self._lock:
+                    self._pend_links[:0] = links
+                    self._pend_drop |= drop
+                    for k, v in meta.items(): self._pend_meta.setdefault(k, v)
+                    for k, v in watches.items(): self._pend_watches.setdefault(k, v)
+                    for k, v in phones.items(): self._pend_phones.setdefault(k, v)
+                    for k, v in kv.items(): self._pend_kv.setdefault(k, v)
+                    for k, v in files.items(): self._pend_files.setdefault(k, v)
+                    for col, vieja in zip(self._pend_px, px): col[:0] = vieja
+                    for k, d in sp.items(): self._pend_sp[k] = {**d, **self._pend_sp.get(k, {})}
+                raise
+            with self._lock:
+                for k, (antes, despues) in revs.items():
+                    # si otro proceso escribió la key desde que la cargamos, sus items no están en memoria
+                    if self._rev_vistos.get(k) == antes:
+                        self._rev_vistos[k] = despues
+            if nueva_rev:   # recién con el COMMIT hecho: un rollback no deja una revisión que no existe
+                with self._lock:
+                    # otro proceso escribió entre nuestra última consulta y este flush
+                    self._rev_ajena |= nueva_rev[0] != self._rev
+                    self._rev = nueva_rev[1]
+        return (len(links) + len(meta) + len(drop) + len(watches) + len(phones) + len(kv) + len(files) + len(px[0])
+                + sum(map(len, sp.values())))
+
+    def _cambian_suscripciones(self, watches: dict[str, dict | None], phones: dict[str, str]) -> bool:
+        """¿Lo encolado cambia params/phone/intervalo/altas/bajas de watches o algún chat_id? (dentro del flush)"""
+        c = self._conn
+        for phone, chat_id in phones.items():
+            fila = c.execute("SELECT chat_id FROM phonemap WHERE phone=?", (phone,)).fetchone()
+            if not fila or fila[0] != chat_id:
+                return True
+        for wid, w in watches.items():
+            fila = c.execute("SELECT data FROM watches WHERE id=?", (wid,)).fetchone()
+            nuevo = None if w is None else json.loads(json.dumps(w, ensure_ascii=False))   # como queda en disco
+            if _sin_corrida(json.loads(fila[0]) if fila else None) != _sin_corrida(nuevo):
+                return True
+        return False
+
+    def trim_seen(self, max_items: int) -> int:
+        """Deja como máximo `max_items` items (los más recientes) por búsqueda. Bloqueante."""
+        if not max_items: return 0
+        with self._db_lock:
+            cur = self._conn.execute(
+                "DELETE FROM seen_items WHERE id IN ("
+                " SELECT id FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY key ORDER BY id DESC) AS rn"
+                "                 FROM seen_items) WHERE rn > ?)", (max_items,))
+            # los precios vistos siguen a los vistos: sin el item, tampoco su precio
+            self._conn.execute("DELETE FROM seen_prices WHERE NOT EXISTS ("
+                               " SELECT 1 FROM seen_items s WHERE s.key = seen_prices.key AND s.item = seen_prices.item)")
+            return cur.rowcount
+
+    def close(self):
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+        with self._rlock:
+            self._rconn.close()
+
+    def merge_seen(self, renombres: dict[str, str]) -> int:
+        """
+        Funde los vistos de cada key vieja en su key nueva ({vieja: nueva}): unión de items y el last_update
+        más reciente; la vieja se borra. Bloqueante. Devuelve cuántas keys viejas se fundieron.
+        """
+        renombres = {v: n for v, n in renombres.items() if v != n}
+        if not renombres:
+            return 0
+        self.flush()
+        fundidas = 0
+        with self._db_lock:
+            c = self._conn
+            c.execute("BEGIN")
+            try:
+                for vieja, nueva in renombres.items():
+                    if not c.execute("SELECT 1 FROM seen_meta WHERE key=?", (vieja,)).fetchone():
+                        continue
+                    c.execute("INSERT OR IGNORE INTO seen_items(key, item) "
+                              "SELECT ?, item FROM seen_items WHERE key=? ORDER BY id", (nueva, vieja))
+                    c.execute("INSERT INTO seen_meta(key, last_update, rev) SELECT ?, last_update, 1 FROM seen_meta "
+                              "WHERE key=? ON CONFLICT(key) DO UPDATE SET "
+                              "last_update=MAX(last_update, excluded.last_update), rev=seen_meta.rev + 1",
+                              (nueva, vieja))
+                    c.execute("INSERT OR IGNORE INTO seen_prices(key, item, price) "
+                              "SELECT ?, item, price FROM seen_prices WHERE key=?", (nueva, vieja))
+                    c.execute("DELETE FROM seen_items WHERE key=?", (vieja,))
+                    c.execute("DELETE FROM seen_meta WHERE key=?", (vieja,))
+                    c.execute("DELETE FROM seen_prices WHERE key=?", (vieja,))
+                    fundidas += 1
+                c.execute("COMMIT")
+            except Exception:
+                c.execute("ROLLBACK")
+                raise
+        return fundidas
+
+    # ---------- migración única desde los JSON ----------
+    def migrate_from_json(self, seen_file: str, watches_file: str, phonemap_file: str) -> bool:
+        """Importa seen_store.json / watches_store.json / phone_map.json la primera vez. Los JSON no se tocan."""
+        with self._db_lock:
+            done = self._conn.execute("SELECT v FROM meta WHERE k='migrated_json'").fetchone()
+        if done:
+            return False
+
+        def _load(path):
+            if not os.path.exists(path): return {}
+            try:
+                with open(path, "r", encoding="utf-8") as f: return json.load(f)
+            except Exception: return {}
+
+        for k, v in _load(seen_file).items():
+            self.add_seen(k, [item_num(l) for l in v.get("links", [])], v.get("last_update", 0) or int(time.time()))
+        for wid, w in _load(watches_file).items():
+            self.put_watch(wid, w)
+        for phone, chat_id in _load(phonemap_file).items():
+            self.put_phone(phone, chat_id)
+        self.flush()
+        with self._db_lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta(k, v) VALUES ('migrated_json', ?)", (str(int(time.time())),))
+        return True
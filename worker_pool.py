@@ -0,0 +1,174 @@
+# worker_pool.py
+import asyncio, itertools, json, os, sys, time
+import psutil
+
+_WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scrape_worker.py")
+
+
+class WorkerError(Exception):
+    pass
+
+
+class _Proceso:
+    __slots__ = ("n", "proc", "jobs", "desde")
+
+    def __init__(self, n: int, proc: asyncio.subprocess.Process):
+        self.n = n
+        self.proc = proc
+        self.jobs = 0
+        self.desde = time.monotonic()
+
+    def rss_mb(self) -> float:
+        """RSS del worker más sus Chromium hijos."""
+        try:
+            p = psutil.Process(self.proc.pid)
+            procs = [p] + p.children(recursive=True)
+        except psutil.Error:
+            return 0.0
+        total = 0
+        for c in procs:
+            try:
+                total += c.memory_info().rss
+            except psutil.Error:
+                pass
+        return total / (1024 * 1024)
+
+
+class WorkerPool:
+    """
+    N procesos `scrape_worker.py --serve` (un trabajo a la vez cada uno, navegador caliente) hablando
+    JSON por líneas en stdin/stdout. El scraping —Chromium síncrono y el parseo HTML— corre fuera del
+    proceso de la API y usa todos los núcleos.
+    - scrape(**job): espera un worker libre, le manda el trabajo y devuelve el dict de resultado.
+    - Un worker que muere, no responde en `timeout` o devuelve basura se mata y se relanza.
+    - Se recicla tras `max_jobs` trabajos o si su RSS (con sus Chromium) supera `max_rss_mb`.
+    """
+    def __init__(self, size: int = 0, max_jobs: int = 500, max_rss_mb: int = 800, timeout: float = 60.0):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.timeout = timeout
+        self._libres: asyncio.Queue | None = None
+        self._procs: list[_Proceso] = []
+        self._ids = itertools.count(1)
+        self.restarts = 0
+        self.errors = 0
+        self.done = 0
+
+    @property
+    def iniciado(self) -> bool:
+        return self._libres is not None
+
+    async def start(self):
+        if self.iniciado or self.size <= 0:
+            return
+        self._libres = asyncio.Queue()
+        for n in range(self.size):
+            w = await self._lanzar(n)
+            self._procs.append(w)
+            self._libres.put_nowait(w)
+
+    async def stop(self):
+        if not self.iniciado:
+            return
+        self._libres = None
+        await asyncio.gather(*(self._terminar(w) for w in self._procs), return_exceptions=True)
+        self._procs.clear()
+
+    async def _lanzar(self, n: int) -> _Proceso:
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, _WORKER, "--serve",
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            cwd=os.path.dirname(_WORKER),
+            limit=16 * 1024 * 1024)   # una respuesta = una línea (puede pesar varios cientos de KB)
+        return _Proceso(n, proc)
+
+    async def _terminar(self, w: _Proceso):
+        if w.proc.returncode is not None:
+            return
+        try:
+            w.proc.stdin.write(b'{"op": "stop"}\n')
+            await w.proc.stdin.drain()
+            await asyncio.wait_for(w.proc.wait(), 5)
+        except (asyncio.TimeoutError, ConnectionError, BrokenPipeError):
+            w.proc.kill()
+            await w.proc.wait()
+
+    async def _reemplazar(self, w: _Proceso, motivo: str) -> _Proceso:
+        print(f"♻️ Reiniciando worker {w.n} (pid {w.proc.pid}): {motivo}")
+        if w.proc.returncode is None:
+            if motivo.startswith("reciclaje"):
+                await self._terminar(w)
+            else:
+                w.proc.kill()
+                await w.proc.wait()
+        self.restarts += 1
+        nuevo = await self._lanzar(w.n)
+        self._procs[self._procs.index(w)] = nuevo
+        return nuevo
+
+    async def _pedir(self, w: _Proceso, job: dict) -> dict:
+        job_id = next(self._ids)
+        w.proc.stdin.write((json.dumps({**job, "id": job_id}, ensure_ascii=False) + "\n").encode("utf-8"))
+        await w.proc.stdin.drain()
+        linea = await asyncio.wait_for(w.proc.stdout.readline(), self.timeout)
+        if not linea:
+            raise WorkerError("el worker terminó sin responder")
+        out = json.loads(linea)
+        if out.get("id") != job_id:
+            raise WorkerError("respuesta fuera de orden")
+        return out
+
+    async def scrape(self, **job) -> dict:
+        """Ejecuta un trabajo de scrape (q, site, min_price, max_price, condition, envio, engine, pagina)."""
+        if not self.iniciado:
+            raise RuntimeError("WorkerPool no iniciado (llama a start())")
+        libres = self._libres
+        w = await libres.get()
+        out, fallo = None, None
+        try:
+            out = await self._pedir(w, job)
+            w.jobs += 1
+        except (asyncio.TimeoutError, WorkerError, ValueError, ConnectionError, BrokenPipeError) as e:
+            fallo = e
+        except asyncio.CancelledError:
+            fallo = "cancelado a mitad de un trabajo"   # la respuesta pendiente desincronizaría el canal
+            raise
+        finally:
+            if fallo is not None:
+                w = await asyncio.shield(self._reemplazar(w, str(fallo) or fallo.__class__.__name__))
+            elif w.jobs >= self.max_jobs:
+                w = await self._reemplazar(w, f"reciclaje tras {w.jobs} trabajos")
+            elif self.max_rss_mb and w.rss_mb() > self.max_rss_mb:
+                w = await self._reemplazar(w, f"reciclaje por RSS > {self.max_rss_mb} MB")
+            if self._libres is libres:
+                libres.put_nowait(w)
+        if fallo is not None:
+            self.errors += 1
+            raise WorkerError(f"worker {w.n}: {fallo!r}")
+        if out.get("error"):
+            self.errors += 1
+            raise WorkerError(out["error"])
+        self.done += 1
+        out.pop("id", None)
+        out.pop("error", None)
+        return out
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size, "idle": self._libres.qsize() if self._libres else 0,
+            "done": self.done, "errors": self.errors, "restarts": self.restarts,
+            "workers": [{"n": w.n, "pid": w.proc.pid, "jobs": w.jobs, "alive": w.proc.returncode is None,
+                         "rss_mb": round(w.rss_mb(), 1), "uptime_s": round(time.monotonic() - w.desde)}
+                        for w in self._procs],
+        }
+
+
+def worker_pool_from_env() -> WorkerPool:
+    """SCRAPE_WORKERS=0 (default) = scrapear dentro del proceso de la API, como siempre."""
+    return WorkerPool(
+        size=int(os.getenv("SCRAPE_WORKERS", "0")),
+        max_jobs=int(os.getenv("WORKER_MAX_JOBS", "500")),
+        max_rss_mb=int(os.getenv("WORKER_MAX_RSS_MB", "800")),
+        timeout=float(os.getenv("WORKER_TIMEOUT", "60")),
+    )